@@ -3,16 +3,21 @@
 
 """
 配置接口模块
-使用Python引用JavaScript配置读取器并提供更丰富的接口
+在config_reader.py（与config_reader.js结果一致的Python配置读取器）之上提供更丰富的接口
 """
 
 import os
 import sys
 import json
 import logging
+import time
 import threading
-import importlib.util
-from typing import Any, Dict, Optional, Union, Callable
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union, Callable
+
+from config_reader import ConfigReader, compile_key_path, resolve_key_path
+from config_watcher import ConfigWatcher, normalize_path
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -22,8 +27,185 @@ class ConfigInterfaceError(Exception):
     """配置接口异常类"""
     pass
 
+# 缓存未命中时返回的标记（缓存的值本身可能是None）
+_MISSING = object()
+
+class _CacheEntry:
+    """缓存项：值和过期时间（time.monotonic）"""
+
+    __slots__ = ('value', 'expires')
+
+    def __init__(self, value: Any, expires: float):
+        self.value = value
+        self.expires = expires
+
+class ConfigCache:
+    """
+    带过期时间和容量上限的配置缓存
+
+    - 查找不加锁：字典查找、过期判断和move_to_end都是单步操作，多个线程可以同时读
+    - 写入、过期项的删除、淘汰和清除在锁内进行；项按最近使用的顺序保存在OrderedDict中，
+      超过容量时从头部淘汰最久未使用的1/8，淘汰的开销分摊到多次写入上
+    - 命中和未命中次数记在每个线程自己的计数器中，读取时不加锁；stats()在锁内求和，
+      已结束线程的计数合并到总数后释放，内存只随存活的线程数增长
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 10):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Any, _CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+        # 每个线程的[命中, 未命中]；_counters登记所有线程的计数器，已结束线程的计数合并到_retired
+        self._local = threading.local()
+        self._counters: List[Tuple[threading.Thread, List[int]]] = []
+        self._retired = [0, 0]
+        self._evictions = 0
+        self._expirations = 0
+
+    def _thread_counters(self) -> List[int]:
+        counters = getattr(self._local, 'counters', None)
+        if counters is None:
+            # 每个线程只在第一次访问时加锁登记
+            counters = self._local.counters = [0, 0]
+            with self._lock:
+                self._retire_dead_threads()
+                self._counters.append((threading.current_thread(), counters))
+        return counters
+
+    def _retire_dead_threads(self) -> None:
+        """把已结束线程的计数合并到总数（调用方持有锁）"""
+        alive = []
+        for thread, counters in self._counters:
+            if thread.is_alive():
+                alive.append((thread, counters))
+            else:
+                self._retired[0] += counters[0]
+                self._retired[1] += counters[1]
+        self._counters = alive
+
+    def get(self, key: Any) -> Any:
+        """返回缓存的值，不存在或已过期时返回_MISSING"""
+        counters = self._thread_counters()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if time.monotonic() < entry.expires:
+                try:
+                    self._entries.move_to_end(key)
+                except KeyError:
+                    # 刚被其他线程淘汰或清除，本次仍然返回查到的值
+                    pass
+                counters[0] += 1
+                return entry.value
+            with self._lock:
+                # 只删除确实过期的这一项，期间可能已被其他线程替换
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                    self._expirations += 1
+        counters[1] += 1
+        return _MISSING
+
+    def put(self, key: Any, value: Any) -> None:
+        entry = _CacheEntry(value, time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._evict()
+
+    def _evict(self) -> None:
+        """从头部淘汰最久未使用的项，直到只剩容量的7/8（调用方持有锁）"""
+        target = self.max_size - max(1, self.max_size // 8)
+        while len(self._entries) > target:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = OrderedDict()
+    
+    def invalidate(self, predicate: Callable[[Any], bool]) -> int:
+        """删除键满足predicate的项，返回删除的项数"""
+        with self._lock:
+            # 先复制：不加锁的get()可能同时在调整顺序
+            items = list(self._entries.items())
+            entries = OrderedDict((key, entry) for key, entry in items if not predicate(key))
+            removed = len(items) - len(entries)
+            self._entries = entries
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """命中、未命中、淘汰和过期次数，以及当前大小"""
+        with self._lock:
+            self._retire_dead_threads()
+            hits, misses = self._retired
+            for _, counters in self._counters:
+                hits += counters[0]
+                misses += counters[1]
+            lookups = hits + misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+            }
+
+def diff_config(old: Any, new: Any, prefix: str = '') -> Dict[str, Dict[str, Any]]:
+    """
+    比较配置的两个版本，对象逐级比较，其他值（包括数组）整体比较
+    
+    Returns:
+        {'added': {键路径: 新值}, 'removed': {键路径: 旧值}, 'changed': {键路径: (旧值, 新值)}}，
+        键路径与get_value()使用的相同；没有变化时三项都为空
+    """
+    diff = {'added': {}, 'removed': {}, 'changed': {}}
+    _diff_into(diff, {} if old is None else old, {} if new is None else new, prefix)
+    return diff
+
+def _diff_into(diff: Dict[str, Dict[str, Any]], old: Any, new: Any, prefix: str) -> None:
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old.keys() - new.keys():
+            diff['removed'][prefix + key] = old[key]
+        for key in new.keys() - old.keys():
+            diff['added'][prefix + key] = new[key]
+        for key in old.keys() & new.keys():
+            _diff_into(diff, old[key], new[key], prefix + key + '.')
+    elif type(old) is not type(new) or old != new:
+        diff['changed'][prefix[:-1]] = (old, new)
+
+class ConfigAccessor:
+    """
+    预编译的配置项访问器
+    
+    键路径只在创建时拆分一次，当前值保存在value属性中，
+    读取配置就是一次属性访问。配置初始化或重新加载后由ConfigInterface自动更新。
+    """
+    
+    __slots__ = ('module_name', 'key_path', 'keys', 'default', 'value', '__weakref__')
+    
+    def __init__(self, module_name: str, key_path: str, default: Any = None):
+        self.module_name = module_name.lower()
+        self.key_path = key_path
+        self.keys = compile_key_path(key_path)
+        self.default = default
+        self.value = default
+    
+    def refresh(self, module_config: Any) -> None:
+        """按模块的最新配置更新value"""
+        found, value = resolve_key_path(module_config, self.keys) if module_config is not None else (False, None)
+        self.value = value if found else self.default
+    
+    def __repr__(self) -> str:
+        return f'ConfigAccessor({self.module_name!r}, {self.key_path!r}, value={self.value!r})'
+
 class ConfigInterface:
-    """配置接口类，用于引用JavaScript配置读取器并提供更丰富的接口"""
+    """配置接口类，在配置读取器之上提供缓存、访问器、事件和验证等接口"""
     
     _instance = None
     _lock = threading.RLock()  # 使用可重入锁
@@ -42,145 +224,56 @@ class ConfigInterface:
             if not hasattr(self, '_initialized'):
                 self._initialized = False
                 
-                # 获取JavaScript文件路径
-                self.js_file_path = os.path.join(
-                    os.path.dirname(os.path.abspath(__file__)),
-                    'config_reader.js'
-                )
-                
-                # 检查JavaScript文件是否存在
-                if not os.path.exists(self.js_file_path):
-                    raise ConfigInterfaceError(f'JavaScript配置读取器文件不存在: {self.js_file_path}')
+                # 在本进程内直接解析配置文件，不需要JavaScript引擎
+                self._reader = ConfigReader()
                 
-                # 初始化JS执行环境
-                self._init_js_environment()
-                
-                # 配置缓存
-                self._config_cache = {}
+                # 配置缓存：每项10秒后过期，最多保存1024项
+                self._config_cache = ConfigCache(max_size=1024, ttl=10)
                 self._cache_enabled = True
-                self._cache_ttl = 10  # 缓存过期时间（秒）
-                self._last_cache_update = 0
+                
+                # 拆分好的键路径，以及按模块分组的访问器（不再使用的访问器自动移除）
+                self._compiled_paths: Dict[str, Tuple[str, ...]] = {}
+                self._accessors: Dict[str, 'weakref.WeakSet[ConfigAccessor]'] = {}
                 
                 # 事件监听器
                 self._event_listeners = {}
                 
+                # 配置文件监视器（热重载），未启用时为None；
+                # 调用过start_watching()时不再按set.config中的HotReload启停
+                self._watcher: Optional[ConfigWatcher] = None
+                self._watch_explicit = False
+                
                 # 初始化完成
                 self._initialized = True
                 logger.info('配置接口初始化成功')
     
-    def _init_js_environment(self):
-        """初始化JavaScript执行环境"""
-        try:
-            # 尝试导入PyExecJS库（推荐）
-            try:
-                import execjs
-                self.js_engine = 'execjs'
-                self.js_context = execjs.compile(open(self.js_file_path, 'r', encoding='utf-8').read())
-                logger.info('使用PyExecJS执行JavaScript')
-            except ImportError:
-                # 尝试导入js2py库
-                try:
-                    import js2py
-                    self.js_engine = 'js2py'
-                    self.js_context = js2py.EvalJs()
-                    self.js_context.execute(open(self.js_file_path, 'r', encoding='utf-8').read())
-                    logger.info('使用js2py执行JavaScript')
-                except ImportError:
-                    # 尝试使用简单的JSON解析作为备选方案
-                    self.js_engine = 'fallback'
-                    self._js_fallback()
-                    logger.warning('使用备选方案（直接解析JSON配置文件）')
-        except Exception as e:
-            raise ConfigInterfaceError(f'初始化JavaScript执行环境失败: {str(e)}')
-    
-    def _js_fallback(self):
-        """备选方案：直接解析JSON配置文件"""
-        self._fallback_configs = {}
-        self._config_dir = "c:/Users/Administrator/Documents/GitHub/CompearProject/ConfigDir"
-        
-        # 尝试加载set.config（简化版本）
-        set_config_path = os.path.join(self._config_dir, 'set.config')
-        if os.path.exists(set_config_path):
-            try:
-                with open(set_config_path, 'r', encoding='utf-8') as f:
-                    self._fallback_global = self._parse_ini(f.read())
-            except Exception as e:
-                logger.error(f'解析set.config文件失败: {str(e)}')
-                self._fallback_global = {}
-        else:
-            self._fallback_global = {}
-    
-    def _parse_ini(self, content: str) -> Dict[str, Dict[str, Any]]:
-        """简单的INI文件解析器"""
-        result = {}
-        current_section = None
-        
-        for line in content.split('\n'):
-            line = line.strip()
-            
-            # 跳过注释和空行
-            if line.startswith(';') or line == '':
-                continue
-            
-            # 检查是否是section
-            if line.startswith('[') and line.endswith(']'):
-                current_section = line[1:-1].strip()
-                result[current_section] = {}
-            elif current_section and '=' in line:
-                # 解析键值对
-                key, value = line.split('=', 1)
-                key = key.strip()
-                value = value.strip()
-                
-                # 尝试转换值的类型
-                if value.lower() == 'true':
-                    result[current_section][key] = True
-                elif value.lower() == 'false':
-                    result[current_section][key] = False
-                elif value.isdigit():
-                    result[current_section][key] = int(value)
-                elif value.replace('.', '', 1).isdigit() and value.count('.') == 1:
-                    result[current_section][key] = float(value)
-                else:
-                    result[current_section][key] = value
-        
-        return result
-    
-    def init(self, config_dir: Optional[str] = None) -> None:
+    def init(self, config_dir: Optional[str] = None, preload: Optional[List[str]] = None) -> None:
         """
         初始化配置读取器
         
+        只解析set.config，各模块的配置在第一次访问时才加载，之后一直使用加载的结果
+        
         Args:
             config_dir: 配置目录路径，如果为None则使用默认路径
+                （默认路径在本机不存在时使用本仓库中的ConfigDir）
+            preload: 需要立即加载的模块，例如['web']；加载失败时会在这里记录警告，而不是等到第一次访问
+        
+        示例:
+            config_interface.init(preload=['web'])
         """
         try:
-            if self.js_engine == 'fallback':
-                # 备选方案下的初始化
-                if config_dir:
-                    self._config_dir = config_dir
-                
-                # 尝试加载所有已知的配置文件
-                for module_name in ['aipart', 'hardware', 'maincode', 'web']:
-                    file_path = os.path.join(self._config_dir, f'{module_name}.dir')
-                    if os.path.exists(file_path):
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                self._fallback_configs[module_name] = json.load(f)
-                        except Exception as e:
-                            logger.error(f'解析{file_path}文件失败: {str(e)}')
-            else:
-                # 使用JavaScript引擎初始化
-                if config_dir:
-                    self.js_context.call('ConfigReader.init', config_dir)
-                else:
-                    self.js_context.call('ConfigReader.init')
-                
+            self._reader.init(config_dir, preload=preload)
+            
             # 清除缓存
             self.clear_cache()
+            self._refresh_accessors()
             
             # 触发初始化事件
             self._trigger_event('init')
             
+            # 按set.config中的HotReload设置启动或停止热重载
+            self._configure_hot_reload()
+            
         except Exception as e:
             raise ConfigInterfaceError(f'配置读取器初始化失败: {str(e)}')
     
@@ -191,14 +284,7 @@ class ConfigInterface:
         Returns:
             全局配置对象
         """
-        try:
-            if self.js_engine == 'fallback':
-                return self._fallback_global
-            else:
-                return self.js_context.call('ConfigReader.getGlobalConfig')
-        except Exception as e:
-            logger.error(f'获取全局配置失败: {str(e)}')
-            return {}
+        return self._reader.get_global_config()
     
     def get_module_config(self, module_name: str) -> Optional[Dict[str, Any]]:
         """
@@ -210,21 +296,20 @@ class ConfigInterface:
         Returns:
             模块配置对象或None
         """
-        cache_key = f'module_{module_name}'
+        cache_key = ('module', module_name.lower())
         
         # 检查缓存
-        if self._cache_enabled and cache_key in self._config_cache:
-            return self._config_cache[cache_key]
+        if self._cache_enabled:
+            cached = self._config_cache.get(cache_key)
+            if cached is not _MISSING:
+                return cached
         
         try:
-            if self.js_engine == 'fallback':
-                config = self._fallback_configs.get(module_name.lower(), None)
-            else:
-                config = self.js_context.call('ConfigReader.getModuleConfig', module_name)
+            config = self._reader.get_module_config(module_name)
             
             # 更新缓存
             if self._cache_enabled:
-                self._config_cache[cache_key] = config
+                self._config_cache.put(cache_key, config)
             
             return config
         except Exception as e:
@@ -268,28 +353,20 @@ class ConfigInterface:
         return self.get_module_config('web')
     
     def reload(self) -> None:
-        """重新加载所有配置"""
+        """重新加载set.config和已经用到的模块配置（其余模块仍在第一次访问时加载）"""
         try:
-            if self.js_engine != 'fallback':
-                self.js_context.call('ConfigReader.reload')
-            else:
-                # 备选方案下的重新加载
-                self._js_fallback()
-                for module_name in self._fallback_configs:
-                    file_path = os.path.join(self._config_dir, f'{module_name}.dir')
-                    if os.path.exists(file_path):
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                self._fallback_configs[module_name] = json.load(f)
-                        except Exception as e:
-                            logger.error(f'重新加载{file_path}文件失败: {str(e)}')
-            
-            # 清除缓存
-            self.clear_cache()
+            with self._lock:
+                self._reader.reload()
+                
+                # 清除缓存
+                self.clear_cache()
+                self._refresh_accessors()
             
             # 触发重新加载事件
             self._trigger_event('reload')
             
+            self._configure_hot_reload()
+            
             logger.info('所有配置重新加载完成')
         except Exception as e:
             raise ConfigInterfaceError(f'重新加载配置失败: {str(e)}')
@@ -306,41 +383,179 @@ class ConfigInterface:
         Returns:
             配置值或默认值
         """
-        cache_key = f'{module_name}_{key_path}'
+        # 元组作为缓存键，不同的模块名和键路径组合不会互相冲突；
+        # 缓存中记录是否找到，而不是调用方的默认值，不同调用方的默认值互不影响
+        module_name = module_name.lower()
+        cache_key = ('value', module_name, key_path)
         
         # 检查缓存
-        if self._cache_enabled and cache_key in self._config_cache:
-            return self._config_cache[cache_key]
+        if self._cache_enabled:
+            cached = self._config_cache.get(cache_key)
+            if cached is not _MISSING:
+                found, config_value = cached
+                return config_value if found else default_value
         
         try:
-            if self.js_engine == 'fallback':
-                # 备选方案下的实现
-                module_config = self.get_module_config(module_name)
-                if not module_config:
-                    return default_value
-                
-                keys = key_path.split('.')
-                value = module_config
-                
-                for key in keys:
-                    if isinstance(value, dict) and key in value:
-                        value = value[key]
-                    else:
-                        return default_value
-                
-                config_value = value
-            else:
-                config_value = self.js_context.call('ConfigReader.getValue', module_name, key_path, default_value)
+            keys = self._compiled_paths.get(key_path)
+            if keys is None:
+                keys = self._compiled_paths[key_path] = compile_key_path(key_path)
+            
+            # 在（缓存的）模块配置上按与getValue相同的规则查找
+            module_config = self.get_module_config(module_name)
+            found, config_value = resolve_key_path(module_config, keys) if module_config is not None else (False, None)
             
             # 更新缓存
             if self._cache_enabled:
-                self._config_cache[cache_key] = config_value
+                self._config_cache.put(cache_key, (found, config_value))
             
-            return config_value
+            return config_value if found else default_value
         except Exception as e:
             logger.error(f'获取{module_name}.{key_path}配置值失败: {str(e)}')
             return default_value
     
+    def accessor(self, module_name: str, key_path: str, default_value: Any = None) -> ConfigAccessor:
+        """
+        创建配置项访问器，适合在需要频繁读取同一配置项的地方使用
+        
+        Args:
+            module_name: 模块名称
+            key_path: 键路径，使用点分隔，例如："server.port"
+            default_value: 配置项不存在时的值
+        
+        Returns:
+            ConfigAccessor，通过.value读取当前值，配置重新加载后自动更新
+        
+        示例:
+            port = config_interface.accessor('web', 'server.port', 8080)
+            port.value
+        """
+        accessor = ConfigAccessor(module_name, key_path, default_value)
+        with self._lock:
+            accessor.refresh(self.get_module_config(accessor.module_name))
+            self._accessors.setdefault(accessor.module_name, weakref.WeakSet()).add(accessor)
+        return accessor
+    
+    def _refresh_accessors(self, module_names=None) -> None:
+        """
+        按最新配置更新访问器
+        
+        Args:
+            module_names: 需要更新的模块，None表示全部
+        """
+        with self._lock:
+            names = list(self._accessors) if module_names is None else module_names
+            for name in names:
+                accessors = self._accessors.get(name)
+                if not accessors:
+                    continue
+                module_config = self.get_module_config(name)
+                for accessor in list(accessors):
+                    accessor.refresh(module_config)
+    
+    def start_watching(self, debounce: float = 0.2, poll_interval: float = 2.0, use_inotify: bool = True) -> None:
+        """
+        开始监视set.config和各模块的.dir文件，文件修改后自动重新加载
+        
+        只重新加载发生变化的模块，清除该模块的缓存项、更新访问器，
+        并触发module_changed事件（参数为模块名和diff_config()的结果）；
+        set.config变化时重新加载所有配置并触发reload事件。
+        
+        Args:
+            debounce: 文件在这么多秒内不再变化后才重新加载，连续保存只加载一次
+            poll_interval: inotify不可用时检查文件的间隔（秒）
+            use_inotify: 是否使用inotify（仅Linux），为False时总是定期检查
+        """
+        self._watch_explicit = True
+        self._start_watcher(debounce, poll_interval, use_inotify)
+    
+    def stop_watching(self) -> None:
+        """停止监视配置文件"""
+        self._watch_explicit = False
+        self._stop_watcher()
+    
+    def _start_watcher(self, debounce: float = 0.2, poll_interval: float = 2.0, use_inotify: bool = True) -> None:
+        with self._lock:
+            self._stop_watcher()
+            self._watcher = ConfigWatcher(self._watched_paths(), self._on_config_files_changed,
+                                          debounce=debounce, poll_interval=poll_interval,
+                                          use_inotify=use_inotify)
+            self._watcher.start()
+    
+    def _stop_watcher(self) -> None:
+        with self._lock:
+            watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            watcher.stop()
+            logger.info('已停止监视配置文件')
+    
+    @property
+    def watching(self) -> bool:
+        return self._watcher is not None
+    
+    def _configure_hot_reload(self) -> None:
+        """按set.config的[Global]中的HotReload和ReloadInterval启动或停止监视，并更新监视的文件"""
+        with self._lock:
+            if self._watch_explicit:
+                if self._watcher is not None:
+                    self._watcher.set_paths(self._watched_paths())
+                return
+            settings = self._reader.get_global_config().get('Global', {})
+            if settings.get('HotReload') is True:
+                # ReloadInterval只用于没有inotify时定期检查文件的间隔
+                interval = settings.get('ReloadInterval')
+                poll_interval = interval if isinstance(interval, (int, float)) and interval > 0 else 2.0
+                if self._watcher is None or self._watcher.poll_interval != poll_interval:
+                    self._start_watcher(poll_interval=poll_interval)
+                else:
+                    self._watcher.set_paths(self._watched_paths())
+            else:
+                self._stop_watcher()
+    
+    def _watched_paths(self) -> list:
+        return [self._reader.set_config_path, *self._reader.module_paths().values()]
+    
+    def _on_config_files_changed(self, paths) -> None:
+        """监视线程中的回调：重新加载发生变化的文件对应的模块"""
+        if normalize_path(self._reader.set_config_path) in paths:
+            # 模块的路径和热重载设置都可能变了，重新加载全部配置，只通知内容有变化的模块
+            old_configs = self._reader.module_configs
+            try:
+                self.reload()
+            except ConfigInterfaceError as e:
+                logger.error(str(e))
+                return
+            new_configs = self._reader.module_configs
+            for module_name in old_configs.keys() | new_configs.keys():
+                diff = diff_config(old_configs.get(module_name), new_configs.get(module_name))
+                if any(diff.values()):
+                    self._trigger_event('module_changed', module_name, diff)
+            return
+        
+        changes = []
+        with self._lock:
+            for module_name, file_path in self._reader.module_paths().items():
+                if normalize_path(file_path) not in paths:
+                    continue
+                old_config = self._reader.module_configs.get(module_name)
+                try:
+                    new_config = self._reader.reload_module(module_name)
+                except (OSError, ValueError) as e:
+                    # 文件可能还没写完或内容有误，保留旧配置，下次保存时再加载
+                    logger.error(f'重新加载{module_name}模块配置失败，继续使用旧配置: {file_path}, 错误: {e}')
+                    continue
+                diff = diff_config(old_config, new_config)
+                if not any(diff.values()):
+                    continue
+                # 只清除这个模块的缓存项：('module', 模块名)和('value', 模块名, 键路径)
+                self._config_cache.invalidate(lambda key: key[1] == module_name)
+                self._refresh_accessors([module_name])
+                changes.append((module_name, diff))
+                logger.info(f'{module_name}模块配置已重新加载')
+        
+        # 在锁外通知监听器，监听器中可以再读取配置
+        for module_name, diff in changes:
+            self._trigger_event('module_changed', module_name, diff)
+    
     def set_cache_enabled(self, enabled: bool) -> None:
         """
         设置是否启用缓存
@@ -359,12 +574,29 @@ class ConfigInterface:
         Args:
             ttl: 缓存过期时间（秒）
         """
-        self._cache_ttl = max(0, ttl)
+        self._config_cache.ttl = max(0, ttl)
+    
+    def set_cache_size(self, max_size: int) -> None:
+        """
+        设置缓存最多保存的项数
+        
+        Args:
+            max_size: 容量上限，超过后淘汰最久未使用的项
+        """
+        self._config_cache.max_size = max(1, max_size)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+        
+        Returns:
+            包含size、hits、misses、hit_rate、evictions、expirations等字段的字典
+        """
+        return self._config_cache.stats()
     
     def clear_cache(self) -> None:
         """清除配置缓存"""
-        self._config_cache = {}
-        self._last_cache_update = 0
+        self._config_cache.clear()
         logger.debug('配置缓存已清除')
     
     def register_event_listener(self, event_name: str, callback: Callable) -> None:
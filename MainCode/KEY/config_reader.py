@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+配置读取器（Python实现）
+
+与config_reader.js中的ConfigReader读取同样的文件、给出同样的结果：
+- set.config按INI解析，值的类型转换与JavaScript一致（true/false、Number()能转换的数字、其他为字符串）
+- [Paths]中的每一项是一个模块的.dir文件（JSON），模块名为键的小写形式
+- getValue按点分隔的键路径逐级查找，找不到时返回默认值
+
+在Python进程内直接解析文件，不需要启动JavaScript引擎。
+init()只解析set.config，各模块的.dir文件在第一次被访问时才加载，之后一直使用加载的结果，
+进程只用到其中几个模块时，其余模块的文件不会被打开。
+与config_reader.js唯一不同的地方：[Paths]中的绝对路径在本机不存在时（例如在Linux上读取
+写着Windows路径的set.config），改为在配置目录中查找同名文件。
+
+两者结果是否一致由tests/test_config_reader.py对比（需要Node.js）。
+"""
+
+import json
+import logging
+import math
+import ntpath
+import os
+import re
+import sys
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger('ConfigReader')
+
+# config_reader.js中的默认配置目录
+DEFAULT_CONFIG_DIR = 'c:/Users/Administrator/Documents/GitHub/CompearProject/ConfigDir'
+
+# 本仓库中的配置目录，默认目录不存在时使用
+REPO_CONFIG_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'ConfigDir'))
+
+# JavaScript的String.prototype.trim()去掉的字符（空白符和行终止符，包括BOM）
+_JS_WHITESPACE = (
+    '\t\n\v\f\r \u00a0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006'
+    '\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000\ufeff'
+)
+
+# Number()接受的字符串（已去掉首尾空白）：十进制数（可带符号和指数）、Infinity，或不带符号的0x/0o/0b整数
+_JS_DECIMAL_RE = re.compile(r'[+-]?(?:Infinity|(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)\Z')
+_JS_NON_DECIMAL_RE = re.compile(r'0(?:[xX][0-9a-fA-F]+|[oO][0-7]+|[bB][01]+)\Z')
+
+# 数组下标的规范形式（"01"、"-1"、"1.0"都不是下标）
+_ARRAY_INDEX_RE = re.compile(r'(?:0|[1-9][0-9]*)\Z')
+
+
+def js_trim(text: str) -> str:
+    return text.strip(_JS_WHITESPACE)
+
+
+def _js_number_value(number: float) -> Any:
+    """JavaScript的数字在Python中的表示：整数值用int，其余（小数、Infinity）用float"""
+    if math.isfinite(number) and number.is_integer() and abs(number) < 1e21:
+        return int(number)
+    return number
+
+
+def js_number(text: str) -> Optional[Any]:
+    """
+    按JavaScript的Number(text)转换字符串
+
+    Returns:
+        转换后的数字，Number()会得到NaN时返回None
+    """
+    text = js_trim(text)
+    if text == '':
+        return 0
+    if _JS_DECIMAL_RE.match(text):
+        return _js_number_value(float(text))
+    if _JS_NON_DECIMAL_RE.match(text):
+        return _js_number_value(float(int(text, 0)))
+    return None
+
+
+def convert_ini_value(value: str) -> Any:
+    """set.config中值的类型转换，与config_reader.js的_loadSetConfig一致"""
+    if value.lower() == 'true':
+        return True
+    if value.lower() == 'false':
+        return False
+    number = js_number(value)
+    return value if number is None else number
+
+
+def parse_ini(content: str) -> Dict[str, Dict[str, Any]]:
+    """
+    解析set.config的内容
+
+    分号开头的行是注释；同名的section再次出现时重新开始；
+    第一个section之前的键值对被忽略；键值对按第一个等号拆分。
+    """
+    config: Dict[str, Dict[str, Any]] = {}
+    current_section = None
+
+    for line in content.split('\n'):
+        line = js_trim(line)
+
+        # 跳过注释和空行
+        if line.startswith(';') or line == '':
+            continue
+
+        if line.startswith('[') and line.endswith(']'):
+            current_section = js_trim(line[1:-1])
+            config[current_section] = {}
+        elif current_section and '=' in line:
+            key, value = line.split('=', 1)
+            config[current_section][js_trim(key)] = convert_ini_value(js_trim(value))
+
+    return config
+
+
+def _reject_constant(name: str) -> Any:
+    raise ValueError(f'无效的JSON值: {name}')
+
+
+def parse_dir_file(content: str) -> Any:
+    """解析.dir文件的内容，与JSON.parse一样不接受NaN和Infinity"""
+    return json.loads(content, parse_constant=_reject_constant)
+
+
+def js_truthy(value: Any) -> bool:
+    """JavaScript中的真假判断：null、false、0、NaN和空字符串为假，对象和数组（包括空的）为真"""
+    if value is None or value is False:
+        return False
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value == value and value != 0
+    if isinstance(value, str):
+        return value != ''
+    return True
+
+
+def compile_key_path(key_path: str) -> Tuple[str, ...]:
+    """把点分隔的键路径拆成各级键，例如 "server.port" -> ('server', 'port')"""
+    return tuple(key_path.split('.'))
+
+
+def resolve_key_path(config: Any, keys: Tuple[str, ...]) -> Tuple[bool, Any]:
+    """
+    按各级键在配置中查找值，与config_reader.js中getValue的规则一致：
+    对象按键查找，数组按下标查找（以及length），其他类型无法继续向下查找
+
+    Returns:
+        (是否找到, 值)
+    """
+    value = config
+    for key in keys:
+        if isinstance(value, dict):
+            if key not in value:
+                return False, None
+            value = value[key]
+        elif isinstance(value, list):
+            if key == 'length':
+                value = len(value)
+            elif _ARRAY_INDEX_RE.match(key) and int(key) < len(value):
+                value = value[int(key)]
+            else:
+                return False, None
+        else:
+            return False, None
+    return True, value
+
+
+class ConfigReader:
+    """读取ConfigDir中的set.config和各个.dir文件，模块配置按需加载"""
+
+    def __init__(self):
+        self.config_dir = DEFAULT_CONFIG_DIR
+        self.set_config_path = DEFAULT_CONFIG_DIR + '/set.config'
+        self.global_config: Dict[str, Dict[str, Any]] = {}
+        # 已加载的模块配置；每次变化都换成一个新的字典，读取时不需要加锁
+        self.module_configs: Dict[str, Any] = {}
+        # [Paths]中各模块的文件路径，以及加载失败的模块（重新加载之前不再尝试）
+        self._paths: Dict[str, str] = {}
+        self._failed = frozenset()
+        self._load_lock = threading.Lock()
+
+    def init(self, config_dir: Optional[str] = None, preload: Optional[Iterable[str]] = None) -> None:
+        """
+        初始化配置读取器
+
+        Args:
+            config_dir: 配置目录路径，为None时使用默认目录
+                （默认目录在本机不存在时使用本仓库中的ConfigDir）
+            preload: 立即加载的模块，其余模块在第一次访问时加载
+
+        Raises:
+            FileNotFoundError: set.config不存在
+        """
+        if config_dir:
+            self.config_dir = config_dir
+        elif not os.path.isdir(self.config_dir):
+            self.config_dir = REPO_CONFIG_DIR
+        self.set_config_path = self.config_dir + '/set.config'
+
+        if not os.path.exists(self.set_config_path):
+            raise FileNotFoundError(f'配置文件不存在: {self.set_config_path}')
+
+        self._load_global(())
+        for module_name in preload or ():
+            self._load_module(module_name.lower())
+        logger.debug('配置读取器初始化成功')
+
+    def _load_set_config(self) -> Dict[str, Dict[str, Any]]:
+        # 文本模式按\n、\r\n和\r分行，与Java的BufferedReader.readLine一致
+        with open(self.set_config_path, 'r', encoding='utf-8') as f:
+            return parse_ini(f.read())
+
+    def _load_global(self, reload_modules: Iterable[str]) -> None:
+        """解析set.config，清空已加载的模块，再立即加载reload_modules中仍在[Paths]里的模块"""
+        global_config = self._load_set_config()
+        with self._load_lock:
+            self.global_config = global_config
+            self._paths = self._resolve_module_paths()
+            self._failed = frozenset()
+            configs = {}
+            for module_name in reload_modules:
+                if module_name in self._paths:
+                    try:
+                        configs[module_name] = self._read_module(module_name)
+                    except (OSError, ValueError):
+                        self._failed |= {module_name}
+            self.module_configs = configs
+
+    def module_paths(self) -> Dict[str, str]:
+        """[Paths]中各模块的.dir文件路径，键为小写的模块名"""
+        return dict(self._paths)
+
+    def module_names(self):
+        """[Paths]中的所有模块（不论是否已加载）"""
+        return list(self._paths)
+
+    def _resolve_module_paths(self) -> Dict[str, str]:
+        """
+        相对路径相对于配置目录；值不是字符串（例如写成了数字）的项被跳过，
+        与config_reader.js中加载失败的模块一样
+        """
+        paths = {}
+        for module_name, file_path in self.global_config.get('Paths', {}).items():
+            if not isinstance(file_path, str):
+                logger.warning(f'{module_name}模块的配置文件路径无效: {file_path!r}')
+                continue
+            paths[module_name.lower()] = self.resolve_path(file_path)
+        return paths
+
+    def resolve_path(self, file_path: str) -> str:
+        """把[Paths]中的路径转换为本机上的路径"""
+        if not file_path.startswith('/') and ':' not in file_path:
+            return self.config_dir + '/' + file_path
+        if not os.path.exists(file_path):
+            # 其他机器上的绝对路径，改为在配置目录中查找同名文件
+            local_path = os.path.join(self.config_dir, ntpath.basename(file_path))
+            if os.path.exists(local_path):
+                return local_path
+        return file_path
+
+    @staticmethod
+    def load_dir_file(file_path: str) -> Any:
+        """
+        加载一个.dir文件
+
+        Raises:
+            OSError: 文件不存在或无法读取
+            ValueError: 文件内容不是有效的JSON
+        """
+        with open(file_path, 'r', encoding='utf-8') as f:
+            config = parse_dir_file(f.read())
+        logger.debug(f'成功加载配置文件: {file_path}')
+        return config
+
+    def _read_module(self, module_name: str) -> Any:
+        """读取模块的.dir文件，失败时记录警告并抛出异常"""
+        file_path = self._paths[module_name]
+        try:
+            return self.load_dir_file(file_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f'加载{module_name}模块配置失败: {file_path}, 错误: {e}')
+            raise
+
+    def _load_module(self, module_name: str) -> Any:
+        """返回模块配置，第一次访问时加载；模块不存在或加载失败时返回None"""
+        configs = self.module_configs
+        if module_name in configs:
+            return configs[module_name]
+        if module_name not in self._paths or module_name in self._failed:
+            return None
+        with self._load_lock:
+            # 等锁期间其他线程可能已经加载了这个模块
+            if module_name in self.module_configs:
+                return self.module_configs[module_name]
+            if module_name not in self._paths or module_name in self._failed:
+                return None
+            try:
+                config = self._read_module(module_name)
+            except (OSError, ValueError):
+                self._failed |= {module_name}
+                return None
+            self.module_configs = {**self.module_configs, module_name: config}
+            return config
+
+    def is_loaded(self, module_name: str) -> bool:
+        return module_name.lower() in self.module_configs
+
+    def get_global_config(self) -> Dict[str, Dict[str, Any]]:
+        return self.global_config
+
+    def get_module_config(self, module_name: str) -> Any:
+        """获取模块配置，模块不存在（或配置在JavaScript中为假值）时返回None"""
+        config = self._load_module(module_name.lower())
+        return config if js_truthy(config) else None
+
+    def get_ai_config(self) -> Any:
+        return self.get_module_config('aipart')
+
+    def get_hardware_config(self) -> Any:
+        return self.get_module_config('hardware')
+
+    def get_main_code_config(self) -> Any:
+        return self.get_module_config('maincode')
+
+    def get_web_config(self) -> Any:
+        return self.get_module_config('web')
+
+    def reload(self) -> None:
+        """重新加载set.config和已经用到的模块配置，其余模块仍在第一次访问时加载"""
+        self._load_global(list(self.module_configs) + list(self._failed))
+        logger.debug('所有配置重新加载完成')
+
+    def reload_module(self, module_name: str) -> Any:
+        """
+        只重新加载一个模块，返回新的配置
+
+        新配置放进一个新的字典后整体替换，其他线程读到的要么是旧配置要么是新配置；
+        加载失败时抛出异常并保留旧配置。模块已不在[Paths]中时移除它，返回None。
+        还没有访问过的模块不需要加载，返回None，第一次访问时自然会读到最新的文件。
+
+        Raises:
+            OSError: 文件不存在或无法读取
+            ValueError: 文件内容不是有效的JSON
+        """
+        module_name = module_name.lower()
+        with self._load_lock:
+            configs = dict(self.module_configs)
+            if module_name not in self._paths:
+                configs.pop(module_name, None)
+            elif module_name in configs or module_name in self._failed:
+                configs[module_name] = self.load_dir_file(self._paths[module_name])
+                self._failed -= {module_name}
+            self.module_configs = configs
+            return configs.get(module_name)
+
+    def get_value(self, module_name: str, key_path: str, default_value: Any = None) -> Any:
+        """
+        获取配置中的特定值
+
+        Args:
+            module_name: 模块名称
+            key_path: 键路径，使用点分隔，例如："server.port"
+            default_value: 默认值
+        """
+        module_config = self.get_module_config(module_name)
+        if module_config is None:
+            return default_value
+        found, value = resolve_key_path(module_config, compile_key_path(key_path))
+        return value if found else default_value
+
+
+# 示例使用：python config_reader.py [配置目录]
+if __name__ == '__main__':
+    reader = ConfigReader()
+    try:
+        reader.init(sys.argv[1] if len(sys.argv) > 1 else None)
+    except (OSError, ValueError) as e:
+        print(f'错误: {e}')
+        sys.exit(1)
+
+    print('全局配置:')
+    print(json.dumps(reader.get_global_config(), ensure_ascii=False, indent=2))
+    for name in reader.module_names():
+        print(f'\n{name}模块配置:')
+        print(json.dumps(reader.get_module_config(name), ensure_ascii=False, indent=2))
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+配置文件监视器
+
+监视set.config和各模块的.dir文件，文件被修改后调用回调函数。
+- Linux上使用inotify（通过ctypes调用libc），文件变化时立即得到通知，空闲时不占用CPU
+- 其他系统或inotify不可用时改为定期stat文件（修改时间、大小和inode）
+
+编辑器保存文件时常常连续产生多个事件（截断、写入、重命名），
+监视器等到文件在debounce秒内不再变化后才把这一批变化一起交给回调函数。
+监视的是文件所在的目录，通过重命名替换文件（原子保存）也能发现。
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from typing import Callable, Iterable, Optional, Set
+
+logger = logging.getLogger('ConfigWatcher')
+
+# 最后一次变化之后等待多久再通知（秒）
+DEFAULT_DEBOUNCE = 0.2
+
+# 没有inotify时检查文件的间隔（秒）
+DEFAULT_POLL_INTERVAL = 2.0
+
+# inotify事件（<sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ONLYDIR = 0x01000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_ONLYDIR)
+
+# struct inotify_event的固定部分：wd、mask、cookie、len
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def normalize_path(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+class InotifyBackend:
+    """用inotify监视文件所在的目录"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), '调用inotify_init1失败')
+        self._fd = fd
+        # 用一个管道唤醒等待中的select，停止监视时不需要等到超时
+        self._wake_r, self._wake_w = os.pipe()
+        self._dirs = {}  # 监视描述符 -> 目录
+        self._watched_dirs = set()
+        self._paths: Set[str] = set()
+
+    def set_paths(self, paths: Set[str]) -> None:
+        self._paths = paths
+        for directory in {os.path.dirname(path) for path in paths} - self._watched_dirs:
+            wd = self._add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                logger.warning(f'无法监视目录{directory}: {os.strerror(ctypes.get_errno())}')
+                continue
+            self._dirs[wd] = directory
+            self._watched_dirs.add(directory)
+
+    def wait(self, timeout: float) -> Set[str]:
+        """等待最多timeout秒，返回发生变化的被监视文件"""
+        ready, _, _ = select.select([self._fd, self._wake_r], [], [], timeout)
+        if self._wake_r in ready:
+            os.read(self._wake_r, 512)
+        if self._fd not in ready:
+            return set()
+
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    # 事件队列溢出，不知道哪些文件变了，全部重新加载
+                    changed |= self._paths
+                elif wd in self._dirs and name:
+                    path = normalize_path(os.path.join(self._dirs[wd], os.fsdecode(name)))
+                    if path in self._paths:
+                        changed.add(path)
+        return changed
+
+    def wake(self) -> None:
+        os.write(self._wake_w, b'x')
+
+    def close(self) -> None:
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            os.close(fd)
+
+
+class PollingBackend:
+    """定期检查文件的修改时间、大小和inode"""
+
+    def __init__(self, interval: float = DEFAULT_POLL_INTERVAL):
+        self.interval = interval
+        self._wake = threading.Event()
+        self._signatures = {}
+
+    @staticmethod
+    def _signature(path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def set_paths(self, paths: Set[str]) -> None:
+        self._signatures = {
+            path: self._signatures[path] if path in self._signatures else self._signature(path)
+            for path in paths
+        }
+
+    def wait(self, timeout: float) -> Set[str]:
+        if self._wake.wait(timeout):
+            self._wake.clear()
+        changed = set()
+        for path, signature in list(self._signatures.items()):
+            current = self._signature(path)
+            if current != signature:
+                self._signatures[path] = current
+                changed.add(path)
+        return changed
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def close(self) -> None:
+        pass
+
+
+class ConfigWatcher:
+    """
+    在后台线程中监视一组文件
+
+    callback在监视线程中被调用，参数为这一批发生变化的文件（规范化后的绝对路径）；
+    回调中可以调用set_paths()更新监视的文件。
+    """
+
+    def __init__(self, paths: Iterable[str], callback: Callable[[Set[str]], None],
+                 debounce: float = DEFAULT_DEBOUNCE, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 use_inotify: bool = True):
+        self.callback = callback
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.backend = None
+        if use_inotify:
+            try:
+                self.backend = InotifyBackend()
+            except (OSError, AttributeError) as e:
+                # 不是Linux，或者inotify实例数达到上限
+                logger.info(f'inotify不可用，改为定期检查配置文件: {e}')
+        if self.backend is None:
+            self.backend = PollingBackend(poll_interval)
+        self.set_paths(paths)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def mode(self) -> str:
+        return 'inotify' if isinstance(self.backend, InotifyBackend) else 'polling'
+
+    def set_paths(self, paths: Iterable[str]) -> None:
+        self.backend.set_paths({normalize_path(path) for path in paths})
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='config-watcher', daemon=True)
+            self._thread.start()
+            logger.info(f'开始监视配置文件（{self.mode}）')
+
+    def stop(self) -> None:
+        """停止监视；可以在回调中调用"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        thread = self._thread
+        if thread is None:
+            self.backend.close()
+            return
+        self.backend.wake()
+        if thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self) -> None:
+        # 空闲时inotify一直等待事件，轮询方式每隔poll_interval检查一次
+        idle_timeout = self.poll_interval if isinstance(self.backend, PollingBackend) else None
+        pending = set()
+        deadline = None
+        try:
+            while not self._stop.is_set():
+                timeout = idle_timeout if deadline is None else max(0.0, deadline - time.monotonic())
+                changed = self.backend.wait(timeout)
+                if self._stop.is_set():
+                    break
+                if changed:
+                    # 还在变化，重新开始计时
+                    pending |= changed
+                    deadline = time.monotonic() + self.debounce
+                elif deadline is not None and time.monotonic() >= deadline:
+                    batch, pending, deadline = pending, set(), None
+                    try:
+                        self.callback(batch)
+                    except Exception as e:
+                        logger.error(f'处理配置文件变化失败: {e}')
+        finally:
+            self.backend.close()
@@ -0,0 +1,38 @@
+import json
+import os
+import sys
+
+import pytest
+
+# 配置模块平铺在KEY目录中，测试直接按模块名导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def config_dir(tmp_path):
+    """包含set.config、Web.dir和AIPart.dir的临时配置目录"""
+    (tmp_path / 'set.config').write_text(
+        '[Paths]\nWeb = Web.dir\nAIPart = AIPart.dir\n\n[Global]\nHotReload = false\n', encoding='utf-8')
+    (tmp_path / 'Web.dir').write_text(json.dumps({'server': {'port': 8080, 'hosts': ['a', 'b']}}), encoding='utf-8')
+    (tmp_path / 'AIPart.dir').write_text(json.dumps({'version': '1.0'}), encoding='utf-8')
+    return tmp_path
+
+
+@pytest.fixture
+def write_config(config_dir):
+    """改写配置目录中的一个文件，data不是字符串时写成JSON"""
+    def write(name, data):
+        text = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+        (config_dir / name).write_text(text, encoding='utf-8')
+    return write
+
+
+@pytest.fixture
+def interface(config_dir, monkeypatch):
+    """使用临时配置目录的ConfigInterface（不影响模块级的单例）"""
+    from config_interface import ConfigInterface
+    monkeypatch.setattr(ConfigInterface, '_instance', None)
+    interface = ConfigInterface()
+    interface.init(str(config_dir))
+    yield interface
+    interface.stop_watching()
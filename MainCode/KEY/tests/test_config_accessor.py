@@ -0,0 +1,57 @@
+"""预编译的配置项访问器和get_value"""
+
+import gc
+
+from config_interface import ConfigAccessor
+
+
+def test_accessor_reads_current_value(interface):
+    port = interface.accessor('Web', 'server.port', 80)
+    host = interface.accessor('web', 'server.hosts.1')
+    missing = interface.accessor('web', 'server.missing', 'default')
+    assert port.module_name == 'web'
+    assert (port.value, host.value, missing.value) == (8080, 'b', 'default')
+    assert interface.accessor('unknown', 'a.b', 1).value == 1
+
+
+def test_accessor_follows_reload(interface, write_config):
+    port = interface.accessor('web', 'server.port', 80)
+    write_config('Web.dir', {'server': {'port': 9090}})
+    interface.reload()
+    assert port.value == 9090
+
+    # 配置项被删除后回到默认值
+    write_config('Web.dir', {'server': {}})
+    interface.reload()
+    assert port.value == 80
+
+
+def test_unused_accessors_are_dropped(interface):
+    interface.accessor('web', 'server.port')
+    kept = interface.accessor('web', 'server.hosts')
+    gc.collect()
+    assert list(interface._accessors['web']) == [kept]
+
+
+def test_refresh_without_module_config():
+    accessor = ConfigAccessor('web', 'server.port', 80)
+    accessor.refresh({'server': {'port': 1}})
+    assert accessor.value == 1
+    accessor.refresh(None)
+    assert accessor.value == 80
+
+
+def test_get_value_defaults_are_per_call(interface):
+    # 缓存的是"没找到"，不是第一次调用方的默认值
+    assert interface.get_value('web', 'server.missing', 1) == 1
+    assert interface.get_value('web', 'server.missing', 2) == 2
+    assert interface.get_value('web', 'server.port', 0) == 8080
+    assert interface.get_value('web', 'server.port', 0) == 8080
+    assert interface.get_cache_stats()['hits'] >= 2
+
+
+def test_get_value_sees_reload(interface, write_config):
+    assert interface.get_value('aipart', 'version') == '1.0'
+    write_config('AIPart.dir', {'version': '2.0'})
+    interface.reload()
+    assert interface.get_value('aipart', 'version') == '2.0'
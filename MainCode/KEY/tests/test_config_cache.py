@@ -0,0 +1,107 @@
+"""ConfigCache的过期、LRU淘汰和统计"""
+
+import threading
+
+import pytest
+
+import config_interface
+from config_interface import _MISSING, ConfigCache
+
+
+class Clock:
+    """代替time.monotonic的可控时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(config_interface.time, 'monotonic', clock)
+    return clock
+
+
+def test_hit_and_miss():
+    cache = ConfigCache()
+    assert cache.get('a') is _MISSING
+    cache.put('a', None)
+    # 缓存的值本身可以是None
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ConfigCache(ttl=10)
+    cache.put('a', 1)
+    clock.now += 9.9
+    assert cache.get('a') == 1
+    # 从写入开始计时，读取不会延长
+    clock.now += 0.2
+    assert cache.get('a') is _MISSING
+    assert len(cache) == 0
+    assert cache.stats()['expirations'] == 1
+
+
+def test_evicts_least_recently_used():
+    cache = ConfigCache(max_size=8, ttl=100)
+    for i in range(8):
+        cache.put(i, i)
+    cache.get(0)
+    cache.put(8, 8)
+    # 超过容量后淘汰到7/8，最近读过的0被保留
+    assert len(cache) == 7
+    assert cache.get(0) == 0
+    assert cache.get(1) is _MISSING and cache.get(2) is _MISSING
+    assert cache.get(3) == 3
+    assert cache.stats()['evictions'] == 2
+
+
+def test_put_refreshes_recency():
+    cache = ConfigCache(max_size=8, ttl=100)
+    for i in range(8):
+        cache.put(i, i)
+    cache.put(0, 'new')
+    cache.put(8, 8)
+    assert cache.get(0) == 'new'
+    assert cache.get(1) is _MISSING
+
+
+def test_invalidate_and_clear():
+    cache = ConfigCache()
+    for module, key in (('web', 'a'), ('web', 'b'), ('ai', 'a')):
+        cache.put((key, module), 1)
+    assert cache.invalidate(lambda key: key[1] == 'web') == 2
+    assert cache.get(('a', 'ai')) == 1
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_stats_sum_all_threads():
+    cache = ConfigCache()
+    cache.put('a', 1)
+    barrier = threading.Barrier(4)
+
+    def worker():
+        barrier.wait()
+        for _ in range(1000):
+            cache.get('a')
+            cache.get('missing')
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (4000, 4000)
+    # 已结束线程的计数合并后不再单独保存
+    assert cache._counters == []
+    cache.get('a')
+    assert cache.stats()['hits'] == 4001
@@ -0,0 +1,424 @@
+"""
+config_reader.py的解析规则，以及与config_reader.js的结果对比
+
+纯Python的用例直接给出期望值。对比用例在临时目录中写出set.config和.dir文件，
+分别用两个读取器加载，比较全局配置、各模块配置和一组getValue的结果；
+config_reader.js在Node.js中运行（java.io的文件读取由一小段用fs实现的代码代替），
+没有安装Node.js时跳过。
+"""
+
+import json
+import logging
+import math
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from config_reader import ConfigReader, compile_key_path, js_number, js_truthy, parse_ini, resolve_key_path
+
+KEY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JS_READER_PATH = os.path.join(KEY_DIR, 'config_reader.js')
+REPO_CONFIG_DIR = os.path.normpath(os.path.join(KEY_DIR, '..', '..', 'ConfigDir'))
+
+# getValue找不到时的默认值，用来区分"找到的值为null"和"没有找到"
+DEFAULT = '<default>'
+
+# 在Node.js中运行config_reader.js：用fs模拟java.io，屏蔽读取器自己的日志，
+# 从标准输入读取用例，把结果写到标准输出
+JS_HARNESS = r'''
+var fs = require('fs');
+var java = {io: {
+    File: function (path) {
+        this.path = path;
+        this.exists = function () { return fs.existsSync(path); };
+    },
+    FileReader: function (file) {
+        var lines = fs.readFileSync(file.path, 'utf8').split(/\r\n|\r|\n/);
+        if (lines.length && lines[lines.length - 1] === '') lines.pop();
+        this.lines = lines;
+    },
+    BufferedReader: function (reader) {
+        var i = 0;
+        this.readLine = function () { return i < reader.lines.length ? reader.lines[i++] : null; };
+        this.close = function () {};
+    }
+}};
+var print = process.stdout.write.bind(process.stdout);
+console.log = console.warn = console.error = function () {};
+
+%s
+
+function encode(value) {
+    return JSON.stringify(value, function (key, v) {
+        if (typeof v === 'number' && !isFinite(v)) return {'$number': String(v)};
+        if (v === undefined) return {'$undefined': true};
+        return v;
+    });
+}
+
+var cases = JSON.parse(fs.readFileSync(0, 'utf8'));
+var results = cases.map(function (c) {
+    var reader = Object.create(ConfigReader);
+    reader.globalConfig = {};
+    reader.moduleConfigs = {};
+    try {
+        reader.init(c.dir);
+    } catch (e) {
+        return {error: true};
+    }
+    var modules = {};
+    c.modules.forEach(function (name) { modules[name] = reader.getModuleConfig(name); });
+    var values = c.lookups.map(function (l) { return reader.getValue(l[0], l[1], '%s'); });
+    return {error: false, global: reader.getGlobalConfig(), modules: modules, values: values};
+});
+print(encode(results));
+''' % ('%s', DEFAULT)
+
+
+def _case(name, set_config, files=None, modules=(), lookups=()):
+    return {'name': name, 'set_config': set_config, 'files': files or {},
+            'modules': list(modules), 'lookups': [list(lookup) for lookup in lookups]}
+
+
+INI_VALUES = '''\ufeff[config]
+; 注释
+# 井号开头的不是注释
+before_section = 1
+
+[Values]
+empty =
+zero = 0
+int = 42
+negative = -5
+plus = +5
+padded =    12
+float = 3.25
+leading_dot = .5
+trailing_dot = 5.
+exponent = 1e3
+negative_exponent = 25e-1
+huge = 1e400
+hex = 0x1F
+upper_hex = 0X1f
+octal = 0o17
+binary = 0b101
+signed_hex = -0x10
+bad_hex = 0x
+leading_zeros = 00012
+infinity = Infinity
+negative_infinity = -Infinity
+lower_infinity = infinity
+nan = NaN
+underscore = 1_000
+arabic_digits = ١٢
+mixed = 12abc
+true = TRUE
+false = False
+yes = yes
+equals = a=b=c
+ spaced key = value with spaces
+nbsp = \u00a07\u3000
+=no key
+
+[ Spaced ]
+a = 1
+
+[Values2]
+x = 1
+[Values2]
+y = 2
+
+[]
+ignored = 1
+'''
+
+MODULE_FILES = {
+    'Web.dir': json.dumps({
+        'server': {'port': 8080, 'host': '0.0.0.0', 'debug': False},
+        'paths': {'static': 'staic', 'nested': {'deep': {'value': None}}},
+        'list': [10, 20, {'name': 'third'}],
+        'empty_list': [],
+        'text': 'hello',
+        'zero': 0,
+        '': 'empty key',
+        'dotted.key': 1,
+        'unicode': '中文',
+        'float': 1.5,
+        'big': 1e20,
+    }, ensure_ascii=False, indent=2),
+    'sub/AIPart.dir': '{"version": "1.0", "modules": {"chat": {"enabled": true}}}',
+    'Array.dir': '[1, 2, 3]',
+    'EmptyObject.dir': '{}',
+    'Zero.dir': '0',
+    'EmptyString.dir': '""',
+    'False.dir': 'false',
+    'Null.dir': 'null',
+    'NaN.dir': '{"value": NaN}',
+    'Bom.dir': '\ufeff{"a": 1}',
+    'Invalid.dir': '{"a": 1,}',
+    'Trailing.dir': '{"a": 1} x',
+    'Crlf.dir': '{\r\n  "a": 1,\r\n  "b": "x"\r\n}\r\n',
+    'Duplicate.dir': '{"a": 1, "a": 2}',
+}
+
+MODULE_PATHS = '''[Paths]
+Web = Web.dir
+AIPart = sub/AIPart.dir
+Array = Array.dir
+EmptyObject = EmptyObject.dir
+Zero = Zero.dir
+EmptyString = EmptyString.dir
+False = False.dir
+Null = Null.dir
+NaN = NaN.dir
+Bom = Bom.dir
+Invalid = Invalid.dir
+Trailing = Trailing.dir
+Crlf = Crlf.dir
+Duplicate = Duplicate.dir
+Missing = Missing.dir
+MissingAbsolute = /nonexistent/Missing.dir
+Numeric = 123
+Boolean = true
+EmptyPath =
+'''
+
+MODULE_NAMES = [
+    'web', 'WEB', 'aipart', 'array', 'emptyobject', 'zero', 'emptystring', 'false', 'null', 'nan',
+    'bom', 'invalid', 'trailing', 'crlf', 'duplicate', 'missing', 'missingabsolute', 'numeric',
+    'boolean', 'emptypath', 'unknown',
+]
+
+LOOKUPS = [
+    ('web', 'server.port'), ('Web', 'server.host'), ('web', 'server.debug'), ('web', 'server.missing'),
+    ('web', 'server.port.value'), ('web', 'paths.nested.deep.value'), ('web', 'paths.nested.deep.value.x'),
+    ('web', 'list.0'), ('web', 'list.2.name'), ('web', 'list.3'), ('web', 'list.01'), ('web', 'list.-1'),
+    ('web', 'list.1.0'), ('web', 'list.length'), ('web', 'empty_list.length'), ('web', 'text.length'),
+    ('web', 'text.0'), ('web', 'zero.x'), ('web', ''), ('web', 'dotted.key'), ('web', 'unicode'),
+    ('web', 'float'), ('web', 'big'), ('web', 'server'), ('aipart', 'modules.chat.enabled'),
+    ('array', '1'), ('array', 'length'), ('emptyobject', ''), ('emptyobject', 'a'), ('zero', ''),
+    ('crlf', 'b'), ('duplicate', 'a'), ('missing', 'a'), ('unknown', 'a'),
+]
+
+
+def build_cases():
+    """对比用例：(名称, set.config内容, 其他文件, 要比较的模块, getValue的参数)"""
+    repo_files = {}
+    repo_paths = ['[Paths]']
+    for name in sorted(os.listdir(REPO_CONFIG_DIR)):
+        if name.endswith('.dir'):
+            with open(os.path.join(REPO_CONFIG_DIR, name), 'r', encoding='utf-8') as f:
+                repo_files[name] = f.read()
+            repo_paths.append(f'{name[:-4]} = {name}')
+
+    return [
+        _case('ini_values', INI_VALUES),
+        _case('crlf_lines', '[A]\r\nx = 1\r\ny = true\r\n[B]\rz = 2\r'),
+        _case('no_trailing_newline', '[A]\nx = 0x10'),
+        _case('empty_set_config', ''),
+        _case('missing_set_config', None),
+        _case('modules', MODULE_PATHS + '\n[Global]\nHotReload = false\n', MODULE_FILES, MODULE_NAMES, LOOKUPS),
+        _case('repo_config', '\n'.join(repo_paths) + '\n', repo_files,
+              ['aipart', 'hardwaer', 'maincode', 'web'],
+              [('web', 'server.port'), ('maincode', 'execution.timeout'), ('aipart', 'modules.chat.enabled'),
+               ('hardwaer', 'version'), ('web', 'messages.backend')]),
+    ]
+
+
+def write_case(base_dir, case):
+    case_dir = os.path.join(base_dir, case['name'])
+    os.makedirs(case_dir)
+    if case['set_config'] is not None:
+        with open(os.path.join(case_dir, 'set.config'), 'w', encoding='utf-8', newline='') as f:
+            f.write(case['set_config'])
+    for name, content in case['files'].items():
+        path = os.path.join(case_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+    return case_dir
+
+
+def run_python(case_dir, case):
+    reader = ConfigReader()
+    try:
+        reader.init(case_dir)
+    except OSError:
+        return {'error': True}
+    return {
+        'error': False,
+        'global': reader.get_global_config(),
+        'modules': {name: reader.get_module_config(name) for name in case['modules']},
+        'values': [reader.get_value(module, key_path, DEFAULT) for module, key_path in case['lookups']],
+    }
+
+
+def run_js(node, case_dirs, cases):
+    payload = [{'dir': case_dir, 'modules': case['modules'], 'lookups': case['lookups']}
+               for case_dir, case in zip(case_dirs, cases)]
+    with open(JS_READER_PATH, 'r', encoding='utf-8') as f:
+        script = JS_HARNESS % f.read()
+    output = subprocess.run([node, '-e', script], input=json.dumps(payload), capture_output=True,
+                            text=True, encoding='utf-8', check=True).stdout
+    return json.loads(output, object_hook=_decode_js)
+
+
+def _decode_js(obj):
+    if set(obj) == {'$number'}:
+        return float(obj['$number'])
+    return obj
+
+
+def _normalize(value):
+    """把结果转换成可以和JSON往返后的JavaScript结果直接比较的形式"""
+    if isinstance(value, float) and math.isfinite(value) and value.is_integer() and abs(value) < 1e21:
+        return int(value)
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def _differences(expected, actual, path=''):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in sorted(set(expected) | set(actual)):
+            if key not in actual:
+                yield f'{path}.{key}: 只在config_reader.js中存在'
+            elif key not in expected:
+                yield f'{path}.{key}: 只在config_reader.py中存在'
+            else:
+                yield from _differences(expected[key], actual[key], f'{path}.{key}')
+    elif isinstance(expected, list) and isinstance(actual, list) and len(expected) == len(actual):
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            yield from _differences(a, b, f'{path}[{i}]')
+    elif type(expected) is not type(actual) or expected != actual:
+        yield f'{path}: config_reader.js={expected!r} config_reader.py={actual!r}'
+
+
+CASES = build_cases()
+
+requires_node = pytest.mark.skipif(shutil.which('node') is None, reason='需要Node.js运行config_reader.js')
+
+
+@pytest.fixture(scope='module')
+def compared_results(tmp_path_factory):
+    """所有对比用例只启动一次Node.js，返回[(config_reader.js的结果, config_reader.py的结果)]"""
+    # 加载失败的模块本身就是用例的一部分，不输出读取器的警告
+    logging.getLogger('ConfigReader').setLevel(logging.ERROR)
+    base_dir = str(tmp_path_factory.mktemp('config_reader'))
+    case_dirs = [write_case(base_dir, case) for case in CASES]
+    js_results = run_js(shutil.which('node'), case_dirs, CASES)
+    py_results = [_normalize(run_python(case_dir, case)) for case_dir, case in zip(case_dirs, CASES)]
+    return list(zip(js_results, py_results))
+
+
+@requires_node
+@pytest.mark.parametrize('index', range(len(CASES)), ids=[case['name'] for case in CASES])
+def test_matches_config_reader_js(compared_results, index):
+    expected, actual = compared_results[index]
+    assert list(_differences(expected, actual)) == []
+
+
+# ---------- 纯Python的期望值 ----------
+
+@pytest.mark.parametrize('text, expected', [
+    ('', 0),
+    ('   ', 0),
+    ('42', 42),
+    (' -5 ', -5),
+    ('+5', 5),
+    ('3.25', 3.25),
+    ('.5', 0.5),
+    ('5.', 5),
+    ('1e3', 1000),
+    ('25e-1', 2.5),
+    ('0x1F', 31),
+    ('0X1f', 31),
+    ('0o17', 15),
+    ('0b101', 5),
+    ('00012', 12),
+    ('\u00a07\u3000', 7),
+    ('1e400', math.inf),
+    ('Infinity', math.inf),
+    ('-Infinity', -math.inf),
+])
+def test_js_number(text, expected):
+    value = js_number(text)
+    assert value == expected
+    # 整数值与JavaScript一样没有小数部分
+    assert type(value) is type(expected)
+
+
+@pytest.mark.parametrize('text', ['-0x10', '0x', 'infinity', 'NaN', '1_000', '\u0661\u0662', '12abc', 'true'])
+def test_js_number_nan(text):
+    assert js_number(text) is None
+
+
+def test_parse_ini():
+    config = parse_ini(INI_VALUES)
+    values = config['Values']
+    assert values['empty'] == 0
+    assert values['int'] == 42 and values['float'] == 3.25 and values['hex'] == 31
+    assert values['true'] is True and values['false'] is False
+    assert values['yes'] == 'yes' and values['mixed'] == '12abc' and values['signed_hex'] == '-0x10'
+    assert values['lower_infinity'] == 'infinity' and values['nan'] == 'NaN'
+    # 按第一个等号拆分，键和值去掉首尾空白
+    assert values['equals'] == 'a=b=c'
+    assert values['spaced key'] == 'value with spaces'
+    assert values['nbsp'] == 7
+    assert values[''] == 'no key'
+    # #开头的行不是注释，但没有等号，被忽略
+    assert not any(key.startswith('#') for key in values)
+    # BOM被当作空白去掉；第一个section之前和空section名下的键值对被忽略
+    assert config['config'] == {'before_section': 1}
+    assert config['Spaced'] == {'a': 1}
+    # 同名section再次出现时重新开始
+    assert config['Values2'] == {'y': 2}
+    assert config[''] == {}
+
+
+def test_parse_ini_line_endings():
+    assert parse_ini('[A]\r\nx = 1\r\ny = true\r\n') == {'A': {'x': 1, 'y': True}}
+    assert parse_ini('') == {}
+
+
+CONFIG = {
+    'server': {'port': 8080, 'debug': False},
+    'list': [10, 20, {'name': 'third'}],
+    'nested': {'value': None},
+    'text': 'hello',
+    '': 'empty key',
+    'dotted.key': 1,
+}
+
+
+@pytest.mark.parametrize('key_path, expected', [
+    ('server.port', (True, 8080)),
+    ('server.debug', (True, False)),
+    ('server', (True, CONFIG['server'])),
+    ('nested.value', (True, None)),
+    ('list.0', (True, 10)),
+    ('list.2.name', (True, 'third')),
+    ('list.length', (True, 3)),
+    ('', (True, 'empty key')),
+    ('server.missing', (False, None)),
+    ('server.port.value', (False, None)),
+    ('nested.value.x', (False, None)),
+    ('list.3', (False, None)),
+    ('list.01', (False, None)),
+    ('list.-1', (False, None)),
+    ('list.1.0', (False, None)),
+    ('text.length', (False, None)),
+    # 键路径按点拆分，带点的键无法访问
+    ('dotted.key', (False, None)),
+])
+def test_resolve_key_path(key_path, expected):
+    assert resolve_key_path(CONFIG, compile_key_path(key_path)) == expected
+
+
+def test_js_truthy():
+    assert not any(js_truthy(value) for value in (None, False, 0, 0.0, math.nan, ''))
+    assert all(js_truthy(value) for value in (True, 1, -0.5, 'x', {}, []))
@@ -0,0 +1,144 @@
+"""配置文件监视器的去抖动，以及ConfigInterface的热重载"""
+
+import os
+import queue
+import time
+
+import pytest
+
+from config_watcher import ConfigWatcher, InotifyBackend, normalize_path
+
+
+def inotify_available():
+    try:
+        InotifyBackend().close()
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+@pytest.fixture(params=['inotify', 'polling'])
+def watch(request, tmp_path):
+    """watch(paths, debounce)创建并启动监视器，返回(监视器, 保存回调批次的队列)"""
+    if request.param == 'inotify' and not inotify_available():
+        pytest.skip('inotify不可用')
+    watchers = []
+
+    def create(paths, debounce=0.1):
+        batches = queue.Queue()
+        watcher = ConfigWatcher(paths, batches.put, debounce=debounce, poll_interval=0.02,
+                                use_inotify=request.param == 'inotify')
+        assert watcher.mode == request.param
+        watcher.start()
+        watchers.append(watcher)
+        return watcher, batches
+
+    yield create
+    for watcher in watchers:
+        watcher.stop()
+
+
+def write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = [tmp_path / 'a.dir', tmp_path / 'b.dir']
+    for path in paths:
+        write(path, '{}')
+    return [str(path) for path in paths]
+
+
+def test_change_reported(watch, files):
+    _, batches = watch(files)
+    write(files[0], '{"a": 1}')
+    assert batches.get(timeout=5) == {normalize_path(files[0])}
+
+
+def test_burst_of_writes_reported_once(watch, files):
+    _, batches = watch(files, debounce=0.3)
+    started = time.monotonic()
+    for i in range(5):
+        write(files[i % 2], '{"a": %d}' % (i * 1000))
+        time.sleep(0.05)
+    batch = batches.get(timeout=5)
+    # 最后一次写入之后至少等了debounce秒
+    assert time.monotonic() - started >= 0.2 + 0.3
+    assert batch == {normalize_path(path) for path in files}
+    with pytest.raises(queue.Empty):
+        batches.get(timeout=0.5)
+
+
+def test_atomic_replace_detected(watch, files, tmp_path):
+    _, batches = watch(files)
+    tmp = tmp_path / 'a.dir.tmp'
+    write(tmp, '{"replaced": true}')
+    os.replace(tmp, files[0])
+    assert batches.get(timeout=5) == {normalize_path(files[0])}
+
+
+def test_unwatched_files_ignored(watch, files, tmp_path):
+    _, batches = watch(files[:1])
+    write(tmp_path / 'other.dir', '{"x": 1}')
+    write(files[1], '{"x": 1}')
+    with pytest.raises(queue.Empty):
+        batches.get(timeout=0.5)
+
+
+def test_stop_from_callback(watch, files):
+    watcher, _ = watch(files)
+    stopped = queue.Queue()
+
+    def callback(paths):
+        watcher.stop()
+        stopped.put(paths)
+
+    watcher.callback = callback
+    write(files[0], '{"a": 1}')
+    stopped.get(timeout=5)
+    watcher._thread.join(5)
+    assert not watcher._thread.is_alive()
+
+
+def test_callback_error_does_not_stop_watching(watch, files):
+    watcher, batches = watch(files)
+    calls = []
+
+    def callback(paths):
+        calls.append(paths)
+        if len(calls) == 1:
+            raise RuntimeError('失败')
+        batches.put(paths)
+
+    watcher.callback = callback
+    write(files[0], '{"a": 1}')
+    deadline = time.monotonic() + 5
+    while not calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    write(files[1], '{"b": 1}')
+    assert batches.get(timeout=5) == {normalize_path(files[1])}
+
+
+def test_hot_reload_changed_module(interface, write_config):
+    events = queue.Queue()
+    interface.register_event_listener('module_changed', lambda name, diff: events.put((name, diff)))
+    port = interface.accessor('web', 'server.port')
+    interface.get_value('aipart', 'version')
+    interface.start_watching(debounce=0.05, poll_interval=0.02)
+
+    write_config('Web.dir', {'server': {'port': 9090, 'hosts': ['a', 'b']}, 'debug': True})
+    name, diff = events.get(timeout=5)
+    assert name == 'web'
+    assert diff == {'added': {'debug': True}, 'removed': {}, 'changed': {'server.port': (8080, 9090)}}
+    assert port.value == 9090
+    assert interface.get_value('web', 'server.port') == 9090
+    # 其他模块的缓存项没有被清除
+    assert interface.get_value('aipart', 'version') == '1.0'
+
+    # 内容有误时保留旧配置
+    write_config('Web.dir', '{"server": ')
+    time.sleep(0.3)
+    assert port.value == 9090
+    assert events.empty()
@@ -0,0 +1,97 @@
+"""模块配置按需加载：init()只解析set.config，.dir文件在第一次访问时才打开"""
+
+import threading
+
+import pytest
+
+from config_reader import ConfigReader
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """记录被打开的.dir文件名"""
+    names = []
+    load = ConfigReader.load_dir_file
+
+    def recording_load(file_path):
+        names.append(file_path.rsplit('/', 1)[-1])
+        return load(file_path)
+
+    monkeypatch.setattr(ConfigReader, 'load_dir_file', staticmethod(recording_load))
+    return names
+
+
+@pytest.fixture
+def reader(config_dir):
+    reader = ConfigReader()
+    reader.init(str(config_dir))
+    return reader
+
+
+def test_init_opens_no_module_files(reader, opened):
+    assert opened == []
+    assert sorted(reader.module_names()) == ['aipart', 'web']
+    assert not reader.is_loaded('web')
+
+
+def test_module_loaded_once_on_first_access(reader, opened):
+    assert reader.get_value('web', 'server.port') == 8080
+    assert reader.get_module_config('Web')['server']['port'] == 8080
+    assert opened == ['Web.dir']
+    assert reader.is_loaded('web') and not reader.is_loaded('aipart')
+
+
+def test_preload(config_dir, opened):
+    reader = ConfigReader()
+    reader.init(str(config_dir), preload=['WEB'])
+    assert opened == ['Web.dir']
+    assert reader.is_loaded('web')
+
+
+def test_failed_module_not_retried_until_reload(reader, write_config, opened):
+    write_config('Web.dir', '{"server": ')
+    assert reader.get_module_config('web') is None
+    assert reader.get_value('web', 'server.port', 1) == 1
+    assert opened == ['Web.dir']
+
+    write_config('Web.dir', {'server': {'port': 1}})
+    reader.reload()
+    assert reader.get_value('web', 'server.port') == 1
+
+
+def test_reload_only_used_modules(reader, write_config, opened):
+    reader.get_module_config('web')
+    write_config('AIPart.dir', {'version': '2.0'})
+    reader.reload()
+    assert opened == ['Web.dir', 'Web.dir']
+    assert not reader.is_loaded('aipart')
+    assert reader.get_value('aipart', 'version') == '2.0'
+
+
+def test_reload_module_skips_unused_module(reader, opened):
+    assert reader.reload_module('aipart') is None
+    assert opened == [] and not reader.is_loaded('aipart')
+
+
+def test_concurrent_first_access_loads_once(reader, opened):
+    barrier = threading.Barrier(8)
+    results = []
+
+    def access():
+        barrier.wait()
+        results.append(reader.get_module_config('web'))
+
+    threads = [threading.Thread(target=access) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert opened == ['Web.dir']
+    assert all(result is results[0] for result in results)
+
+
+def test_interface_loads_on_demand(interface):
+    assert not interface._reader.is_loaded('web')
+    assert interface.get_value('web', 'server.port') == 8080
+    assert interface._reader.is_loaded('web')
+    assert not interface._reader.is_loaded('aipart')
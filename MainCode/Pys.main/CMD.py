@@ -36,6 +36,7 @@ while CMDpassword.umv != 0:
         print("list-website-sections - 列出所有网站配置部分（仅root模式）")
         print("start-website - 启动网站服务（仅root模式）")
         print("stop-website - 关闭网站服务（仅root模式）")
+        print("restart-website - 滚动重启网站工作进程（仅root模式）")
         print("check-website - 检查网站服务状态")
         print("/? - 显示此帮助信息")
         print("==============\n")
@@ -178,6 +179,13 @@ while CMDpassword.umv != 0:
             print(message)
         else:
             print("用户模式下无法关闭网站，请切换到root模式")
+    elif(a == 'restart-website'):
+        # 滚动重启网站服务
+        if CMDpassword.tag:  # 只允许root模式重启
+            success, message = CMDpassword.restart_website()
+            print(message)
+        else:
+            print("用户模式下无法重启网站，请切换到root模式")
     elif(a == 'check-website'):
         # 检查网站服务状态
         success, message = CMDpassword.check_website_status()
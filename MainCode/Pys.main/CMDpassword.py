@@ -3,7 +3,10 @@ import json
 import subprocess
 import sys
 import time
+import select
 import signal
+import socket
+import tempfile
 
 # 获取当前脚本所在目录的绝对路径
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -89,6 +92,19 @@ def change_password(old_password, new_password):
 # 定义PID文件路径
 PID_FILE = os.path.join(script_dir, 'website.pid')
 LOCK_FILE = os.path.join(script_dir, 'website.lock')
+# 网站服务的输出日志
+WEBSITE_LOG_FILE = os.path.join(script_dir, 'website.log')
+# Web模块配置文件，其中server部分决定网站的启动方式
+WEB_CONFIG_FILE = os.path.join(script_dir, '../../ConfigDir/Web.dir')
+# 用pgrep查找网站进程的模式（单进程app.py或多进程服务器的主进程和工作进程）
+WEBSITE_PROCESS_PATTERN = r'python.*web\.main/(app|prefork_server)\.py'
+# 启动网站时等待服务就绪的最长时间（秒）
+WEBSITE_START_TIMEOUT = 30
+# 直接运行app.py时监听的地址（与app.py中app.run的参数一致）
+APP_HOST = '127.0.0.1'
+APP_PORT = 5000
+# 关闭网站时等待进程平滑退出的最长时间（秒），超时后强制结束
+WEBSITE_STOP_TIMEOUT = 15
 # 初始化变量
 config = read_all_config()  # 读取所有配置
 tag = bool(1)  # 初始为root模式
@@ -117,9 +133,24 @@ def read_website_config():
 def save_website_config(config_data):
     try:
         # 确保目录存在
-        os.makedirs(os.path.dirname(WEBSITE_CONFIG_FILE), exist_ok=True)
-        with open(WEBSITE_CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(config_data, f, ensure_ascii=False, indent=4)
+        config_dir = os.path.dirname(WEBSITE_CONFIG_FILE)
+        os.makedirs(config_dir, exist_ok=True)
+        # 先写临时文件再替换：运行中的网站按文件变化重新渲染首页，不会读到写了一半的配置
+        fd, tmp_path = tempfile.mkstemp(prefix='.website_config.', suffix='.tmp', dir=config_dir)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(config_data, f, ensure_ascii=False, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(WEBSITE_CONFIG_FILE):
+                os.chmod(tmp_path, os.stat(WEBSITE_CONFIG_FILE).st_mode & 0o777)
+            else:
+                os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, WEBSITE_CONFIG_FILE)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
         return True, "网站配置保存成功"
     except Exception as e:
         print(f"保存网站配置失败: {e}")
@@ -173,10 +204,108 @@ def show_website_config_section(section=None):
     else:
             return True, config_data
 
+# 读取网站服务器配置函数
+def read_server_config():
+    """读取Web.dir中的server部分"""
+    try:
+        with open(WEB_CONFIG_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f).get('server', {})
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"读取服务器配置失败: {e}")
+        return {}
+
+# 读取网站进程PID函数
+def read_website_pids():
+    """读取PID文件
+    
+    Returns:
+        list: 第一个是主进程PID，之后是工作进程PID；文件不存在或无效时返回空列表
+    """
+    try:
+        with open(PID_FILE, 'r') as f:
+            return [int(line) for line in f.read().split() if line.isdigit()]
+    except (FileNotFoundError, OSError):
+        return []
+
+# 检查进程是否存在函数
+def is_process_running(pid):
+    if sys.platform == 'win32':
+        # Windows平台
+        proc = subprocess.Popen(
+            ['tasklist', '/fi', f'PID eq {pid}'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        output, _ = proc.communicate()
+        return f' {pid} ' in output
+    else:
+        # 非Windows平台
+        try:
+            os.kill(pid, 0)  # 发送0信号检查进程是否存在
+            return True
+        except OSError:
+            return False
+
+# 读取网站输出日志末尾函数
+def read_website_log_tail(max_bytes=4000):
+    try:
+        with open(WEBSITE_LOG_FILE, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - max_bytes))
+            return f.read().decode('utf-8', errors='replace')
+    except OSError:
+        return ''
+
+# 等待多进程服务器就绪函数
+def wait_for_ready_pipe(read_fd, process, timeout):
+    """等待prefork_server在所有初始工作进程就绪后写入就绪管道
+    
+    主进程启动失败时不写入直接关闭管道，这里读到EOF后返回False。
+    """
+    deadline = time.time() + timeout
+    try:
+        while time.time() < deadline and process.poll() is None:
+            ready, _, _ = select.select([read_fd], [], [], 0.2)
+            if ready:
+                return os.read(read_fd, 1) == b'1'
+        return False
+    finally:
+        os.close(read_fd)
+
+# 等待端口开始监听函数
+def wait_for_port(host, port, process, timeout):
+    """等待进程开始在host:port上接受连接，进程提前退出或超时时返回False"""
+    deadline = time.time() + timeout
+    while time.time() < deadline and process.poll() is None:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+# 结束启动失败的网站进程函数
+def kill_website_process(process):
+    """启动超时时结束仍在运行的网站进程（包括已经启动的工作进程）"""
+    if process.poll() is not None:
+        return
+    try:
+        if sys.platform == 'win32':
+            process.kill()
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+        process.wait(timeout=5)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"结束网站进程时出错: {e}")
+
 # 启动网站函数
 def start_website():
     """使用文件锁和PID文件启动网站服务
     
+    Web.dir中server.launcher为prefork时（默认，仅非Windows平台）使用多进程服务器prefork_server.py，
+    工作进程数由server.workers决定，默认与CPU核数相同；否则直接运行app.py。
+    
     Returns:
         tuple: (是否成功, 消息)
     """
@@ -187,12 +316,24 @@ def start_website():
             return False, "网站已经在运行中"
         
         # 构建app.py的路径
-        app_path = os.path.join(script_dir, '../../WEB/web.main/app.py')
+        web_dir = os.path.join(script_dir, '../../WEB/web.main')
+        app_path = os.path.join(web_dir, 'app.py')
         
         # 检查app.py文件是否存在
         if not os.path.exists(app_path):
             return False, f"未找到app.py文件: {app_path}"
         
+        # 选择启动方式
+        server_config = read_server_config()
+        prefork = server_config.get('launcher', 'prefork') == 'prefork' and sys.platform != 'win32'
+        if prefork:
+            # 主进程在所有工作进程就绪后通过这个管道通知，PID文件在fork时就会写出，不能代表就绪
+            ready_read_fd, ready_write_fd = os.pipe()
+            command = [sys.executable, os.path.join(web_dir, 'prefork_server.py'), '--pid-file', PID_FILE,
+                       '--ready-fd', str(ready_write_fd)]
+        else:
+            command = [sys.executable, app_path]
+        
         # 获取项目根目录
         project_root = os.path.abspath(os.path.join(script_dir, '../../'))
         
@@ -201,45 +342,63 @@ def start_website():
             lock_fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
             os.close(lock_fd)
         except FileExistsError:
+            if prefork:
+                os.close(ready_read_fd)
+                os.close(ready_write_fd)
             return False, "网站锁定文件已存在，可能有其他实例正在运行"
         
         # 启动网站进程
+        # 输出写入日志文件：使用管道而不读取的话，缓冲区写满后服务进程会被阻塞
         print(f"正在启动网站服务...")
-        if sys.platform == 'win32':
-            # Windows平台
-            process = subprocess.Popen(
-                [sys.executable, app_path],
-                cwd=project_root,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                creationflags=subprocess.CREATE_NEW_CONSOLE
-            )
-        else:
-            # 非Windows平台
-            process = subprocess.Popen(
-                [sys.executable, app_path],
-                cwd=project_root,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                preexec_fn=os.setsid
-            )
+        with open(WEBSITE_LOG_FILE, 'ab') as log_file:
+            if sys.platform == 'win32':
+                # Windows平台
+                process = subprocess.Popen(
+                    command,
+                    cwd=project_root,
+                    stdout=log_file,
+                    stderr=subprocess.STDOUT,
+                    creationflags=subprocess.CREATE_NEW_CONSOLE
+                )
+            else:
+                # 非Windows平台，新建进程组以便整体关闭
+                try:
+                    process = subprocess.Popen(
+                        command,
+                        cwd=project_root,
+                        stdout=log_file,
+                        stderr=subprocess.STDOUT,
+                        preexec_fn=os.setsid,
+                        pass_fds=(ready_write_fd,) if prefork else ()
+                    )
+                finally:
+                    if prefork:
+                        # 只由服务进程持有写端，它退出后这里才能读到EOF
+                        os.close(ready_write_fd)
         
-        # 等待短暂时间，确保进程启动
-        time.sleep(1)
+        # 等待服务真正能够处理请求
+        if prefork:
+            ready = wait_for_ready_pipe(ready_read_fd, process, WEBSITE_START_TIMEOUT)
+        else:
+            ready = wait_for_port(APP_HOST, APP_PORT, process, WEBSITE_START_TIMEOUT)
         
-        # 检查进程是否仍在运行
-        if process.poll() is None:
+        if ready:
+            if prefork:
+                workers = read_website_pids()[1:]
+                return True, f"网站服务已成功启动（主进程PID: {process.pid}，工作进程: {len(workers)}个）"
             # 保存PID到文件
             with open(PID_FILE, 'w') as f:
                 f.write(str(process.pid))
             return True, f"网站服务已成功启动（进程PID: {process.pid}）"
         else:
+            # 启动超时时进程可能仍在运行，结束它以免留下无法管理的进程
+            kill_website_process(process)
             # 读取错误输出
-            stderr = process.stderr.read().decode('utf-8')
+            output = read_website_log_tail()
             # 清理锁定文件
             if os.path.exists(LOCK_FILE):
                 os.remove(LOCK_FILE)
-            return False, f"网站启动失败: {stderr}"
+            return False, f"网站启动失败: {output}"
             
     except Exception as e:
         # 清理锁定文件
@@ -249,7 +408,7 @@ def start_website():
 
 # 关闭网站函数
 def stop_website():
-    """使用PID文件关闭网站服务
+    """使用PID文件关闭网站服务（包括所有工作进程）
     
     Returns:
         tuple: (是否成功, 消息)
@@ -261,28 +420,35 @@ def stop_website():
             return False, "网站未在运行"
         
         # 尝试从PID文件获取进程ID
-        if os.path.exists(PID_FILE):
-            with open(PID_FILE, 'r') as f:
-                pid_str = f.read().strip()
+        pids = read_website_pids()
+        if pids:
+            pid = pids[0]
             
-            if pid_str.isdigit():
-                pid = int(pid_str)
-                
-                # 根据平台选择终止进程的方法
-                if sys.platform == 'win32':
-                    # Windows平台
-                    subprocess.run(['taskkill', '/F', '/PID', str(pid)], check=True)
-                else:
-                    # 非Windows平台
-                    os.kill(pid, signal.SIGTERM)
+            # 根据平台选择终止进程的方法
+            if sys.platform == 'win32':
+                # Windows平台，/T同时结束子进程
+                subprocess.run(['taskkill', '/F', '/T', '/PID', str(pid)], check=True)
+            else:
+                # 非Windows平台：通知主进程平滑关闭，主进程会等待工作进程处理完当前请求
+                os.kill(pid, signal.SIGTERM)
+                deadline = time.time() + WEBSITE_STOP_TIMEOUT
+                while time.time() < deadline and any(is_process_running(p) for p in pids):
+                    time.sleep(0.2)
+                # 超时仍未退出的进程连同整个进程组一起强制结束
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except OSError:
+                    pass
                 
-                # 清理PID文件和锁定文件
-                if os.path.exists(PID_FILE):
-                    os.remove(PID_FILE)
-                if os.path.exists(LOCK_FILE):
-                    os.remove(LOCK_FILE)
+            # 清理PID文件和锁定文件
+            if os.path.exists(PID_FILE):
+                os.remove(PID_FILE)
+            if os.path.exists(LOCK_FILE):
+                os.remove(LOCK_FILE)
                 
-                return True, f"网站服务已成功关闭（进程PID: {pid}）"
+            if len(pids) > 1:
+                return True, f"网站服务已成功关闭（主进程PID: {pid}，工作进程: {len(pids) - 1}个）"
+            return True, f"网站服务已成功关闭（进程PID: {pid}）"
         
         # 如果没有PID文件，使用平台特定的方法查找并关闭进程
         if sys.platform == 'win32':
@@ -303,35 +469,59 @@ def stop_website():
                     if parts.isdigit():
                         pid = int(parts)
                         # 强制终止进程
-                        subprocess.run(['taskkill', '/F', '/PID', str(pid)], check=True)
+                        subprocess.run(['taskkill', '/F', '/T', '/PID', str(pid)], check=True)
                         # 清理锁定文件
                         if os.path.exists(LOCK_FILE):
                             os.remove(LOCK_FILE)
                         return True, f"网站服务已成功关闭（进程PID: {pid}）"
         else:
-            # 非Windows平台：使用pgrep和pkill
+            # 非Windows平台：使用pgrep查找，主进程和工作进程都会被找到
             proc = subprocess.Popen(
-                ['pgrep', '-f', 'python.*app\.py.*web\.main'],
+                ['pgrep', '-f', WEBSITE_PROCESS_PATTERN],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE
             )
             output, _ = proc.communicate()
             
             if output:
-                pids = output.decode('utf-8').strip().split('\n')
+                pids = [pid for pid in output.decode('utf-8').strip().split('\n') if pid.isdigit()]
                 for pid in pids:
-                    if pid.isdigit():
+                    try:
                         os.kill(int(pid), signal.SIGTERM)
-                        # 清理锁定文件
-                        if os.path.exists(LOCK_FILE):
-                            os.remove(LOCK_FILE)
-                        return True, f"网站服务已成功关闭（进程PID: {pid}）"
+                    except OSError:
+                        pass
+                if pids:
+                    # 清理锁定文件
+                    if os.path.exists(LOCK_FILE):
+                        os.remove(LOCK_FILE)
+                    return True, f"网站服务已成功关闭（进程PID: {', '.join(pids)}）"
         
         return False, "未能找到并关闭网站进程"
         
     except Exception as e:
         return False, f"关闭网站时发生错误: {str(e)}"
 
+# 滚动重启网站函数
+def restart_website():
+    """通知多进程服务器逐个替换工作进程，重启期间服务不中断
+    
+    Returns:
+        tuple: (是否成功, 消息)
+    """
+    status, message = check_website_status()
+    if not status:
+        return False, "网站未在运行"
+    
+    pids = read_website_pids()
+    if sys.platform == 'win32' or len(pids) < 2:
+        return False, "当前启动方式不支持滚动重启，请先关闭再启动网站"
+    
+    try:
+        os.kill(pids[0], signal.SIGHUP)
+        return True, f"已通知主进程（PID: {pids[0]}）滚动重启 {len(pids) - 1} 个工作进程"
+    except OSError as e:
+        return False, f"滚动重启网站时发生错误: {str(e)}"
+
 # 检查网站状态函数
 def check_website_status():
     """使用文件锁和PID文件检查网站服务状态
@@ -343,37 +533,18 @@ def check_website_status():
     if not os.path.exists(LOCK_FILE):
         return False, "网站未在运行（未检测到锁定文件）"
     
-    # 检查PID文件是否存在
-    if os.path.exists(PID_FILE):
-        try:
-            with open(PID_FILE, 'r') as f:
-                pid_str = f.read().strip()
-            
-            if pid_str.isdigit():
-                pid = int(pid_str)
-                
-                # 检查进程是否存在
-                if sys.platform == 'win32':
-                    # Windows平台
-                    proc = subprocess.Popen(
-                        ['tasklist', '/fi', f'PID eq {pid}'],
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True
-                    )
-                    output, _ = proc.communicate()
-                    
-                    if f' {pid} ' in output:
-                        return True, f"网站正在运行中（进程PID: {pid}）"
-                else:
-                    # 非Windows平台
-                    try:
-                        os.kill(pid, 0)  # 发送0信号检查进程是否存在
-                        return True, f"网站正在运行中（进程PID: {pid}）"
-                    except OSError:
-                        pass
-        except Exception:
-            pass
+    # 检查PID文件中的进程是否存在
+    try:
+        pids = read_website_pids()
+        if pids and is_process_running(pids[0]):
+            workers = pids[1:]
+            if workers:
+                running = [pid for pid in workers if is_process_running(pid)]
+                return True, (f"网站正在运行中（主进程PID: {pids[0]}，"
+                              f"工作进程: {len(running)}/{len(workers)}个运行中，PID: {', '.join(map(str, running))}）")
+            return True, f"网站正在运行中（进程PID: {pids[0]}）"
+    except Exception:
+        pass
     
     # 尝试使用平台特定的方法查找进程
     if sys.platform == 'win32':
@@ -395,7 +566,7 @@ def check_website_status():
         # 非Windows平台
         try:
             proc = subprocess.Popen(
-                ['pgrep', '-f', 'python.*app\.py.*web\.main'],
+                ['pgrep', '-f', WEBSITE_PROCESS_PATTERN],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE
             )
@@ -1,5 +1,6 @@
-import os
-from flask import Flask, render_template, jsonify, request
+import sys
+import signal
+from flask import Flask, Response, render_template, send_from_directory, abort, jsonify, request, stream_with_context
 
 # 创建Flask应用
 app = Flask(__name__, 
@@ -8,80 +9,133 @@ app = Flask(__name__,
             template_folder='../../templates/htmls')
 
 # 导入消息管理器
+# 参数校验、存储调用和响应内容在handlers.py中，与asgi_app.py共用
 from messages import message_manager
+from message_model import dumps
+from message_ndjson import iter_ndjson
+import handlers
+from handlers import static_assets, website_config, page_cache, CONFIG_CACHE_CONTROL
+
+app.jinja_env.globals['asset_url'] = static_assets.url
+
+def reply_response(reply):
+    """把handlers返回的Reply转换为响应，payload中可以直接包含Message"""
+    return Response(dumps(reply.payload), status=reply.status, headers=reply.headers,
+                    mimetype='application/json')
+
+def handle(handler):
+    """执行handlers中的消息接口"""
+    return reply_response(handlers.run(handler, message_manager))
+
+# 消息接口限流：提交留言按IP和邮箱分别限流，其他消息接口按IP限流
+@app.before_request
+def limit_message_requests():
+    data = None
+    if handlers.is_submit(request.method, request.path):
+        # 解析结果会被缓存，接口中再次读取不会重复解析
+        data = request.get_json(silent=True)
+    reply = handlers.check_rate_limit(request.method, request.path, request.remote_addr, data)
+    return reply_response(reply) if reply else None
+
+# 构建后的静态资源，按Accept-Encoding返回预压缩版本
+# 比Flask默认的/staic/<path>规则更具体，会优先匹配
+@app.route('/staic/dist/<path:filename>')
+def dist_static(filename):
+    selected = static_assets.select(filename, request.accept_encodings)
+    if selected is None:
+        abort(404)
+    variant, encoding, mimetype = selected
+    response = send_from_directory(static_assets.dist_dir, variant, mimetype=mimetype)
+    response.headers.update(static_assets.headers(encoding))
+    return response
 
 # 首页路由
 @app.route('/')
 def index():
-    return render_template('index.html')
+    try:
+        snapshot = website_config.get()
+        site_config, config_version = snapshot.data, snapshot.etag
+    except Exception as e:
+        # 配置不可用时渲染默认内容，由浏览器端继续尝试加载配置
+        print(f"加载网站配置出错: {e}")
+        site_config, config_version = {}, None
+
+    key = (config_version, static_assets.version())
+    page = page_cache.get_or_render('index', key,
+                                    lambda: render_template('index.html', site_config=site_config))
+
+    headers = {'ETag': f'"{page.etag}"', 'Cache-Control': CONFIG_CACHE_CONTROL}
+    if request.if_none_match.contains(page.etag):
+        return Response(status=304, headers=headers)
+    return Response(page.body, mimetype='text/html', headers=headers)
 
 # 获取网站配置
 @app.route('/api/config')
 def get_config():
-    config_path = os.path.join('../../staic', 'KEY', 'json', 'website_config.json')
     try:
-        import json
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        return jsonify(config)
+        snapshot = website_config.get()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    headers = {'ETag': f'"{snapshot.etag}"', 'Cache-Control': CONFIG_CACHE_CONTROL}
+    if request.if_none_match.contains(snapshot.etag):
+        return Response(status=304, headers=headers)
+    return Response(snapshot.body, mimetype='application/json', headers=headers)
 
-# 消息管理路由
+# 消息管理路由，参数和返回内容见handlers.py中的同名函数
 
-# 获取所有消息
 @app.route('/api/messages')
 def get_messages():
-    try:
-        messages = message_manager.get_all_messages()
-        return jsonify({'success': True, 'messages': messages})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    return handle(handlers.get_messages(request.args))
+
+@app.route('/api/messages/stats')
+def message_stats():
+    return handle(handlers.message_stats(request.args))
+
+@app.route('/api/messages/archive')
+def list_archive():
+    return handle(handlers.list_archive())
+
+@app.route('/api/messages/archive/<segment>')
+def get_archived_messages(segment):
+    return handle(handlers.get_archived_messages(segment, request.args))
+
+@app.route('/api/messages/search')
+def search_messages():
+    return handle(handlers.search_messages(request.args))
+
+# 消息变更推送（SSE），事件: add（新消息）、read（已读）、delete（删除）、reset（需要重新加载列表）
+# 断线重连时浏览器自动带上Last-Event-ID，期间错过的事件会补发
+@app.route('/api/messages/stream')
+def stream_messages():
+    events = message_manager.events.stream(request.headers.get('Last-Event-ID'))
+    return Response(events, mimetype='text/event-stream', headers=handlers.STREAM_HEADERS)
 
-# 添加新消息
 @app.route('/api/messages', methods=['POST'])
 def add_message():
-    try:
-        data = request.json
-        name = data.get('name')
-        email = data.get('email')
-        subject = data.get('subject')
-        message_text = data.get('message')
-        
-        if not all([name, email, message_text]):
-            return jsonify({'success': False, 'error': '缺少必要参数'}), 400
-        
-        success = message_manager.add_message(name, email, subject, message_text)
-        if success:
-            return jsonify({'success': True, 'message': '消息发送成功'})
-        else:
-            return jsonify({'success': False, 'error': '消息发送失败'}), 500
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    return handle(handlers.add_message(request.get_json(silent=True)))
 
-# 标记消息为已读
 @app.route('/api/messages/<int:message_id>/read', methods=['POST'])
 def mark_message_as_read(message_id):
-    try:
-        success = message_manager.mark_as_read(message_id)
-        if success:
-            return jsonify({'success': True, 'message': '标记成功'})
-        else:
-            return jsonify({'success': False, 'error': '标记失败'}), 500
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    return handle(handlers.mark_message_as_read(message_id))
 
-# 删除消息
 @app.route('/api/messages/<int:message_id>', methods=['DELETE'])
 def delete_message(message_id):
-    try:
-        success = message_manager.delete_message(message_id)
-        if success:
-            return jsonify({'success': True, 'message': '删除成功'})
-        else:
-            return jsonify({'success': False, 'error': '删除失败'}), 500
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    return handle(handlers.delete_message(message_id))
+
+# 以NDJSON格式流式导出所有消息
+# 逐块读取并输出，内存占用与消息总数无关
+@app.route('/api/messages/export')
+def export_messages():
+    return Response(
+        stream_with_context(iter_ndjson(message_manager.iter_messages())),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={handlers.export_filename()}'}
+    )
+
+@app.route('/api/messages/batch', methods=['POST'])
+def batch_messages():
+    return handle(handlers.batch_messages(request.get_json(silent=True)))
 
 # 消息管理页面
 @app.route('/message-management')
@@ -90,4 +144,8 @@ def message_management():
 
 # 启动服务器
 if __name__ == '__main__':
-    app.run(host='127.0.0.1', port=5000, debug=True)
\ No newline at end of file
+    # 收到SIGTERM（stop命令）时正常退出，让消息写入队列在退出前写完（atexit中关闭队列）
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # 不使用重载器：开启时SIGTERM只会发给重载器的父进程，实际提供服务的子进程
+    # 会在stop命令结束整个进程组时被强制结束，队列中的消息来不及写入
+    app.run(host='127.0.0.1', port=5000, debug=True, use_reloader=False)
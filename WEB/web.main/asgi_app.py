@@ -0,0 +1,169 @@
+"""
+网站的ASGI版本，路由与app.py相同
+
+基于Quart（与Flask接口一致的asyncio框架），存储操作通过AsyncMessageManager
+放到线程池中执行，慢速的磁盘写入不会阻塞其他连接。
+参数校验和响应内容在handlers.py中，与app.py共用。
+
+依赖见requirements.txt（quart和hypercorn）。
+
+启动方式:
+    python asgi_app.py
+    hypercorn asgi_app:app --bind 127.0.0.1:5000
+"""
+
+from quart import Quart, Response, render_template, send_from_directory, abort, jsonify, request
+
+# 创建Quart应用
+app = Quart(__name__,
+            static_folder='../../staic',
+            static_url_path='/staic',
+            template_folder='../../templates/htmls')
+
+# 导入消息管理器
+from messages import message_manager
+from async_messages import AsyncMessageManager
+from message_model import dumps
+from message_ndjson import aiter_ndjson
+import handlers
+from handlers import static_assets, website_config, page_cache, CONFIG_CACHE_CONTROL
+
+async_manager = AsyncMessageManager(message_manager)
+
+app.jinja_env.globals['asset_url'] = static_assets.url
+
+def reply_response(reply):
+    """把handlers返回的Reply转换为响应，payload中可以直接包含Message"""
+    return Response(dumps(reply.payload), status=reply.status, headers=reply.headers,
+                    mimetype='application/json')
+
+async def handle(handler):
+    """执行handlers中的消息接口，存储操作在线程池中进行"""
+    return reply_response(await handlers.run_async(handler, async_manager))
+
+# 关闭服务器前写完消息队列
+@app.after_serving
+async def shutdown():
+    await async_manager.close()
+
+# 消息接口限流，与app.py相同
+@app.before_request
+async def limit_message_requests():
+    data = None
+    if handlers.is_submit(request.method, request.path):
+        # 解析结果会被缓存，接口中再次读取不会重复解析
+        data = await request.get_json(silent=True)
+    reply = handlers.check_rate_limit(request.method, request.path, request.remote_addr, data)
+    return reply_response(reply) if reply else None
+
+# 构建后的静态资源，按Accept-Encoding返回预压缩版本
+@app.route('/staic/dist/<path:filename>')
+async def dist_static(filename):
+    selected = static_assets.select(filename, request.accept_encodings)
+    if selected is None:
+        abort(404)
+    variant, encoding, mimetype = selected
+    response = await send_from_directory(static_assets.dist_dir, variant, mimetype=mimetype)
+    response.headers.update(static_assets.headers(encoding))
+    return response
+
+# 首页路由
+@app.route('/')
+async def index():
+    try:
+        snapshot = website_config.get()
+        site_config, config_version = snapshot.data, snapshot.etag
+    except Exception as e:
+        print(f"加载网站配置出错: {e}")
+        site_config, config_version = {}, None
+
+    # 渲染在事件循环中进行，过期时并发请求最多重复渲染几次，不需要加锁
+    key = (config_version, static_assets.version())
+    page = page_cache.get('index', key)
+    if page is None:
+        page = page_cache.put('index', key, await render_template('index.html', site_config=site_config))
+
+    headers = {'ETag': f'"{page.etag}"', 'Cache-Control': CONFIG_CACHE_CONTROL}
+    if request.if_none_match.contains(page.etag):
+        return Response(status=304, headers=headers)
+    return Response(page.body, mimetype='text/html', headers=headers)
+
+# 获取网站配置
+# 缓存命中时只有一次stat，不需要放到线程池中
+@app.route('/api/config')
+async def get_config():
+    try:
+        snapshot = website_config.get()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    headers = {'ETag': f'"{snapshot.etag}"', 'Cache-Control': CONFIG_CACHE_CONTROL}
+    if request.if_none_match.contains(snapshot.etag):
+        return Response(status=304, headers=headers)
+    return Response(snapshot.body, mimetype='application/json', headers=headers)
+
+# 消息管理路由，参数和返回内容见handlers.py中的同名函数
+
+@app.route('/api/messages')
+async def get_messages():
+    return await handle(handlers.get_messages(request.args))
+
+@app.route('/api/messages/stats')
+async def message_stats():
+    return await handle(handlers.message_stats(request.args))
+
+@app.route('/api/messages/archive')
+async def list_archive():
+    return await handle(handlers.list_archive())
+
+@app.route('/api/messages/archive/<segment>')
+async def get_archived_messages(segment):
+    return await handle(handlers.get_archived_messages(segment, request.args))
+
+@app.route('/api/messages/search')
+async def search_messages():
+    return await handle(handlers.search_messages(request.args))
+
+# 消息变更推送（SSE），与app.py相同
+# 等待事件时只占用一个future，大量空闲的管理页面连接不会占用线程池
+@app.route('/api/messages/stream')
+async def stream_messages():
+    events = message_manager.events.astream(request.headers.get('Last-Event-ID'))
+    response = Response(events, mimetype='text/event-stream', headers=handlers.STREAM_HEADERS)
+    # 长连接，不受响应超时限制
+    response.timeout = None
+    return response
+
+@app.route('/api/messages', methods=['POST'])
+async def add_message():
+    return await handle(handlers.add_message(await request.get_json(silent=True)))
+
+@app.route('/api/messages/<int:message_id>/read', methods=['POST'])
+async def mark_message_as_read(message_id):
+    return await handle(handlers.mark_message_as_read(message_id))
+
+@app.route('/api/messages/<int:message_id>', methods=['DELETE'])
+async def delete_message(message_id):
+    return await handle(handlers.delete_message(message_id))
+
+# 以NDJSON格式流式导出所有消息
+@app.route('/api/messages/export')
+async def export_messages():
+    return Response(
+        aiter_ndjson(async_manager.iter_messages()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={handlers.export_filename()}'}
+    )
+
+@app.route('/api/messages/batch', methods=['POST'])
+async def batch_messages():
+    return await handle(handlers.batch_messages(await request.get_json(silent=True)))
+
+# 消息管理页面
+@app.route('/message-management')
+async def message_management():
+    return await render_template('message_management.html')
+
+# 启动服务器
+if __name__ == '__main__':
+    app.run(host='127.0.0.1', port=5000)
@@ -0,0 +1,92 @@
+"""
+MessageManager的异步外观
+
+存储的读写都是阻塞的文件或数据库操作，这里把它们放到线程池中执行，
+事件循环在等待I/O时可以继续处理其他连接。供asgi_app.py使用。
+"""
+
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from message_store import DEFAULT_CHUNK_SIZE, DEFAULT_PAGE_SIZE
+
+# 执行存储操作的线程数，存储内部有锁，线程过多只会增加排队
+DEFAULT_MAX_WORKERS = 8
+
+
+class AsyncMessageManager:
+    """在线程池中调用MessageManager的方法，返回值与同步版本相同"""
+
+    def __init__(self, manager, max_workers=DEFAULT_MAX_WORKERS):
+        self._manager = manager
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='message-io')
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def get_all_messages(self):
+        return await self._run(self._manager.get_all_messages)
+
+    async def iter_messages(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """异步逐条产出所有消息，每次在线程池中读取一块"""
+        iterator = self._manager.iter_messages()
+        while True:
+            chunk = await self._run(lambda: list(itertools.islice(iterator, chunk_size)))
+            if not chunk:
+                return
+            for message in chunk:
+                yield message
+
+    async def get_messages_page(self, limit=DEFAULT_PAGE_SIZE, cursor=None, unread_only=False, since=None):
+        return await self._run(self._manager.get_messages_page, limit, cursor, unread_only, since)
+
+    async def get_unread_count(self):
+        return await self._run(self._manager.get_unread_count)
+
+    async def get_stats(self, days=None):
+        return await self._run(self._manager.get_stats, days)
+
+    async def get_archive_segments(self):
+        return await self._run(self._manager.get_archive_segments)
+
+    async def get_archived_messages(self, segment, limit=DEFAULT_PAGE_SIZE, offset=0):
+        # 第一次读取某个段需要解压，放到线程池中
+        return await self._run(self._manager.get_archived_messages, segment, limit, offset)
+
+    async def apply_retention(self):
+        return await self._run(self._manager.apply_retention)
+
+    async def search_messages(self, query, limit=DEFAULT_PAGE_SIZE, offset=0):
+        return await self._run(self._manager.search_messages, query, limit, offset)
+
+    async def add_message(self, name, email, subject, message):
+        return await self._run(self._manager.add_message, name, email, subject, message)
+
+    async def enqueue_message(self, name, email, subject, message):
+        # 入队时需要预留id，同样会访问存储
+        return await self._run(self._manager.enqueue_message, name, email, subject, message)
+
+    async def enqueue_many(self, messages):
+        return await self._run(self._manager.enqueue_many, messages)
+
+    async def mark_as_read(self, message_id):
+        return await self._run(self._manager.mark_as_read, message_id)
+
+    async def delete_message(self, message_id):
+        return await self._run(self._manager.delete_message, message_id)
+
+    async def add_many(self, messages):
+        return await self._run(self._manager.add_many, messages)
+
+    async def mark_many_read(self, message_ids):
+        return await self._run(self._manager.mark_many_read, message_ids)
+
+    async def delete_many(self, message_ids):
+        return await self._run(self._manager.delete_many, message_ids)
+
+    async def close(self):
+        """写完队列中的消息并关闭存储，然后停止线程池"""
+        await self._run(self._manager.close)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,276 @@
+"""
+静态资源构建
+
+把staic/下的样式和脚本压缩后，以内容哈希命名写入staic/dist/，
+同时生成预压缩的.gz和.br版本（.br需要安装brotli），并写出manifest.json。
+服务器根据manifest把模板中的资源地址替换为带哈希的地址，
+按Accept-Encoding直接返回预压缩文件，并设置长期不变的缓存头。
+
+用法:
+    python build_static.py [--clean]
+--clean 删除不在本次manifest中的旧版本文件。资源修改后需要重新构建，
+没有构建或资源不在manifest中时页面仍使用原始文件。
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from file_lock import atomic_write
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.abspath(os.path.join(script_dir, '../../staic'))
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_FILE = os.path.join(DIST_DIR, 'manifest.json')
+
+# 需要构建的资源（相对staic/的路径）
+STATIC_ASSETS = (
+    'css/main.css',
+    'js/main.js',
+    'vex/vex.css',
+)
+
+# 文件名中保留的哈希长度
+HASH_LENGTH = 12
+
+# 小于该大小的文件压缩收益很小，不生成压缩版本
+MIN_COMPRESS_SIZE = 256
+
+
+# ---------- 压缩 ----------
+
+def _skip_string(text, i):
+    """i指向引号，返回字符串结束后的位置"""
+    quote = text[i]
+    i += 1
+    while i < len(text):
+        c = text[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == quote:
+            return i + 1
+        if c == '\n' and quote != '`':
+            # 未闭合的普通字符串，交给浏览器报错
+            return i
+        i += 1
+    return i
+
+
+def minify_css(text):
+    """删除注释和多余空白，保留字符串原样"""
+    out = []
+    i = 0
+    pending_space = False
+    while i < len(text):
+        c = text[i]
+        if c in '"\'':
+            end = _skip_string(text, i)
+            if pending_space and out and out[-1] not in '{};:,>(':
+                out.append(' ')
+            pending_space = False
+            out.append(text[i:end])
+            i = end
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = len(text) if end < 0 else end + 2
+            pending_space = True
+        elif c.isspace():
+            pending_space = True
+            i += 1
+        else:
+            if c in '{};,>)':
+                pending_space = False
+                if c == '}' and out and out[-1] == ';':
+                    out.pop()
+            elif pending_space and out and out[-1] not in '{};:,>(':
+                out.append(' ')
+            pending_space = False
+            out.append(c)
+            i += 1
+    return ''.join(out).strip() + '\n'
+
+
+# 这些字符或关键字之后出现的/是正则表达式的开始，而不是除号
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case', 'do', 'else'}
+_WORD_RE = re.compile(r'[A-Za-z_$][\w$]*$')
+
+
+def _regex_allowed(code):
+    """根据已输出的代码判断下一个/是否开始一个正则表达式"""
+    stripped = code.rstrip()
+    if not stripped:
+        return True
+    if stripped[-1] in _REGEX_PRECEDERS:
+        return True
+    match = _WORD_RE.search(stripped)
+    return match is not None and match.group() in _REGEX_KEYWORDS
+
+
+def _skip_regex(text, i):
+    """i指向开始的/，返回正则表达式（含标志）结束后的位置"""
+    i += 1
+    in_class = False
+    while i < len(text) and text[i] != '\n':
+        c = text[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '[':
+            in_class = True
+        elif c == ']':
+            in_class = False
+        elif c == '/' and not in_class:
+            i += 1
+            while i < len(text) and (text[i].isalnum() or text[i] == '_'):
+                i += 1
+            return i
+        i += 1
+    return i
+
+
+def minify_js(text):
+    """
+    保守的脚本压缩：删除注释、行首行尾空白和空行
+
+    保留换行，不依赖自动分号插入规则的变化，压缩结果与原脚本行为一致。
+    """
+    out = []
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c in '"\'`':
+            end = _skip_string(text, i)
+            out.append(text[i:end])
+            i = end
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = len(text) if end < 0 else end
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            comment = text[i:len(text) if end < 0 else end]
+            i = len(text) if end < 0 else end + 2
+            # 跨行的注释替换为换行，避免两行代码被连在一起
+            out.append('\n' if '\n' in comment else ' ')
+        elif c == '/' and _regex_allowed(''.join(out[-8:])):
+            end = _skip_regex(text, i)
+            out.append(text[i:end])
+            i = end
+        else:
+            out.append(c)
+            i += 1
+
+    lines = (line.strip() for line in ''.join(out).split('\n'))
+    return '\n'.join(line for line in lines if line) + '\n'
+
+
+MINIFIERS = {
+    '.css': minify_css,
+    '.js': minify_js,
+}
+
+
+# ---------- 构建 ----------
+
+def hashed_name(path, content):
+    """css/main.css -> css/main.<内容哈希>.css"""
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    root, ext = os.path.splitext(path)
+    return f'{root}.{digest}{ext}'
+
+
+def _write_if_changed(path, data):
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, data)
+
+
+def build_asset(path):
+    """构建一个资源，返回其manifest条目"""
+    with open(os.path.join(STATIC_DIR, path), 'r', encoding='utf-8') as f:
+        source = f.read()
+    minify = MINIFIERS.get(os.path.splitext(path)[1])
+    content = (minify(source) if minify else source).encode('utf-8')
+
+    name = hashed_name(path, content)
+    output = os.path.join(DIST_DIR, name)
+    _write_if_changed(output, content)
+
+    encodings = []
+    if len(content) >= MIN_COMPRESS_SIZE:
+        if brotli is not None:
+            _write_if_changed(output + '.br', brotli.compress(content, quality=11))
+            encodings.append('br')
+        # mtime固定为0，内容不变时压缩结果也不变
+        _write_if_changed(output + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+        encodings.append('gzip')
+
+    return {
+        'file': name,
+        'size': len(content),
+        'source_size': len(source.encode('utf-8')),
+        'encodings': encodings,
+    }
+
+
+def clean_dist(manifest):
+    """删除不在manifest中的旧版本文件"""
+    keep = {os.path.normpath(MANIFEST_FILE)}
+    for entry in manifest['assets'].values():
+        base = os.path.normpath(os.path.join(DIST_DIR, entry['file']))
+        keep.update((base, base + '.gz', base + '.br'))
+    removed = 0
+    for root, _, files in os.walk(DIST_DIR):
+        for filename in files:
+            path = os.path.normpath(os.path.join(root, filename))
+            if path not in keep:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def build(assets=STATIC_ASSETS, clean=False):
+    manifest = {'version': 1, 'assets': {}}
+    for path in assets:
+        entry = build_asset(path)
+        manifest['assets'][path] = entry
+        print(f"{path} -> dist/{entry['file']} "
+              f"({entry['source_size']} -> {entry['size']} 字节，{', '.join(entry['encodings']) or '不压缩'})")
+
+    os.makedirs(DIST_DIR, exist_ok=True)
+    atomic_write(MANIFEST_FILE, json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+    if clean:
+        print(f"已删除 {clean_dist(manifest)} 个旧文件")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='构建带哈希和预压缩版本的静态资源')
+    parser.add_argument('--clean', action='store_true', help='删除不在本次构建结果中的旧文件')
+    args = parser.parse_args(argv)
+
+    if brotli is None:
+        print("未安装brotli，只生成.gz版本（pip install brotli）")
+    try:
+        build(clean=args.clean)
+    except OSError as e:
+        print(f"构建静态资源时出错: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import os
+import sys
+import tempfile
+import threading
+
+if sys.platform == 'win32':
+    import msvcrt
+
+    def _lock_fd(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        while True:
+            try:
+                # LK_LOCK最多重试10秒后抛出异常，继续等待直到拿到锁
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock_fd(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_fd(fd):
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock_fd(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class FileLock:
+    """
+    跨进程的排他文件锁
+
+    同一进程内的线程先竞争内部的可重入锁，因此同一线程可以嵌套获取；
+    进程之间通过对锁文件加锁互斥（POSIX使用flock，Windows使用msvcrt.locking）。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+        self._pid = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        try:
+            if self._depth == 0:
+                # fork出的子进程不能复用父进程的文件描述符，否则会共享同一把锁
+                if self._fd is None or self._pid != os.getpid():
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                    self._pid = os.getpid()
+                _lock_fd(self._fd)
+            self._depth += 1
+        except Exception:
+            self._thread_lock.release()
+            raise
+
+    def release(self):
+        try:
+            self._depth -= 1
+            if self._depth == 0:
+                _unlock_fd(self._fd)
+        finally:
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def _default_file_mode():
+    """按当前umask计算新文件的权限（mkstemp创建的临时文件只有所有者可读写）"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# 读取umask需要临时修改它，只在导入时（还没有其他线程创建文件时）计算一次
+DEFAULT_FILE_MODE = _default_file_mode()
+
+
+def atomic_write(path, data):
+    """
+    原子地写入文件：先写同目录下的唯一临时文件并fsync，再重命名覆盖目标文件，
+    读者要么看到旧内容，要么看到完整的新内容。目标文件已存在时保留其权限。
+    """
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = DEFAULT_FILE_MODE
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp',
+                                    dir=os.path.dirname(path) or '.')
+    try:
+        if hasattr(os, 'fchmod'):
+            os.fchmod(fd, mode)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
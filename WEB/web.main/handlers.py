@@ -0,0 +1,307 @@
+"""
+app.py（Flask）和asgi_app.py（Quart）共用的请求处理逻辑
+
+两个入口只负责路由、读取请求和生成响应，参数校验、存储调用和响应内容都在这里，
+修改接口时只需要改一处。
+
+消息接口的处理函数是生成器：需要访问存储时yield call('方法名', 参数...)，
+由入口执行对应的MessageManager方法后把结果送回。app.py用run()直接调用，
+asgi_app.py用run_async()交给AsyncMessageManager的线程池，两边的方法名和返回值相同。
+处理函数最后返回Reply，入口用message_model.dumps编码为JSON响应。
+"""
+
+import datetime
+import os
+from collections import namedtuple
+
+from json_cache import CachedJSONFile
+from message_archive import is_segment_name
+from message_store import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from messages import read_messages_config
+from page_cache import PageCache
+from rate_limit import create_rate_limiter
+from static_assets import StaticAssets
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 静态资源：模板通过asset_url()引用，构建后（build_static.py）自动使用带哈希的预压缩版本
+static_assets = StaticAssets(os.path.join(script_dir, '../../staic'))
+
+# 网站配置文件，解析结果缓存在内存中，文件修改后自动重新加载
+CONFIG_PATH = os.path.join(script_dir, '../../staic', 'KEY', 'json', 'website_config.json')
+website_config = CachedJSONFile(CONFIG_PATH)
+
+# 配置接口的缓存策略：浏览器可以缓存，但每次使用前都要用ETag确认，未变化时只返回304
+CONFIG_CACHE_CONTROL = 'public, no-cache'
+
+# 按网站配置渲染好的首页，配置或静态资源版本变化时重新渲染
+page_cache = PageCache()
+
+# 消息接口的限流（配置见Web.dir中messages.rate_limit），未启用时为None
+# submit: 每个IP提交留言的频率；email: 每个邮箱的留言频率；api: 每个IP访问其他消息接口的频率
+rate_limiter = create_rate_limiter(read_messages_config().get('rate_limit', {}), script_dir)
+
+# 批量接口单次最多处理的消息数（标记已读和删除）
+MAX_BATCH_SIZE = 1000
+
+# 批量提交单次最多包含的新消息数；接口不需要身份验证，上限与一次正常的留言量相当
+MAX_BATCH_ADD_SIZE = 20
+
+# SSE响应头：不缓存，也不让nginx等代理缓冲
+STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+# 处理结果：JSON内容（可以包含Message）、状态码和额外的响应头
+Reply = namedtuple('Reply', ('payload', 'status', 'headers'))
+
+
+def ok(payload=None, status=200, headers=None):
+    return Reply({'success': True, **(payload or {})}, status, headers or {})
+
+
+def error(message, status, headers=None):
+    return Reply({'success': False, 'error': message}, status, headers or {})
+
+
+def call(name, *args):
+    """处理函数中yield的存储操作：MessageManager的方法名及其参数"""
+    return name, args
+
+
+def run(handler, manager):
+    """同步执行处理函数，存储操作直接调用manager（app.py）"""
+    try:
+        step = next(handler)
+        while True:
+            name, args = step
+            step = handler.send(getattr(manager, name)(*args))
+    except StopIteration as stop:
+        return stop.value
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def run_async(handler, manager):
+    """异步执行处理函数，manager是AsyncMessageManager（asgi_app.py）"""
+    try:
+        step = next(handler)
+        while True:
+            name, args = step
+            step = handler.send(await getattr(manager, name)(*args))
+    except StopIteration as stop:
+        return stop.value
+    except Exception as e:
+        return error(str(e), 500)
+
+
+# ---------- 限流 ----------
+
+def is_submit(method, path):
+    """是否为可能提交留言的请求（需要读取请求体：单条提交和批量接口）"""
+    return method == 'POST' and path in ('/api/messages', '/api/messages/batch')
+
+
+def _rate_limit_email(message):
+    email = message.get('email') if isinstance(message, dict) else None
+    if isinstance(email, str):
+        return email.strip().lower()[:254]
+    return None
+
+
+def _submitted_messages(path, data):
+    """请求中提交的新消息，不是提交留言的请求返回None"""
+    if path == '/api/messages':
+        return [data]
+    if isinstance(data, dict) and data.get('action') == 'add' and isinstance(data.get('messages'), list):
+        return data['messages']
+    return None
+
+
+def check_rate_limit(method, path, remote_addr, data=None):
+    """
+    消息接口限流：提交留言按IP和邮箱分别限流，其他消息接口按IP限流
+
+    批量提交与逐条提交的花费相同：每条消息消耗一个IP的提交令牌，每个不同的邮箱消耗一个邮箱令牌；
+    条数超过提交规则的桶容量时直接拒绝。
+    data为is_submit()的请求解析好的请求体，其他请求不需要。被限流时返回Reply，否则返回None。
+    """
+    if rate_limiter is None or not path.startswith('/api/messages'):
+        return None
+    submitted = _submitted_messages(path, data) if is_submit(method, path) else None
+    if submitted is not None:
+        burst = rate_limiter.burst('submit')
+        if burst is not None and len(submitted) > burst:
+            return error(f'单次最多提交{burst}条消息', 400)
+        emails = {_rate_limit_email(message) for message in submitted}
+        wait = rate_limiter.check_many(submit=[remote_addr] * len(submitted), email=list(emails))
+    else:
+        wait = rate_limiter.check(api=remote_addr)
+    if wait:
+        return error('请求过于频繁，请稍后再试', 429, {'Retry-After': rate_limiter.retry_after(wait)})
+    return None
+
+
+# ---------- 其他 ----------
+
+def export_filename():
+    """NDJSON导出文件名"""
+    return f"messages-{datetime.date.today().strftime('%Y%m%d')}.ndjson"
+
+
+def _offset_page_args(args):
+    limit = max(1, min(args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    offset = max(0, args.get('offset', 0, type=int))
+    return limit, offset
+
+
+def _offset_page(messages, total, limit, offset):
+    next_offset = offset + limit if offset + limit < total else None
+    return ok({'messages': messages, 'total': total, 'next_offset': next_offset})
+
+
+def _flag(args, name):
+    return args.get(name, 'false').lower() in ('1', 'true', 'yes')
+
+
+def _missing_fields(message):
+    return not isinstance(message, dict) or not all([message.get('name'), message.get('email'), message.get('message')])
+
+
+# ---------- 消息接口（生成器，见模块说明） ----------
+
+def get_messages(args):
+    """
+    获取消息
+
+    支持分页参数: limit(每页条数), cursor(上一页返回的游标), unread_only(只看未读), since(ISO时间)
+    不带参数时返回第一页（DEFAULT_PAGE_SIZE条）；需要一次取得全部消息时显式传入all=true，
+    消息很多时应改用/api/messages/export流式导出
+    """
+    if _flag(args, 'all'):
+        messages = yield call('get_all_messages')
+        return ok({'messages': messages})
+
+    limit = args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    cursor = args.get('cursor', None, type=int)
+    unread_only = _flag(args, 'unread_only')
+    since = args.get('since') or None
+
+    messages, next_cursor = yield call('get_messages_page', limit, cursor, unread_only, since)
+    unread_count = yield call('get_unread_count')
+    return ok({'messages': messages, 'next_cursor': next_cursor, 'unread_count': unread_count})
+
+
+def message_stats(args):
+    """
+    消息统计：总数、未读数和每日消息数，计数器随写入增量维护，适合频繁轮询
+
+    参数: days(每日消息数只返回最近几天，默认全部)
+    """
+    stats = yield call('get_stats', args.get('days', None, type=int))
+    if stats is None:
+        return error('获取消息统计失败', 500)
+    return ok(stats, headers={'Cache-Control': 'no-cache'})
+
+
+def list_archive():
+    """列出归档段，只读取归档清单"""
+    segments = yield call('get_archive_segments')
+    if segments is None:
+        return error('读取归档列表失败', 500)
+    return ok({'segments': segments})
+
+
+def get_archived_messages(segment, args):
+    """
+    分页读取一个归档段（YYYY-MM）中的消息，按id倒序，只打开这一个压缩段
+
+    参数: limit(每页条数), offset(跳过的条数)
+    """
+    if not is_segment_name(segment):
+        return error('归档段不存在', 404)
+    limit, offset = _offset_page_args(args)
+    messages, total = yield call('get_archived_messages', segment, limit, offset)
+    return _offset_page(messages, total, limit, offset)
+
+
+def search_messages(args):
+    """
+    全文搜索消息，结果按相关度排序
+
+    参数: q(搜索词), limit(每页条数), offset(跳过的条数)
+    """
+    query = args.get('q', '').strip()
+    if not query:
+        return error('缺少搜索词', 400)
+    limit, offset = _offset_page_args(args)
+    messages, total = yield call('search_messages', query, limit, offset)
+    return _offset_page(messages, total, limit, offset)
+
+
+def add_message(data):
+    """添加新消息：进入异步写入队列后立即返回，队列已满时让客户端稍后重试"""
+    if _missing_fields(data):
+        return error('缺少必要参数', 400)
+    message_id = yield call('enqueue_message', data.get('name'), data.get('email'),
+                            data.get('subject'), data.get('message'))
+    if message_id is None:
+        return error('服务器繁忙，请稍后再试', 503, {'Retry-After': '1'})
+    return ok({'message': '消息已提交', 'id': message_id}, 202)
+
+
+def mark_message_as_read(message_id):
+    """标记消息为已读"""
+    if (yield call('mark_as_read', message_id)):
+        return ok({'message': '标记成功'})
+    return error('标记失败', 500)
+
+
+def delete_message(message_id):
+    """删除消息"""
+    if (yield call('delete_message', message_id)):
+        return ok({'message': '删除成功'})
+    return error('删除失败', 500)
+
+
+def batch_messages(data):
+    """
+    批量操作消息
+
+    请求体: {"action": "add", "messages": [{name, email, subject, message}, ...]}
+        或: {"action": "read" | "delete", "ids": [1, 2, ...]}
+
+    add与单条提交一样进入异步写入队列，队列放不下全部消息时返回503；
+    read和delete在一次存储提交中完成。
+    """
+    if not isinstance(data, dict):
+        data = {}
+    action = data.get('action')
+
+    if action == 'add':
+        messages = data.get('messages')
+        if not isinstance(messages, list) or not messages:
+            return error('缺少必要参数', 400)
+        if len(messages) > MAX_BATCH_ADD_SIZE:
+            return error(f'单次最多提交{MAX_BATCH_ADD_SIZE}条消息', 400)
+        for i, message in enumerate(messages):
+            if _missing_fields(message):
+                return error(f'第{i + 1}条消息缺少必要参数', 400)
+
+        ids = yield call('enqueue_many', messages)
+        if ids is None:
+            return error('服务器繁忙，请稍后再试', 503, {'Retry-After': '1'})
+        return ok({'message': '消息已提交', 'ids': ids}, 202)
+
+    if action in ('read', 'delete'):
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+            return error('缺少必要参数', 400)
+        if len(ids) > MAX_BATCH_SIZE:
+            return error(f'单次最多处理{MAX_BATCH_SIZE}条消息', 400)
+
+        done = yield call('mark_many_read' if action == 'read' else 'delete_many', ids)
+        if done is None:
+            return error('批量操作失败', 500)
+        done_set = set(done)
+        return ok({'ids': done, 'not_found': [i for i in ids if i not in done_set]})
+
+    return error('未知的批量操作', 400)
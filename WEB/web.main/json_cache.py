@@ -0,0 +1,79 @@
+"""
+内存中缓存的JSON文件
+
+文件只在内容变化后才重新读取和解析：每次访问最多每隔check_interval秒
+stat一次文件，修改时间、大小和inode都没变时直接返回缓存。
+缓存中同时保存预先序列化好的响应体和强ETag，接口可以直接返回或回复304。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+# 两次检查文件是否变化的最小间隔（秒）
+DEFAULT_CHECK_INTERVAL = 0.5
+
+
+def _file_signature(stat_result):
+    return stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino
+
+
+class JSONSnapshot:
+    """某一时刻的文件内容"""
+
+    __slots__ = ('data', 'body', 'etag', 'signature')
+
+    def __init__(self, data, signature):
+        # data由所有请求共享，调用方不能修改
+        self.data = data
+        self.body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        # 强ETag：内容的哈希，文件被重写但内容相同时不变
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.signature = signature
+
+
+class CachedJSONFile:
+    """按需重新加载的JSON文件缓存，线程安全"""
+
+    def __init__(self, path, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._last_check = 0.0
+
+    def get(self):
+        """
+        返回最新的JSONSnapshot
+
+        Raises:
+            OSError, ValueError: 文件不存在或不是合法的JSON（已有缓存时继续使用旧内容）
+        """
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._last_check < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and now - self._last_check < self.check_interval:
+                return snapshot
+            try:
+                signature = _file_signature(os.stat(self.path))
+                if snapshot is None or signature != snapshot.signature:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        snapshot = JSONSnapshot(json.load(f), signature)
+                    self._snapshot = snapshot
+            except (OSError, ValueError) as e:
+                # 文件正在被改写或暂时不可读，继续使用上一次成功加载的内容
+                if snapshot is None:
+                    raise
+                print(f"重新加载 {os.path.basename(self.path)} 失败，继续使用缓存: {e}")
+            self._last_check = now
+            return snapshot
+
+    def invalidate(self):
+        """下次访问时立即检查文件"""
+        self._last_check = 0.0
@@ -0,0 +1,177 @@
+"""
+旧消息的归档存储
+
+按保留策略把已读的旧消息从在线存储移到按月分区的压缩归档段中：
+    archive_dir/2026-01.ndjson.gz
+    archive_dir/2026-02.ndjson.gz
+    archive_dir/manifest.json
+每个段是一个gzip文件，每次归档向对应月份的段追加一个gzip成员（gzip允许多个成员首尾相接），
+已有内容不需要重写。manifest记录每个段的消息数、id范围和有效长度，
+列出归档、统计数量都只读manifest，只有查询某个月的消息时才打开对应的段。
+
+写入顺序是先追加并fsync归档段、再更新manifest、最后从在线存储删除，
+中途崩溃时重新归档可能产生重复记录，读取时按id去重。
+"""
+
+import gzip
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+from file_lock import FileLock, atomic_write
+from json_cache import CachedJSONFile
+from message_model import decode_message, dumps_pretty, encode_message
+from message_store import message_day
+
+MANIFEST_NAME = 'manifest.json'
+SEGMENT_SUFFIX = '.ndjson.gz'
+
+# 时间戳无法识别月份的消息放在这个段中
+UNKNOWN_SEGMENT = 'unknown'
+
+# 内存中保留的已解析段数
+DEFAULT_CACHED_SEGMENTS = 2
+
+_MONTH_RE = re.compile(r'^\d{4}-\d{2}$')
+
+
+def segment_name(message):
+    """消息所属的归档段（YYYY-MM）"""
+    month = message_day(message['timestamp'])[:7]
+    return month if _MONTH_RE.match(month) else UNKNOWN_SEGMENT
+
+
+def is_segment_name(name):
+    return name == UNKNOWN_SEGMENT or _MONTH_RE.match(name) is not None
+
+
+class MessageArchive:
+    """按月分区的归档段集合，线程安全，多个进程可以同时使用"""
+
+    def __init__(self, archive_dir, cached_segments=DEFAULT_CACHED_SEGMENTS):
+        self.archive_dir = archive_dir
+        os.makedirs(archive_dir, exist_ok=True)
+        self.manifest_path = os.path.join(archive_dir, MANIFEST_NAME)
+        self._manifest = CachedJSONFile(self.manifest_path)
+        # 追加段文件和更新manifest时持有；可重入，归档流程可以在外层持有它
+        self.lock = FileLock(os.path.join(archive_dir, '.lock'))
+        self._lock = threading.Lock()
+        self.cached_segments = cached_segments
+        # 段名 -> (文件有效长度, 消息列表)，最近使用的在末尾
+        self._cache = OrderedDict()
+
+    def _segment_path(self, name):
+        return os.path.join(self.archive_dir, name + SEGMENT_SUFFIX)
+
+    def _read_manifest(self):
+        try:
+            return self._manifest.get().data
+        except FileNotFoundError:
+            return {'segments': {}}
+
+    # ---------- 查询（只读manifest） ----------
+
+    def segments(self):
+        """
+        所有归档段的概况，按月份排序
+
+        Returns:
+            list: [{'name', 'count', 'min_id', 'max_id'}]
+        """
+        segments = self._read_manifest().get('segments', {})
+        return [
+            {'name': name, 'count': info['count'], 'min_id': info['min_id'], 'max_id': info['max_id']}
+            for name, info in sorted(segments.items())
+        ]
+
+    def count(self):
+        """归档的消息总数"""
+        return sum(info['count'] for info in self._read_manifest().get('segments', {}).values())
+
+    # ---------- 查询（按需打开段） ----------
+
+    def read_segment(self, name):
+        """
+        读取一个归档段中的全部消息（按id排序），段不存在时返回空列表
+
+        解析结果按段的有效长度缓存，段被追加后自动重新读取。
+        """
+        info = self._read_manifest().get('segments', {}).get(name)
+        if info is None:
+            return []
+        size = info['size']
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached is not None and cached[0] == size:
+                self._cache.move_to_end(name)
+                return cached[1]
+
+        messages = self._load_segment(name, size)
+        with self._lock:
+            self._cache[name] = (size, messages)
+            self._cache.move_to_end(name)
+            while len(self._cache) > self.cached_segments:
+                self._cache.popitem(last=False)
+        return messages
+
+    def _load_segment(self, name, size):
+        """解压并解析段文件的前size字节，按id去重"""
+        by_id = {}
+        try:
+            with open(self._segment_path(name), 'rb') as raw:
+                data = raw.read(size)
+            for line in gzip.decompress(data).splitlines():
+                if line:
+                    message = decode_message(line)
+                    by_id[message.id] = message
+        except (OSError, EOFError, zlib.error, ValueError) as e:
+            print(f"读取归档段 {name} 时出错: {e}")
+        return [by_id[message_id] for message_id in sorted(by_id)]
+
+    # ---------- 写入 ----------
+
+    def append(self, messages):
+        """
+        把消息追加到各自月份的归档段，返回写入的条数
+
+        返回后消息已经持久化，调用方可以从在线存储中删除它们。
+        """
+        groups = {}
+        for message in messages:
+            groups.setdefault(segment_name(message), []).append(message)
+        if not groups:
+            return 0
+
+        with self.lock:
+            self._manifest.invalidate()
+            manifest = self._read_manifest()
+            segments = dict(manifest.get('segments', {}))
+            for name, group in groups.items():
+                info = segments.get(name, {'count': 0, 'size': 0, 'min_id': None, 'max_id': None})
+                size = self._append_segment(name, info['size'], group)
+                ids = [message['id'] for message in group]
+                segments[name] = {
+                    'count': info['count'] + len(group),
+                    'size': size,
+                    'min_id': min(ids) if info['min_id'] is None else min(info['min_id'], *ids),
+                    'max_id': max(ids) if info['max_id'] is None else max(info['max_id'], *ids),
+                }
+            atomic_write(self.manifest_path, dumps_pretty({'version': 1, 'segments': segments}).encode('utf-8'))
+            self._manifest.invalidate()
+        return sum(len(group) for group in groups.values())
+
+    def _append_segment(self, name, valid_size, messages):
+        """向段文件追加一个gzip成员并fsync，返回新的有效长度"""
+        payload = ''.join(encode_message(message) + '\n' for message in messages).encode('utf-8')
+        member = gzip.compress(payload, compresslevel=9, mtime=0)
+        with open(self._segment_path(name), 'ab') as f:
+            if f.tell() != valid_size:
+                # 上次追加后没能更新manifest（进程中途退出），丢弃不完整的尾部
+                f.truncate(valid_size)
+                f.seek(valid_size)
+            f.write(member)
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
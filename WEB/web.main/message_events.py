@@ -0,0 +1,217 @@
+"""
+消息变更的实时推送（Server-Sent Events）
+
+MessageEvents作为存储的变更监听器，把add、read、delete、reset事件编码成SSE帧，
+按顺序号保存在一个固定长度的环形缓冲区中。每个事件只编码一次，所有订阅者共享。
+
+- 同步订阅者（Flask）在Condition上等待，没有新事件时不占用CPU
+- 异步订阅者（Quart）只登记一个future，空闲连接不占用线程
+- 断线重连时浏览器带上Last-Event-ID，缓冲区中还有的事件会补发；
+  事件已被覆盖或来自其他进程（服务器重启、多进程时连到另一个工作进程）时发送reset，
+  页面重新加载列表
+
+其他进程写入的变更需要调用存储的refresh()才能收到。有订阅者时，
+一个后台线程每隔poll_interval秒调用一次poll（日志存储只stat一次文件，
+SQLite存储只按主键查询一次变更记录），其他进程的写入和本进程的一样以逐条事件推送。
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+from message_model import dumps
+
+# 环形缓冲区保存的最近事件数，重连时最多补发这么多
+DEFAULT_HISTORY = 1000
+
+# 空闲连接发送心跳注释的间隔（秒），代理不会因超时断开连接，服务器也能发现已断开的客户端
+DEFAULT_HEARTBEAT = 15.0
+
+# 检查其他进程写入的间隔（秒）
+DEFAULT_POLL_INTERVAL = 1.0
+
+# 浏览器断线后重连的等待时间（毫秒）
+RETRY_MS = 3000
+
+EVENTS = ('add', 'read', 'delete', 'reset')
+
+
+def _event_payload(event, message):
+    """事件的数据：add发送完整消息，read和delete只发送id（以及已知的删除前状态）"""
+    if event == 'add':
+        return message
+    if event == 'reset' or message is None:
+        return {}
+    payload = {'id': message['id']}
+    if event == 'delete' and 'read' in message:
+        payload['read'] = message['read']
+    return payload
+
+
+class MessageEvents:
+    """消息变更事件的广播器，线程安全"""
+
+    def __init__(self, history=DEFAULT_HISTORY, poll=None, poll_interval=DEFAULT_POLL_INTERVAL):
+        # 事件id带上本实例的标识，其他进程或重启前的id一定不匹配
+        self.instance = f'{os.getpid():x}{int(time.time() * 1000):x}'
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=history)  # (顺序号, 编码好的SSE帧)
+        self._seq = 0
+        self._async_waiters = {}  # future -> 所属事件循环
+        self._subscribers = 0
+        self._poll = poll
+        self.poll_interval = poll_interval
+        self._poller = None
+
+    # ---------- 发布 ----------
+
+    def publish(self, event, message):
+        """
+        发布一个事件，可直接注册为存储的变更监听器
+
+        在存储的锁内被调用，只做一次编码和通知，不会阻塞。
+        """
+        data = dumps(_event_payload(event, message))
+        with self._cond:
+            self._seq += 1
+            frame = f'id: {self.instance}-{self._seq}\nevent: {event}\ndata: {data}\n\n'.encode('utf-8')
+            self._events.append((self._seq, frame))
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, {}
+        for future, loop in waiters.items():
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    # ---------- 读取 ----------
+
+    def _parse_last_id(self, last_event_id):
+        """
+        把Last-Event-ID转换为本实例的顺序号
+
+        Returns:
+            int或None: None表示无法续传（来自其他实例或格式不对）
+        """
+        if not last_event_id:
+            return self._seq
+        instance, _, seq = last_event_id.rpartition('-')
+        if instance != self.instance or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _since(self, seq):
+        """顺序号之后的事件帧，已被覆盖时返回None，调用方需持有锁"""
+        if seq >= self._seq:
+            return []
+        if not self._events or self._events[0][0] > seq + 1:
+            return None
+        # 新事件都在缓冲区末尾，deque按下标访问两端很快，不需要复制整个缓冲区
+        events = self._events
+        return [events[i][1] for i in range(len(events) - (self._seq - seq), len(events))]
+
+    def _reset_frame(self):
+        return f'id: {self.instance}-{self._seq}\nevent: reset\ndata: {{}}\n\n'.encode('utf-8')
+
+    def _collect(self, seq):
+        """返回(要发送的帧, 新的顺序号)，无法续传时发送reset并从当前位置继续"""
+        frames = self._since(seq)
+        if frames is None:
+            return [self._reset_frame()], self._seq
+        return frames, self._seq
+
+    def wait(self, seq, timeout):
+        """阻塞等待seq之后的事件，超时返回空列表"""
+        with self._cond:
+            if seq >= self._seq:
+                self._cond.wait(timeout)
+            return self._collect(seq)
+
+    async def wait_async(self, seq, timeout):
+        """wait()的异步版本，等待期间不占用线程"""
+        with self._cond:
+            if seq < self._seq:
+                return self._collect(seq)
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._async_waiters[future] = loop
+        try:
+            await asyncio.wait({future}, timeout=timeout)
+        finally:
+            with self._cond:
+                self._async_waiters.pop(future, None)
+        with self._cond:
+            return self._collect(seq)
+
+    # ---------- 订阅 ----------
+
+    def _subscribe(self, last_event_id):
+        with self._cond:
+            self._subscribers += 1
+            if self._poll is not None and self._poller is None:
+                self._poller = threading.Thread(target=self._poll_loop, name='message-events-poll', daemon=True)
+                self._poller.start()
+            seq = self._parse_last_id(last_event_id)
+            if seq is None:
+                return self._seq, [self._reset_frame()]
+            return seq, []
+
+    def _unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def _poll_loop(self):
+        """有订阅者时定期同步其他进程的写入，最后一个订阅者断开后退出"""
+        while True:
+            with self._cond:
+                if self._subscribers <= 0:
+                    self._poller = None
+                    return
+            try:
+                self._poll()
+            except Exception as e:
+                print(f"同步消息变更时出错: {e}")
+            time.sleep(self.poll_interval)
+
+    def stream(self, last_event_id=None, heartbeat=DEFAULT_HEARTBEAT):
+        """同步SSE生成器，产出bytes；客户端断开后生成器被关闭，订阅随之取消"""
+        seq, frames = self._subscribe(last_event_id)
+        try:
+            yield f'retry: {RETRY_MS}\n\n'.encode('utf-8')
+            yield from frames
+            while True:
+                frames, seq = self.wait(seq, heartbeat)
+                if frames:
+                    yield b''.join(frames)
+                else:
+                    yield b': ping\n\n'
+        finally:
+            self._unsubscribe()
+
+    async def astream(self, last_event_id=None, heartbeat=DEFAULT_HEARTBEAT):
+        """异步SSE生成器"""
+        seq, frames = self._subscribe(last_event_id)
+        try:
+            yield f'retry: {RETRY_MS}\n\n'.encode('utf-8')
+            for frame in frames:
+                yield frame
+            while True:
+                frames, seq = await self.wait_async(seq, heartbeat)
+                if frames:
+                    yield b''.join(frames)
+                else:
+                    yield b': ping\n\n'
+        finally:
+            self._unsubscribe()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
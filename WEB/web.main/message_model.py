@@ -0,0 +1,188 @@
+"""
+消息记录类型及其JSON编解码
+
+Message使用__slots__保存七个固定字段，不为每条消息创建字典，
+大量消息常驻内存时占用明显更少。为了兼容原来按字典访问的代码，
+Message支持message['id']、message.get('read')、dict(message)等只读的映射操作。
+
+所有模块（存储、接口、导入导出）都通过本模块的编解码函数读写JSON，
+编码器和解码器只创建一次，不会像json.dumps带参数调用那样每次重新构造。
+Message直接从各个字段编码为JSON文本，不先转换为字典。
+"""
+
+import json
+import sys
+from json.encoder import encode_basestring
+
+# 消息字段及其在JSON中的顺序，字段名被驻留，所有消息共享同一份字符串
+FIELDS = tuple(sys.intern(field) for field in ('id', 'name', 'email', 'subject', 'message', 'timestamp', 'read'))
+_FIELD_SET = frozenset(FIELDS)
+
+
+class Message:
+    """一条消息"""
+
+    __slots__ = FIELDS
+
+    def __init__(self, id=None, name=None, email=None, subject=None, message=None, timestamp='', read=False):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.subject = subject
+        self.message = message
+        self.timestamp = timestamp
+        self.read = read
+
+    @classmethod
+    def from_dict(cls, data):
+        """从字典（或另一个Message）构造，忽略未知字段"""
+        get = data.get
+        return cls(get('id'), get('name'), get('email'), get('subject'), get('message'),
+                   get('timestamp', ''), bool(get('read')))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'email': self.email,
+            'subject': self.subject,
+            'message': self.message,
+            'timestamp': self.timestamp,
+            'read': self.read
+        }
+
+    def copy(self):
+        return Message(self.id, self.name, self.email, self.subject, self.message, self.timestamp, self.read)
+
+    # ---------- 只读映射接口 ----------
+
+    def keys(self):
+        return FIELDS
+
+    def __getitem__(self, field):
+        if field not in _FIELD_SET:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def get(self, field, default=None):
+        if field not in _FIELD_SET:
+            return default
+        return getattr(self, field)
+
+    def __contains__(self, field):
+        return field in _FIELD_SET
+
+    def __eq__(self, other):
+        if not isinstance(other, Message):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'Message(id={self.id!r}, subject={self.subject!r}, read={self.read!r})'
+
+
+def _default(obj):
+    if isinstance(obj, Message):
+        return obj.to_dict()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+# 紧凑编码器，用于日志记录、NDJSON和接口响应中不含Message的部分
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+_decoder = json.JSONDecoder()
+
+# 各字段在JSON中的前缀（'{"id":'、',"name":'……），只生成一次
+(_ID, _NAME, _EMAIL, _SUBJECT, _MESSAGE, _TIMESTAMP, _READ) = (
+    ('{' if i == 0 else ',') + encode_basestring(field) + ':' for i, field in enumerate(FIELDS)
+)
+
+
+def _encode_value(value):
+    """编码一个字段值，字符串、整数、布尔值和None不经过JSONEncoder"""
+    cls = value.__class__
+    if cls is str:
+        return encode_basestring(value)
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if cls is int:
+        return int.__repr__(value)
+    return _encoder.encode(value)
+
+
+def _encode_fields(message):
+    """直接从__slots__逐个字段编码一条消息，不构造中间字典"""
+    return ''.join((
+        _ID, _encode_value(message.id), _NAME, _encode_value(message.name),
+        _EMAIL, _encode_value(message.email), _SUBJECT, _encode_value(message.subject),
+        _MESSAGE, _encode_value(message.message), _TIMESTAMP, _encode_value(message.timestamp),
+        _READ, _encode_value(message.read), '}'
+    ))
+
+
+def _encode(obj, parts):
+    """把obj的编码追加到parts：dict、list、tuple逐层展开，其中的Message直接编码，其余交给JSONEncoder"""
+    cls = obj.__class__
+    if cls is Message:
+        parts.append(_encode_fields(obj))
+    elif cls is dict:
+        separator = '{'
+        for key, value in obj.items():
+            # 非字符串的键按JSONEncoder的规则转换（如True -> "true"）
+            key = encode_basestring(key) if key.__class__ is str else _encoder.encode({key: 0})[1:-3]
+            parts.append(separator + key + ':')
+            _encode(value, parts)
+            separator = ','
+        parts.append('}' if separator == ',' else '{}')
+    elif cls is list or cls is tuple:
+        separator = '['
+        for value in obj:
+            parts.append(separator)
+            _encode(value, parts)
+            separator = ','
+        parts.append(']' if separator == ',' else '[]')
+    else:
+        parts.append(_encoder.encode(obj))
+
+
+def dumps(obj):
+    """编码为紧凑的JSON文本，obj中可以包含Message"""
+    if obj.__class__ is Message:
+        return _encode_fields(obj)
+    parts = []
+    _encode(obj, parts)
+    return ''.join(parts)
+
+
+def loads(text):
+    """解析JSON文本（str或UTF-8字节）"""
+    if isinstance(text, (bytes, bytearray)):
+        text = text.decode('utf-8')
+    return _decoder.decode(text)
+
+
+def encode_message(message):
+    """把一条消息编码为一行JSON（不含换行符）"""
+    return _encode_fields(message) if isinstance(message, Message) else _encoder.encode(message)
+
+
+def decode_message(text):
+    """把一行JSON解析为Message"""
+    data = loads(text)
+    if not isinstance(data, dict):
+        raise ValueError('不是JSON对象')
+    return Message.from_dict(data)
+
+
+def dumps_pretty(obj):
+    """
+    编码为带缩进的JSON文本，用于messages.json等需要人工查看的文件
+
+    只用于手动导出，Message经to_dict()转换后交给json模块缩进排版。
+    """
+    return json.dumps(obj, ensure_ascii=False, indent=2, default=_default)
@@ -0,0 +1,145 @@
+"""
+消息的NDJSON（每行一个JSON对象）导入导出
+
+导出和导入都是流式的：导出时逐块从存储中读取并逐块输出，
+导入时按块读取文件并分批写入MessageManager，内存占用与消息总数无关。
+
+命令行用法:
+    python message_ndjson.py export backup.ndjson
+    python message_ndjson.py import backup.ndjson [--chunk-size 1000]
+文件名为 - 时使用标准输入/输出。
+"""
+
+import argparse
+import contextlib
+import sys
+
+from message_model import encode_message, loads
+
+# 导入时每批写入的消息数
+DEFAULT_IMPORT_CHUNK_SIZE = 1000
+
+# 导出时每次输出的行数
+EXPORT_LINES_PER_CHUNK = 200
+
+
+def iter_ndjson(messages, lines_per_chunk=EXPORT_LINES_PER_CHUNK):
+    """把消息迭代器编码为NDJSON文本块，每块包含若干行"""
+    lines = []
+    for message in messages:
+        lines.append(encode_message(message))
+        if len(lines) >= lines_per_chunk:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+async def aiter_ndjson(messages, lines_per_chunk=EXPORT_LINES_PER_CHUNK):
+    """iter_ndjson的异步版本，messages为异步迭代器"""
+    lines = []
+    async for message in messages:
+        lines.append(encode_message(message))
+        if len(lines) >= lines_per_chunk:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def read_ndjson(lines, chunk_size=DEFAULT_IMPORT_CHUNK_SIZE):
+    """
+    逐行解析NDJSON，每凑满chunk_size条产出一批
+
+    Raises:
+        ValueError: 某一行不是合法的JSON对象
+    """
+    chunk = []
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            message = loads(line)
+        except ValueError as e:
+            raise ValueError(f'第{line_number}行不是合法的JSON: {e}')
+        if not isinstance(message, dict):
+            raise ValueError(f'第{line_number}行不是JSON对象')
+        chunk.append(message)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_messages(manager, output):
+    """把所有消息以NDJSON格式写入文件对象，返回导出条数"""
+    count = 0
+    for chunk in iter_ndjson(manager.iter_messages()):
+        output.write(chunk)
+        count += chunk.count('\n')
+    return count
+
+
+def import_messages(manager, lines, chunk_size=DEFAULT_IMPORT_CHUNK_SIZE):
+    """
+    分批把NDJSON中的消息导入MessageManager，与已有消息内容相同的被跳过
+
+    Returns:
+        tuple: (导入条数, 跳过条数)
+    """
+    total = skipped = 0
+    for chunk in read_ndjson(lines, chunk_size):
+        result = manager.import_messages(chunk)
+        if result is None:
+            raise RuntimeError(f'导入失败，已成功导入 {total} 条消息')
+        total += result[0]
+        skipped += result[1]
+    return total, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='消息NDJSON导入导出工具')
+    subparsers = parser.add_subparsers(dest='command')
+
+    export_parser = subparsers.add_parser('export', help='导出所有消息')
+    export_parser.add_argument('file', help='输出文件，- 表示标准输出')
+
+    import_parser = subparsers.add_parser('import', help='导入消息')
+    import_parser.add_argument('file', help='输入文件，- 表示标准输入')
+    import_parser.add_argument('--chunk-size', type=int, default=DEFAULT_IMPORT_CHUNK_SIZE,
+                               help='每批写入的消息数')
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+
+    # messages模块导入时会打印调试信息，避免混入导出到标准输出的数据
+    with contextlib.redirect_stdout(sys.stderr):
+        from messages import message_manager
+
+    try:
+        if args.command == 'export':
+            if args.file == '-':
+                count = export_messages(message_manager, sys.stdout)
+            else:
+                with open(args.file, 'w', encoding='utf-8') as f:
+                    count = export_messages(message_manager, f)
+            print(f"已导出 {count} 条消息", file=sys.stderr)
+        else:
+            if args.file == '-':
+                count, skipped = import_messages(message_manager, sys.stdin, args.chunk_size)
+            else:
+                with open(args.file, 'r', encoding='utf-8') as f:
+                    count, skipped = import_messages(message_manager, f, args.chunk_size)
+            print(f"已导入 {count} 条消息，跳过 {skipped} 条已存在的消息", file=sys.stderr)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+消息异步写入队列
+
+联系表单提交的消息先放入内存中的有界队列并立即得到预留的id，
+后台写入线程把队列中积累的消息合并为一次add_many写入存储，
+请求线程不再等待磁盘写入。队列已满时拒绝新消息，由调用方返回503。
+"""
+
+import queue
+import threading
+import time
+
+# 队列中最多等待写入的消息数
+DEFAULT_QUEUE_CAPACITY = 1000
+
+# 写入线程每批最多写入的消息数
+DEFAULT_BATCH_SIZE = 100
+
+# 写入失败后重试的等待时间（秒），逐次翻倍直到上限
+RETRY_DELAY = 0.1
+MAX_RETRY_DELAY = 5.0
+
+# 关闭时等待队列写完的最长时间（秒）
+DEFAULT_CLOSE_TIMEOUT = 10.0
+
+# 通知写入线程退出的哨兵
+_STOP = object()
+
+
+class QueueFull(Exception):
+    """写入队列已满或已关闭"""
+
+
+class IngestQueue:
+    """
+    有界的消息写入队列
+
+    写入失败的批次会一直重试，期间新消息在队列中积压直到队列满，
+    调用方因此得到QueueFull而不是丢失消息。
+    """
+
+    def __init__(self, store, capacity=DEFAULT_QUEUE_CAPACITY, batch_size=DEFAULT_BATCH_SIZE):
+        self._store = store
+        self._queue = queue.Queue(maxsize=capacity)
+        self.batch_size = batch_size
+        self._closed = False
+        # 保证关闭之后不会再有消息排到哨兵后面
+        self._lock = threading.Lock()
+        self._writer = threading.Thread(target=self._run, name='message-ingest-writer', daemon=True)
+        self._writer.start()
+
+    def put(self, message):
+        """
+        为消息预留id并放入队列，立即返回id
+
+        Raises:
+            QueueFull: 队列已满或已关闭
+        """
+        if self._closed:
+            raise QueueFull('写入队列已关闭')
+        if self._queue.full():
+            # 队列满时不预留id，避免白白消耗
+            raise QueueFull('写入队列已满')
+        # 存储从本进程预先租用的id段中分配，请求线程不会等待跨进程的锁或磁盘写入
+        message.id = self._store.reserve_ids(1)
+        with self._lock:
+            if self._closed:
+                raise QueueFull('写入队列已关闭')
+            try:
+                self._queue.put_nowait(message)
+            except queue.Full:
+                raise QueueFull('写入队列已满')
+        return message.id
+
+    def put_many(self, messages):
+        """
+        为一组消息预留连续的id并一起放入队列，返回id列表
+
+        队列剩余空间不足以放下全部消息时一条也不放入。
+
+        Raises:
+            QueueFull: 队列剩余空间不足或已关闭
+        """
+        if self._closed:
+            raise QueueFull('写入队列已关闭')
+        if self._queue.maxsize - self._queue.qsize() < len(messages):
+            raise QueueFull('写入队列已满')
+        first_id = self._store.reserve_ids(len(messages))
+        with self._lock:
+            if self._closed:
+                raise QueueFull('写入队列已关闭')
+            # 其他生产者也只在锁内放入，写入线程只会取出，检查之后剩余空间不会变少
+            if self._queue.maxsize - self._queue.qsize() < len(messages):
+                raise QueueFull('写入队列已满')
+            for offset, message in enumerate(messages):
+                message.id = first_id + offset
+                self._queue.put_nowait(message)
+        return [message.id for message in messages]
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def _next_batch(self):
+        """阻塞等待至少一条消息，再取出已经在队列中的其余消息"""
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stopping = batch[-1] is _STOP
+            messages = batch[:-1] if stopping else batch
+            if messages:
+                self._write(messages, retry=not stopping)
+            for _ in batch:
+                self._queue.task_done()
+            if stopping:
+                return
+
+    def _write(self, messages, retry=True):
+        delay = RETRY_DELAY
+        while True:
+            try:
+                self._store.add_many(messages)
+                return
+            except Exception as e:
+                print(f"写入队列中的消息时出错: {e}")
+                if not retry:
+                    print(f"关闭时仍有 {len(messages)} 条消息写入失败")
+                    return
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    def flush(self):
+        """等待当前队列中的消息全部写入"""
+        self._queue.join()
+
+    def close(self, timeout=DEFAULT_CLOSE_TIMEOUT):
+        """停止接收新消息，写完队列中剩余的消息后结束写入线程"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        # 哨兵排在已有消息之后；队列满时put会等待写入线程腾出空间
+        self._queue.put(_STOP)
+        self._writer.join(timeout)
+        if self._writer.is_alive():
+            print(f"写入队列关闭超时，仍有约 {self._queue.qsize()} 条消息未写入")
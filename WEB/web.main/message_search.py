@@ -0,0 +1,163 @@
+"""
+消息全文搜索
+
+倒排索引随消息的新增和删除增量维护。分词规则：
+- 英文、数字按单词切分并转为小写
+- 中日韩文字没有空格分隔，按单字和相邻两字（bigram）切分，
+  查询同样切分后要求所有词都出现，因此连续的中文查询等价于短语匹配
+结果按BM25打分排序，主题、姓名和邮箱中的命中权重高于正文。
+"""
+
+import heapq
+import math
+import re
+import threading
+
+# 中日韩统一表意文字、扩展A区、兼容表意文字、日文假名、韩文音节
+_CJK_RANGES = '぀-ヿ㐀-䶿一-鿿가-힯豈-﫿'
+_TOKEN_RE = re.compile(f'([{_CJK_RANGES}]+)|([^\\W{_CJK_RANGES}]+)')
+
+# 各字段的词频权重
+FIELD_WEIGHTS = (('subject', 3), ('name', 2), ('email', 2), ('message', 1))
+
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    """把文本切分为索引词列表"""
+    tokens = []
+    if not text:
+        return tokens
+    for cjk, word in _TOKEN_RE.findall(str(text).lower()):
+        if word:
+            tokens.append(word)
+        else:
+            tokens.extend(cjk)
+            tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return tokens
+
+
+def tokenize_query(text):
+    """
+    切分查询文本
+
+    中文只使用bigram（单字查询除外），避免单字匹配过宽；
+    倒排索引中同时存有单字，所以单字查询也能命中。
+    """
+    tokens = []
+    for cjk, word in _TOKEN_RE.findall(str(text).lower()):
+        if word:
+            tokens.append(word)
+        elif len(cjk) == 1:
+            tokens.append(cjk)
+        else:
+            tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    # 去重并保持顺序
+    return list(dict.fromkeys(tokens))
+
+
+class SearchIndex:
+    """消息的倒排索引"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # 词 -> {消息id: 加权词频}
+        self._postings = {}
+        # 消息id -> {词: 加权词频}，删除时据此清理倒排表
+        self._doc_terms = {}
+        # 消息id -> 加权文档长度
+        self._doc_length = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._doc_length.clear()
+            self._total_length = 0
+
+    def add(self, message):
+        """索引一条消息，已存在时先删除旧的索引"""
+        terms = {}
+        for field, weight in FIELD_WEIGHTS:
+            for token in tokenize(message.get(field)):
+                terms[token] = terms.get(token, 0) + weight
+        length = sum(terms.values())
+
+        with self._lock:
+            message_id = message['id']
+            if message_id in self._doc_terms:
+                self.remove(message_id)
+            self._doc_terms[message_id] = terms
+            self._doc_length[message_id] = length
+            self._total_length += length
+            for token, frequency in terms.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                postings[message_id] = frequency
+
+    def remove(self, message_id):
+        """从索引中删除一条消息，只需处理该消息包含的词"""
+        with self._lock:
+            terms = self._doc_terms.pop(message_id, None)
+            if terms is None:
+                return
+            self._total_length -= self._doc_length.pop(message_id)
+            for token in terms:
+                postings = self._postings[token]
+                del postings[message_id]
+                if not postings:
+                    del self._postings[token]
+
+    def search(self, query, limit=20, offset=0):
+        """
+        搜索包含所有查询词的消息
+
+        Returns:
+            tuple: ([(消息id, 得分), ...], 命中总数)
+        """
+        tokens = tokenize_query(query)
+        if not tokens:
+            return [], 0
+
+        with self._lock:
+            postings_list = []
+            for token in tokens:
+                postings = self._postings.get(token)
+                if not postings:
+                    return [], 0
+                postings_list.append((token, postings))
+
+            # 从最短的倒排表开始求交集
+            postings_list.sort(key=lambda item: len(item[1]))
+            candidates = set(postings_list[0][1])
+            for _, postings in postings_list[1:]:
+                candidates.intersection_update(postings)
+                if not candidates:
+                    return [], 0
+
+            doc_count = len(self._doc_terms)
+            average_length = self._total_length / doc_count if doc_count else 1.0
+            idf = {
+                token: math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for token, postings in postings_list
+            }
+
+            def score(message_id):
+                length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_length[message_id] / average_length)
+                total = 0.0
+                for token, postings in postings_list:
+                    frequency = postings[message_id]
+                    total += idf[token] * frequency * (BM25_K1 + 1) / (frequency + length_norm)
+                return total
+
+            scored = ((score(message_id), message_id) for message_id in candidates)
+            # 得分相同时较新的消息（id较大）排在前面
+            top = heapq.nlargest(offset + limit, scored)
+            return [(message_id, value) for value, message_id in top[offset:]], len(candidates)
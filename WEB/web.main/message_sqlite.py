@@ -0,0 +1,486 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from message_model import Message
+from message_store import (DEFAULT_CHUNK_SIZE, DEFAULT_ID_BLOCK_SIZE, DEFAULT_PAGE_SIZE, DEFAULT_REFRESH_INTERVAL,
+                           MAX_PAGE_SIZE, MessageStorage, content_key, day_cutoff)
+from sqlite_pool import ConnectionPool
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    email TEXT,
+    subject TEXT,
+    message TEXT,
+    timestamp TEXT NOT NULL,
+    read INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_messages_read ON messages (read, id);
+CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp);
+'''
+
+# 计数器表：总数、未读数和每日消息数由触发器在同一事务中维护，
+# 所有进程的写入都会反映到计数器中，查询统计时不需要扫描messages表
+COUNTER_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS message_counts (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS message_daily_counts (
+    day TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+'''
+
+COUNTER_TRIGGERS = '''
+CREATE TRIGGER messages_count_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO message_counts (key, value) VALUES ('total', 1)
+        ON CONFLICT (key) DO UPDATE SET value = value + 1;
+    INSERT INTO message_counts (key, value) VALUES ('unread', NEW.read = 0)
+        ON CONFLICT (key) DO UPDATE SET value = value + (NEW.read = 0);
+    INSERT INTO message_daily_counts (day, count) VALUES (substr(NEW.timestamp, 1, 10), 1)
+        ON CONFLICT (day) DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER messages_count_update AFTER UPDATE OF read ON messages WHEN (OLD.read = 0) != (NEW.read = 0) BEGIN
+    UPDATE message_counts SET value = value + (NEW.read = 0) - (OLD.read = 0) WHERE key = 'unread';
+END;
+CREATE TRIGGER messages_count_delete AFTER DELETE ON messages BEGIN
+    UPDATE message_counts SET value = value - 1 WHERE key = 'total';
+    UPDATE message_counts SET value = value - (OLD.read = 0) WHERE key = 'unread';
+    UPDATE message_daily_counts SET count = count - 1 WHERE day = substr(OLD.timestamp, 1, 10);
+    DELETE FROM message_daily_counts WHERE day = substr(OLD.timestamp, 1, 10) AND count <= 0;
+END;
+'''
+
+# 旧数据库第一次升级时，按已有数据初始化计数器
+COUNTER_BACKFILL = '''
+DELETE FROM message_counts;
+DELETE FROM message_daily_counts;
+INSERT INTO message_counts (key, value) SELECT 'total', COUNT(*) FROM messages;
+INSERT INTO message_counts (key, value) SELECT 'unread', COUNT(*) FROM messages WHERE read = 0;
+INSERT INTO message_daily_counts (day, count)
+    SELECT substr(timestamp, 1, 10), COUNT(*) FROM messages GROUP BY substr(timestamp, 1, 10);
+'''
+
+# 变更记录：messages表的每次新增、标记已读和删除（任何进程）都追加一行，
+# 各进程在refresh()中读取自己还没见过的记录，把其他进程的写入逐条转换为变更事件。
+# 只保留最近CHANGE_LOG_SIZE条；落后太多的进程读不到完整记录时改为发出reset
+CHANGE_LOG_SIZE = 10000
+
+CHANGES_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS message_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    id INTEGER NOT NULL
+);
+'''
+
+CHANGE_TRIGGERS = f'''
+CREATE TRIGGER IF NOT EXISTS messages_change_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO message_changes (op, id) VALUES ('add', NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_change_read AFTER UPDATE OF read ON messages
+WHEN OLD.read = 0 AND NEW.read != 0 BEGIN
+    INSERT INTO message_changes (op, id) VALUES ('read', NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_change_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO message_changes (op, id) VALUES ('delete', OLD.id);
+END;
+CREATE TRIGGER IF NOT EXISTS message_changes_trim AFTER INSERT ON message_changes BEGIN
+    DELETE FROM message_changes WHERE seq <= NEW.seq - {CHANGE_LOG_SIZE};
+END;
+'''
+
+# 之前用来发现其他进程写入的版本号触发器，已由变更记录代替
+DROP_VERSION_TRIGGERS = '''
+DROP TRIGGER IF EXISTS messages_version_insert;
+DROP TRIGGER IF EXISTS messages_version_update;
+DROP TRIGGER IF EXISTS messages_version_delete;
+DELETE FROM message_counts WHERE key = 'version';
+'''
+
+SQL_HAS_COUNTER_TRIGGERS = "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'messages_count_insert'"
+SQL_COUNTS = 'SELECT key, value FROM message_counts'
+SQL_DAILY = 'SELECT day, count FROM message_daily_counts ORDER BY day'
+SQL_DAILY_SINCE = 'SELECT day, count FROM message_daily_counts WHERE day >= ? ORDER BY day'
+
+# 所有语句都是固定的SQL文本，列顺序与Message的字段顺序一致，sqlite3模块会在每个连接上缓存编译好的语句
+SQL_SELECT = 'SELECT id, name, email, subject, message, timestamp, read FROM messages'
+SQL_ALL = SQL_SELECT + ' ORDER BY id'
+SQL_GET = SQL_SELECT + ' WHERE id = ?'
+# 按一组id读取，id列表以JSON数组传入，语句文本保持不变
+SQL_GET_MANY = SQL_SELECT + ' WHERE id IN (SELECT value FROM json_each(?))'
+SQL_CHUNK = SQL_SELECT + ' WHERE id > ? ORDER BY id LIMIT ?'
+SQL_INSERT = 'INSERT INTO messages (name, email, subject, message, timestamp, read) VALUES (?, ?, ?, ?, ?, ?)'
+SQL_INSERT_WITH_ID = 'INSERT INTO messages (id, name, email, subject, message, timestamp, read) VALUES (?, ?, ?, ?, ?, ?, ?)'
+SQL_MARK_READ = 'UPDATE messages SET read = 1 WHERE id = ?'
+SQL_DELETE = 'DELETE FROM messages WHERE id = ?'
+# 导入时按内容查找已有的同一条消息，列顺序与content_key()一致，由timestamp索引缩小范围
+SQL_SAME_CONTENT = ('SELECT 1 FROM messages WHERE timestamp = ? AND email IS ? AND subject IS ? '
+                    'AND name IS ? AND message IS ? LIMIT 1')
+SQL_COUNT_UNREAD = "SELECT value FROM message_counts WHERE key = 'unread'"
+SQL_LAST_CHANGE = 'SELECT COALESCE(MAX(seq), 0) FROM message_changes'
+SQL_CHANGES_SINCE = 'SELECT seq, op, id FROM message_changes WHERE seq > ? ORDER BY seq'
+SQL_ANY = 'SELECT 1 FROM messages LIMIT 1'
+
+# 一次性迁移的标记保存在数据库头部的user_version中，0表示还没有迁移
+SQL_GET_MIGRATED = 'PRAGMA user_version'
+SQL_SET_MIGRATED = 'PRAGMA user_version = 1'
+
+# 预留id：AUTOINCREMENT保证新行的id大于sqlite_sequence中记录的值，
+# 把该值调大就相当于预留了一段id；表中还没插入过数据时先补一行
+SQL_SEQUENCE_INIT = (
+    "INSERT INTO sqlite_sequence (name, seq) SELECT 'messages', COALESCE(MAX(id), 0) FROM messages "
+    "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'messages')"
+)
+SQL_SEQUENCE_RESERVE = "UPDATE sqlite_sequence SET seq = seq + ? WHERE name = 'messages'"
+SQL_SEQUENCE_GET = "SELECT seq FROM sqlite_sequence WHERE name = 'messages'"
+SQL_SEQUENCE_HIGH_WATER = "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'messages'), 0)"
+
+# 分页查询按(只看未读, 是否带since)预先生成四种语句
+SQL_PAGE = {}
+for _unread_only in (False, True):
+    for _with_since in (False, True):
+        _conditions = ['id < ?']
+        if _unread_only:
+            _conditions.append('read = 0')
+        if _with_since:
+            _conditions.append('timestamp >= ?')
+        SQL_PAGE[(_unread_only, _with_since)] = (
+            SQL_SELECT + ' WHERE ' + ' AND '.join(_conditions) + ' ORDER BY id DESC LIMIT ?'
+        )
+
+# 游标为空时使用的上界
+MAX_ID = 2 ** 63 - 1
+
+
+def _split_script(script, terminator=';'):
+    """把SQL脚本拆成单条语句（executescript会提交当前事务，不能在事务中使用）"""
+    statements = []
+    for part in script.split(terminator):
+        part = part.strip()
+        if part:
+            statements.append(part if terminator == ';' else f'{part}\n{terminator}')
+    return statements
+
+
+def _row_to_message(row):
+    message_id, name, email, subject, text, timestamp, read = row
+    return Message(message_id, name, email, subject, text, timestamp, bool(read))
+
+
+class SQLiteMessageStore(MessageStorage):
+    """
+    SQLite消息存储
+
+    数据库运行在WAL模式下，读写互不阻塞；每次操作从连接池借出一个连接，用完归还，
+    多个Flask工作线程或进程可以同时安全地访问同一个数据库文件。
+    变更监听器收到本进程写入的逐条事件；其他进程的写入在refresh()中从变更记录读出，
+    同样以逐条的add、read、delete事件通知。
+    """
+
+    def __init__(self, db_path, refresh_interval=DEFAULT_REFRESH_INTERVAL, id_block_size=DEFAULT_ID_BLOCK_SIZE):
+        super().__init__()
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self.id_block_size = max(1, id_block_size)
+        # reserve_ids从本进程租用的id段中分配：下一个可用的id和段的末尾（不含）
+        self._lease_lock = threading.Lock()
+        self._lease_next = 0
+        self._lease_end = 0
+        self._last_refresh = 0.0
+        self._pool = ConnectionPool(self._connect)
+        # 本进程的监听器已经反映到的变更记录序号，以及在其他进程的写入之后提交、
+        # 事件已经直接发出但序号还没被读到的本进程写入（(起, 止]区间的列表）
+        self._last_change = 0
+        self._own_changes = []
+        self._changes_lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        with self._pool.connection() as conn:
+            conn.executescript(SCHEMA + COUNTER_SCHEMA + CHANGES_SCHEMA)
+        self._transaction(self._install_counters)
+        self._last_change = self._fetchone(SQL_LAST_CHANGE)[0]
+
+    @staticmethod
+    def _install_counters(conn):
+        """创建计数器的触发器；在一个写事务中完成，多个进程同时启动也只会初始化一次"""
+        if conn.execute(SQL_HAS_COUNTER_TRIGGERS).fetchone() is None:
+            for statement in _split_script(COUNTER_BACKFILL):
+                conn.execute(statement)
+            for statement in _split_script(COUNTER_TRIGGERS, 'END;'):
+                conn.execute(statement)
+        for statement in _split_script(DROP_VERSION_TRIGGERS):
+            conn.execute(statement)
+        for statement in _split_script(CHANGE_TRIGGERS, 'END;'):
+            conn.execute(statement)
+
+    def _connect(self):
+        """创建一个新的数据库连接，由连接池调用"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, cached_statements=128,
+                               check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=30000')
+        return conn
+
+    def _fetchall(self, sql, params=()):
+        with self._pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def _fetchone(self, sql, params=()):
+        with self._pool.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def _transaction(self, func):
+        """
+        在一个写事务中执行func(conn)
+
+        本次写入产生的变更记录由调用方直接作为事件发出，这里记下它们的序号，
+        refresh()读取变更记录时跳过，不会重复通知。
+        """
+        with self._pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                before = conn.execute(SQL_LAST_CHANGE).fetchone()[0]
+                result = func(conn)
+                after = conn.execute(SQL_LAST_CHANGE).fetchone()[0]
+                # 写事务互斥，在提交前更新，本进程各线程的更新按事务顺序进行
+                with self._changes_lock:
+                    if before == self._last_change:
+                        self._last_change = after
+                    elif after > before:
+                        # 之前还有其他进程的写入没有读取，读取时跳过本次的记录
+                        self._own_changes.append((before, after))
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+            return result
+
+    def refresh(self):
+        """
+        把其他进程的写入转换为变更事件
+
+        只按主键读取序号大于已知序号的变更记录，没有其他进程写入时是一次空的范围查询。
+        新增的消息一次查询取回，和本进程的写入一样逐条通知监听器（搜索索引、SSE推送），
+        不需要重新读取全部消息。变更记录已被裁剪、中间有缺失时发出reset。
+        """
+        now = time.monotonic()
+        if now - self._last_refresh < self.refresh_interval:
+            return
+        self._last_refresh = now
+
+        with self._changes_lock:
+            changes = self._fetchall(SQL_CHANGES_SINCE, (self._last_change,))
+            if not changes:
+                return
+            # 序号随AUTOINCREMENT连续增长（回滚的事务不占用序号），不连续说明需要的记录已被裁剪
+            complete = changes[0][0] == self._last_change + 1
+            own = self._own_changes
+            self._last_change = changes[-1][0]
+            # 还没提交的本进程写入这次读不到，它们的区间留到之后的读取
+            self._own_changes = [(start, end) for start, end in own if end > self._last_change]
+            if not complete:
+                self._emit('reset', None)
+                return
+
+            changes = [(op, message_id) for seq, op, message_id in changes
+                       if not any(start < seq <= end for start, end in own)]
+            added_ids = [message_id for op, message_id in changes if op == 'add']
+            added = {}
+            if added_ids:
+                added = {row[0]: _row_to_message(row)
+                         for row in self._fetchall(SQL_GET_MANY, (json.dumps(added_ids),))}
+            for op, message_id in changes:
+                if op != 'add':
+                    self._emit(op, {'id': message_id})
+                elif message_id in added:
+                    # 随后已被删除的消息取不到，直接跳过，之后的delete事件对监听器没有影响
+                    self._emit('add', added[message_id])
+
+    # ---------- 读取 ----------
+
+    def all(self):
+        return [_row_to_message(row) for row in self._fetchall(SQL_ALL)]
+
+    def get(self, message_id):
+        row = self._fetchone(SQL_GET, (message_id,))
+        return _row_to_message(row) if row is not None else None
+
+    def iter_messages(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        # 按主键分块读取，不在多次yield之间保持打开的游标
+        last_id = 0
+        while True:
+            rows = self._fetchall(SQL_CHUNK, (last_id, chunk_size))
+            if not rows:
+                return
+            for row in rows:
+                yield _row_to_message(row)
+            last_id = rows[-1][0]
+
+    def page(self, limit=DEFAULT_PAGE_SIZE, cursor=None, unread_only=False, since=None):
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        params = [MAX_ID if cursor is None else cursor]
+        if since is not None:
+            params.append(since)
+        # 多取一条用于判断是否还有下一页
+        params.append(limit + 1)
+
+        sql = SQL_PAGE[(bool(unread_only), since is not None)]
+        rows = self._fetchall(sql, params)
+        messages = [_row_to_message(row) for row in rows[:limit]]
+        next_cursor = messages[-1].id if len(rows) > limit else None
+        return messages, next_cursor
+
+    def count_unread(self):
+        return self._fetchone(SQL_COUNT_UNREAD)[0]
+
+    def stats(self, days=None):
+        with self._pool.connection() as conn:
+            # 两次查询放在同一个读事务中，读到的是同一时刻的计数
+            conn.execute('BEGIN')
+            try:
+                counts = dict(conn.execute(SQL_COUNTS).fetchall())
+                cutoff = day_cutoff(days)
+                if cutoff is None:
+                    daily = conn.execute(SQL_DAILY).fetchall()
+                else:
+                    daily = conn.execute(SQL_DAILY_SINCE, (cutoff,)).fetchall()
+            finally:
+                conn.execute('COMMIT')
+        return {'total': counts.get('total', 0), 'unread': counts.get('unread', 0), 'daily': dict(daily)}
+
+    def needs_migration(self):
+        def check(conn):
+            if conn.execute(SQL_GET_MIGRATED).fetchone()[0]:
+                return False
+            if conn.execute(SQL_ANY).fetchone() is None:
+                return True
+            conn.execute(SQL_SET_MIGRATED)
+            return False
+        return self._transaction(check)
+
+    def mark_migrated(self):
+        with self._pool.connection() as conn:
+            conn.execute(SQL_SET_MIGRATED)
+
+    # ---------- 写入 ----------
+    # 所有写入都在_transaction中进行，以便记录本进程写入产生的变更记录序号
+
+    def add(self, message):
+        cur = self._transaction(lambda conn: conn.execute(SQL_INSERT, (
+            message.get('name'), message.get('email'), message.get('subject'),
+            message.get('message'), message['timestamp'], int(bool(message.get('read')))
+        )))
+        saved = Message.from_dict(message)
+        saved.id = cur.lastrowid
+        self._emit('add', saved)
+        return saved
+
+    def mark_read(self, message_id):
+        ok = self._transaction(lambda conn: conn.execute(SQL_MARK_READ, (message_id,)).rowcount) > 0
+        if ok:
+            self._emit('read', {'id': message_id})
+        return ok
+
+    def delete(self, message_id):
+        ok = self._transaction(lambda conn: conn.execute(SQL_DELETE, (message_id,)).rowcount) > 0
+        if ok:
+            self._emit('delete', {'id': message_id})
+        return ok
+
+    def reserve_ids(self, count=1):
+        """
+        从本进程租用的id段中分配，段中剩下的id不够时才在一个写事务中租用新的一段
+
+        各进程的段互不重叠；进程退出时没有用完的id被跳过。
+        """
+        def reserve(conn, size):
+            conn.execute(SQL_SEQUENCE_INIT)
+            conn.execute(SQL_SEQUENCE_RESERVE, (size,))
+            return conn.execute(SQL_SEQUENCE_GET).fetchone()[0] - size + 1
+
+        with self._lease_lock:
+            if self._lease_end - self._lease_next < count:
+                size = max(count, self.id_block_size)
+                self._lease_next = self._transaction(lambda conn: reserve(conn, size))
+                self._lease_end = self._lease_next + size
+            first_id = self._lease_next
+            self._lease_next += count
+            return first_id
+
+    def add_many(self, messages):
+        def insert_all(conn):
+            saved = []
+            for message in messages:
+                # id为None时由数据库分配，预留的id原样写入
+                cur = conn.execute(SQL_INSERT_WITH_ID, (
+                    message.get('id'), message.get('name'), message.get('email'), message.get('subject'),
+                    message.get('message'), message['timestamp'], int(bool(message.get('read')))
+                ))
+                message = Message.from_dict(message)
+                message.id = cur.lastrowid
+                saved.append(message)
+            return saved
+        saved = self._transaction(insert_all)
+        for message in saved:
+            self._emit('add', message)
+        return saved
+
+    def mark_many_read(self, message_ids):
+        def update_all(conn):
+            return [conn.execute(SQL_MARK_READ, (message_id,)).rowcount > 0 for message_id in message_ids]
+        results = self._transaction(update_all)
+        self._emit_each('read', message_ids, results)
+        return results
+
+    def delete_many(self, message_ids):
+        def delete_all(conn):
+            return [conn.execute(SQL_DELETE, (message_id,)).rowcount > 0 for message_id in message_ids]
+        results = self._transaction(delete_all)
+        self._emit_each('delete', message_ids, results)
+        return results
+
+    def _emit_each(self, event, message_ids, results):
+        """为批量操作中成功的每条消息发出事件（同一id只发一次）"""
+        for message_id in dict.fromkeys(i for i, ok in zip(message_ids, results) if ok):
+            self._emit(event, {'id': message_id})
+
+    def import_messages(self, messages):
+        def insert_all(conn):
+            # 不超过high_water的id可能已经被某个进程租用，只保留比它大的原有id
+            high_water = conn.execute(SQL_SEQUENCE_HIGH_WATER).fetchone()[0]
+            seen = set()
+            imported = skipped = 0
+            for message in messages:
+                message = Message.from_dict(message)
+                # 内容相同的消息已经导入过（包括本批中先插入的），不再导入
+                if conn.execute(SQL_SAME_CONTENT, content_key(message)).fetchone() is not None:
+                    skipped += 1
+                    continue
+                # 同一批中重复或缺失的id交给数据库重新分配
+                message_id = message.id
+                if not isinstance(message_id, int) or message_id <= high_water or message_id in seen:
+                    message_id = None
+                seen.add(message_id)
+                conn.execute(SQL_INSERT_WITH_ID, (
+                    message_id, message.name, message.email, message.subject,
+                    message.message, message.timestamp, int(message.read)
+                ))
+                imported += 1
+            return imported, skipped
+        imported, skipped = self._transaction(insert_all)
+        if imported:
+            self._emit('reset', None)
+        return imported, skipped
+
+    def close(self):
+        self._pool.close()
@@ -0,0 +1,843 @@
+import bisect
+import datetime
+import os
+import tempfile
+import threading
+import time
+
+from file_lock import FileLock, atomic_write
+from message_model import Message, dumps, dumps_pretty, loads
+
+# 日志记录类型
+OP_ADD = 'add'
+OP_READ = 'read'
+OP_DELETE = 'delete'
+
+# 无效记录超过该数量时触发后台压缩
+DEFAULT_COMPACT_THRESHOLD = 1000
+
+# 组提交等待窗口（毫秒），窗口内到达的写入合并为一次fsync
+DEFAULT_GROUP_COMMIT_MS = 2
+
+# 读取前检查日志是否被其他进程修改的最小间隔（秒）
+DEFAULT_REFRESH_INTERVAL = 0.05
+
+# 每个进程每次租用的连续id个数，租用时才需要加文件锁并写序号文件
+DEFAULT_ID_BLOCK_SIZE = 1000
+
+# 流式遍历时每次从存储中取出的消息数
+DEFAULT_CHUNK_SIZE = 500
+
+# 分页查询的默认和最大每页条数
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def _encode_record(record):
+    """将一条日志记录编码为一行UTF-8字节"""
+    return (dumps(record) + '\n').encode('utf-8')
+
+
+def _remove_sorted(sorted_list, value):
+    """从有序列表中删除一个值（二分查找定位）"""
+    i = bisect.bisect_left(sorted_list, value)
+    if i < len(sorted_list) and sorted_list[i] == value:
+        del sorted_list[i]
+
+
+def _insert_sorted(sorted_list, value):
+    """向有序列表中插入一个值，新id通常最大，直接追加"""
+    if not sorted_list or value > sorted_list[-1]:
+        sorted_list.append(value)
+    else:
+        bisect.insort(sorted_list, value)
+
+
+def _file_identity(stat_result):
+    """用设备号和inode标识一个文件，日志被压缩替换后标识会改变"""
+    return stat_result.st_dev, stat_result.st_ino
+
+
+def message_day(timestamp):
+    """消息所属的日期：ISO时间戳的前10个字符（YYYY-MM-DD）"""
+    return (timestamp or '')[:10]
+
+
+def content_key(message):
+    """
+    导入时判断是否为同一条消息的依据：时间戳、邮箱、主题、姓名和正文
+
+    不包含id：来自其他安装或重新编号之前的备份中，不相关的消息可能使用相同的id；
+    同一条消息第一次导入时也可能因为id冲突被分配了新id。
+    """
+    return message.timestamp, message.email, message.subject, message.name, message.message
+
+
+def day_cutoff(days):
+    """最近days天（含今天）中最早的一天，days为None时返回None（不限制）"""
+    if days is None:
+        return None
+    return (datetime.date.today() - datetime.timedelta(days=max(1, days) - 1)).isoformat()
+
+
+class MessageCounters:
+    """
+    消息总数、未读数和每日消息数
+
+    随每次新增、标记已读、删除增量更新，查询时不需要遍历消息。
+    调用方负责加锁。
+    """
+
+    __slots__ = ('total', 'unread', 'daily')
+
+    def __init__(self):
+        self.total = 0
+        self.unread = 0
+        self.daily = {}  # 日期 -> 当天的消息数
+
+    def added(self, message):
+        self.total += 1
+        if not message['read']:
+            self.unread += 1
+        day = message_day(message['timestamp'])
+        self.daily[day] = self.daily.get(day, 0) + 1
+
+    def marked_read(self):
+        self.unread -= 1
+
+    def deleted(self, message):
+        self.total -= 1
+        if not message['read']:
+            self.unread -= 1
+        day = message_day(message['timestamp'])
+        count = self.daily.get(day, 0) - 1
+        if count > 0:
+            self.daily[day] = count
+        else:
+            self.daily.pop(day, None)
+
+    def snapshot(self, days=None):
+        """返回统计结果的副本，daily只包含最近days天"""
+        cutoff = day_cutoff(days)
+        daily = self.daily.items() if cutoff is None else \
+            ((day, count) for day, count in self.daily.items() if day >= cutoff)
+        return {'total': self.total, 'unread': self.unread, 'daily': dict(sorted(daily))}
+
+
+def write_messages_json(path, messages):
+    """以messages.json的格式原子地写出消息列表（先写临时文件再重命名）"""
+    data = dumps_pretty({'messages': messages})
+    atomic_write(path, data.encode('utf-8'))
+
+
+class MessageStorage:
+    """
+    消息存储接口
+
+    MessageManager只通过这些方法访问存储，具体实现可以是追加日志、SQLite等。
+    读取接口返回Message记录（见message_model），字段与messages.json中的一致；
+    写入接口同时接受Message和字段相同的字典。
+    """
+
+    def __init__(self):
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """
+        注册变更监听器 callback(event, message)
+
+        event为add、read、delete或reset。read和delete事件只保证message中有id；
+        reset表示存储内容被整体替换（如重新加载或批量导入），监听器应丢弃
+        已有的派生状态，需要时再重新读取。
+        监听器在存储的锁内被调用，不能修改message，也不应执行耗时操作。
+        """
+        self._listeners.append(callback)
+
+    def _emit(self, event, message):
+        for callback in self._listeners:
+            try:
+                callback(event, message)
+            except Exception as e:
+                print(f"执行消息变更监听器时出错: {e}")
+
+    def refresh(self):
+        """同步其他进程的写入，使监听器收到对应事件；默认无需处理"""
+
+    def all(self):
+        """返回所有消息"""
+        raise NotImplementedError
+
+    def get(self, message_id):
+        """按id获取一条消息，不存在时返回None"""
+        raise NotImplementedError
+
+    def iter_messages(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """按id顺序逐条产出所有消息，具体存储应覆盖为分块读取以保持内存占用恒定"""
+        return iter(self.all())
+
+    def page(self, limit=DEFAULT_PAGE_SIZE, cursor=None, unread_only=False, since=None):
+        """按id倒序分页查询，返回(消息列表, 下一页游标或None)"""
+        raise NotImplementedError
+
+    def count_unread(self):
+        """未读消息数量"""
+        raise NotImplementedError
+
+    def stats(self, days=None):
+        """
+        消息统计: {'total': 总数, 'unread': 未读数, 'daily': {日期: 当天消息数}}
+
+        daily按日期升序，days不为None时只包含最近days天。
+        默认实现遍历全部消息，具体存储应覆盖为增量维护的计数器。
+        """
+        counters = MessageCounters()
+        for message in self.iter_messages():
+            counters.added(message)
+        return counters.snapshot(days)
+
+    def add(self, message):
+        """新增一条消息并分配id，返回保存后的消息"""
+        raise NotImplementedError
+
+    def mark_read(self, message_id):
+        """标记为已读，消息不存在时返回False"""
+        raise NotImplementedError
+
+    def delete(self, message_id):
+        """删除消息，消息不存在时返回False"""
+        raise NotImplementedError
+
+    def reserve_ids(self, count=1):
+        """
+        预先分配count个连续的新id并返回第一个，这些id不会再被自动分配
+
+        带有预留id的消息可以稍后通过add_many写入（用于异步写入队列）。
+        """
+        raise NotImplementedError
+
+    # 批量操作的默认实现逐条执行，具体存储应尽量覆盖为一次提交
+
+    def add_many(self, messages):
+        """批量新增消息（已有预留id的保留该id），返回保存后的消息列表"""
+        return [self.add(message) for message in messages]
+
+    def mark_many_read(self, message_ids):
+        """批量标记为已读，返回与message_ids一一对应的结果列表"""
+        return [self.mark_read(message_id) for message_id in message_ids]
+
+    def delete_many(self, message_ids):
+        """批量删除，返回与message_ids一一对应的结果列表"""
+        return [self.delete(message_id) for message_id in message_ids]
+
+    def needs_migration(self):
+        """
+        是否还需要执行一次性迁移（导入旧版数据）
+
+        迁移完成后调用mark_migrated()留下标记，之后即使消息被全部删除或归档也不会再次迁移。
+        没有标记但已经有数据的存储（加入标记之前迁移过的）视为已迁移。
+        """
+        raise NotImplementedError
+
+    def mark_migrated(self):
+        """记录一次性迁移已经完成"""
+        raise NotImplementedError
+
+    def import_messages(self, messages):
+        """
+        批量导入已有消息，尽量保留原有id，返回(导入条数, 跳过条数)
+
+        内容（见content_key）与已有消息相同的被跳过，重复导入同一份备份不会产生重复的消息；
+        id与不相关的已有消息冲突的分配新id，不会因此丢失。
+        """
+        raise NotImplementedError
+
+    def import_json(self, path):
+        """从旧版messages.json导入消息，返回值同import_messages"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = loads(f.read())
+        return self.import_messages(data.get('messages', []))
+
+    def export_json(self, path):
+        """把当前所有消息导出为messages.json格式"""
+        write_messages_json(path, self.all())
+
+    def on_compacted(self, callback):
+        """注册存储整理完成后的回调，不需要整理的存储可以忽略"""
+        pass
+
+    def close(self):
+        pass
+
+
+class IdAllocator:
+    """
+    持久化的消息id分配器
+
+    序号文件保存所有进程已经租用过的最大id + 1。每个进程在文件锁内一次租用一段
+    （默认block_size个）连续id并写入序号文件，之后在内存中逐个发放，不再加文件锁或写文件；
+    进程退出时没有用完的id被跳过。分配出去的id只增不减，删除消息后也不会被复用。
+
+    各进程的id段互不重叠，但交替使用，所以不同进程写入的消息的id不一定按时间先后排列。
+    """
+
+    def __init__(self, seq_path, file_lock=None, block_size=DEFAULT_ID_BLOCK_SIZE):
+        self.seq_path = seq_path
+        self.block_size = max(1, block_size)
+        self._file_lock = file_lock or FileLock(seq_path + '.lock')
+        # 回放日志时见到的最大id + 1，防止序号文件丢失后重复分配
+        self._next_id = 1
+        # 本进程租用的id段中下一个可用的id和段的末尾（不含）
+        self._lock = threading.Lock()
+        self._lease_next = 0
+        self._lease_end = 0
+
+    def _read(self):
+        try:
+            with open(self.seq_path, 'r', encoding='utf-8') as f:
+                return max(1, int(f.read().strip() or 1))
+        except FileNotFoundError:
+            return 1
+        except (OSError, ValueError) as e:
+            print(f"读取消息序号文件时出错: {e}")
+            return 1
+
+    def observe(self, message_id):
+        """确保之后租用的id大于已经存在的id（用于回放）"""
+        if message_id >= self._next_id:
+            self._next_id = message_id + 1
+
+    def high_water(self):
+        """所有进程租用过或已经存在的最大id + 1，不超过它的id都可能已被使用（调用方持有文件锁）"""
+        return max(self._read(), self._next_id)
+
+    def claim(self, max_id):
+        """导入了大于high_water()的id后，把序号文件推进到max_id之后（调用方持有文件锁）"""
+        if max_id >= self.high_water():
+            self._next_id = max_id + 1
+            atomic_write(self.seq_path, str(self._next_id).encode('utf-8'))
+
+    def allocate(self, count=1):
+        """分配count个连续的新id，返回第一个id；当前的id段不够时先租用新的一段"""
+        with self._lock:
+            if self._lease_end - self._lease_next >= count:
+                first_id = self._lease_next
+                self._lease_next += count
+                return first_id
+
+        # 先文件锁后self._lock，与持有文件锁回放日志时调用observe的顺序一致
+        with self._file_lock, self._lock:
+            if self._lease_end - self._lease_next < count:
+                # 当前段剩下的id不够连续分配，直接放弃
+                size = max(count, self.block_size)
+                self._lease_next = self.high_water()
+                self._lease_end = self._next_id = self._lease_next + size
+                atomic_write(self.seq_path, str(self._lease_end).encode('utf-8'))
+            first_id = self._lease_next
+            self._lease_next += count
+            return first_id
+
+
+class _CommitBatch:
+    """一次组提交中合并的记录及每条记录的执行结果"""
+
+    def __init__(self):
+        self.records = []
+        self.results = []
+        self.error = None
+        self.done = threading.Event()
+
+
+class LogMessageStore(MessageStorage):
+    """
+    追加日志结构的消息存储
+
+    每次新增、标记已读、删除只向日志文件末尾追加一行JSON记录，
+    内存中保存完整的消息索引；当日志中的无效记录过多时，
+    在后台线程中把当前状态重写为一份紧凑的新日志。
+
+    多个进程可以共享同一份日志：写入在文件锁内进行，写入前先读入其他进程
+    追加的记录；短时间内到达的写入通过组提交合并为一次写入和一次fsync。
+    """
+
+    def __init__(self, log_path, seq_path=None, compact_threshold=DEFAULT_COMPACT_THRESHOLD,
+                 group_commit_ms=DEFAULT_GROUP_COMMIT_MS, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        super().__init__()
+        self.log_path = log_path
+        self.compact_threshold = compact_threshold
+        self.group_commit_window = max(0, group_commit_ms) / 1000.0
+        self.refresh_interval = refresh_interval
+        self._last_refresh = 0.0
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(log_path + '.lock')
+        self._ids = IdAllocator(seq_path or os.path.splitext(log_path)[0] + '.seq', self._file_lock)
+        # 一次性迁移完成的标记文件
+        self._migrated_path = os.path.splitext(log_path)[0] + '.migrated'
+        self._batch_lock = threading.Lock()
+        self._batch = None
+        self._compacting = False
+        self._compact_callbacks = []
+        # 重新加载回放日志期间不通知监听器，回放完成后只发出一个reset事件
+        self._replaying = False
+
+        self._log = None
+        with self._lock, self._file_lock:
+            self._reload()
+
+    # ---------- 日志回放 ----------
+
+    def _reload(self):
+        """重新打开日志文件并回放全部记录（调用方持有锁）"""
+        # id -> 消息的哈希索引，字典保持插入顺序
+        self._index = {}
+        # 有序id索引，用于按id倒序分页；未读消息单独维护一份
+        self._sorted_ids = []
+        self._unread_ids = []
+        # 计数器随日志回放重建，日志本身就是它的持久化形式
+        self._counters = MessageCounters()
+        self._record_count = 0
+        self._offset = 0
+
+        reopened = self._log is not None
+        if reopened:
+            self._log.close()
+        self._log = open(self.log_path, 'ab')
+        self._log_identity = _file_identity(os.fstat(self._log.fileno()))
+        self._replaying = True
+        try:
+            self._read_new_records()
+        finally:
+            self._replaying = False
+        if reopened:
+            self._emit('reset', None)
+
+    def _read_new_records(self):
+        """读取并应用日志中self._offset之后的记录（调用方持有锁）"""
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+
+        good_length = 0
+        for line in data.splitlines(True):
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = loads(line)
+            except ValueError:
+                break
+            self._apply(record)
+            self._record_count += 1
+            good_length += len(line)
+
+        if good_length != len(data):
+            # 持有文件锁时仍有不完整的记录，说明之前的写入进程中途崩溃，截断到最后一条完整记录
+            print(f"消息日志在偏移 {self._offset + good_length} 处损坏，已忽略之后的内容")
+            self._log.flush()
+            os.truncate(self.log_path, self._offset + good_length)
+        self._offset += good_length
+
+    def _emit(self, event, message):
+        if not self._replaying:
+            super()._emit(event, message)
+
+    def _catch_up(self):
+        """同步其他进程写入的记录（调用方持有self._lock和文件锁）"""
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            st = None
+        if st is None or _file_identity(st) != self._log_identity or st.st_size < self._offset:
+            # 日志被其他进程压缩替换或被删除，重新加载
+            self._reload()
+        elif st.st_size > self._offset:
+            self._read_new_records()
+
+    def refresh(self):
+        """
+        读取前确认内存中的数据仍然是最新的
+
+        只用stat比较日志文件的inode和大小：日志只会追加或被压缩替换，
+        两者都没变就说明没有其他进程写入，直接使用内存数据，不读文件也不解析JSON。
+        """
+        now = time.monotonic()
+        if now - self._last_refresh < self.refresh_interval:
+            return
+        self._last_refresh = now
+
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            st = None
+        if st is not None and _file_identity(st) == self._log_identity and st.st_size == self._offset:
+            return
+
+        with self._lock, self._file_lock:
+            self._catch_up()
+
+    def _apply(self, record):
+        """将一条日志记录应用到内存索引"""
+        op = record.get('op')
+        if op == OP_ADD:
+            message = record['message']
+            if not isinstance(message, Message):
+                # 从日志文件读出的是字典
+                message = Message.from_dict(message)
+            if message.id in self._index:
+                return
+            self._index[message.id] = message
+            self._ids.observe(message.id)
+            _insert_sorted(self._sorted_ids, message.id)
+            if not message.read:
+                _insert_sorted(self._unread_ids, message.id)
+            self._counters.added(message)
+            self._emit('add', message)
+        elif op == OP_READ:
+            message = self._index.get(record['id'])
+            if message is not None and not message.read:
+                message.read = True
+                _remove_sorted(self._unread_ids, record['id'])
+                self._counters.marked_read()
+                self._emit('read', message)
+        elif op == OP_DELETE:
+            message = self._index.pop(record['id'], None)
+            if message is not None:
+                _remove_sorted(self._sorted_ids, record['id'])
+                if not message.read:
+                    _remove_sorted(self._unread_ids, record['id'])
+                self._counters.deleted(message)
+                self._emit('delete', message)
+
+    def _check(self, record):
+        """
+        检查一条记录在当前状态下是否有效
+
+        Returns:
+            tuple: (操作是否成功, 是否需要写入日志)
+        """
+        op = record['op']
+        if op == OP_ADD:
+            return True, record['message']['id'] not in self._index
+        message = self._index.get(record['id'])
+        if message is None:
+            return False, False
+        if op == OP_READ:
+            return True, not message.read
+        return True, True
+
+    # ---------- 组提交 ----------
+
+    def _commit(self, records):
+        """
+        提交一组记录，返回每条记录是否成功
+
+        组提交窗口内到达的记录合并为一批：第一个到达的线程等待窗口结束后负责写入，
+        其余线程等待这一批写完，整批只需要一次write和一次fsync。
+        """
+        with self._batch_lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _CommitBatch()
+            start = len(batch.records)
+            batch.records.extend(records)
+
+        if leader:
+            if self.group_commit_window:
+                time.sleep(self.group_commit_window)
+            with self._batch_lock:
+                self._batch = None
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[start:start + len(records)]
+
+    def _write_batch(self, batch):
+        """在文件锁内把一批记录追加到日志并fsync"""
+        with self._lock, self._file_lock:
+            self._catch_up()
+
+            written = []
+            for record in batch.records:
+                ok, changed = self._check(record)
+                batch.results.append(ok)
+                if changed:
+                    self._apply(record)
+                    written.append(record)
+            if not written:
+                return
+
+            data = b''.join(_encode_record(record) for record in written)
+            try:
+                self._log.write(data)
+                self._log.flush()
+                os.fsync(self._log.fileno())
+            except Exception:
+                # 内存索引已经先行更新，写入失败时按磁盘上的内容重新加载
+                self._reload()
+                raise
+            self._offset += len(data)
+            self._record_count += len(written)
+            self._maybe_compact()
+
+    # ---------- 读写接口 ----------
+
+    def all(self):
+        """返回所有消息的副本"""
+        self.refresh()
+        with self._lock:
+            return [message.copy() for message in self._index.values()]
+
+    def get(self, message_id):
+        """按id获取一条消息的副本，不存在时返回None"""
+        self.refresh()
+        with self._lock:
+            message = self._index.get(message_id)
+            return message.copy() if message is not None else None
+
+    def iter_messages(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        按id顺序逐条产出所有消息
+
+        每次只在锁内复制一小块，块与块之间释放锁，遍历期间的写入不会被阻塞，
+        内存占用与块大小有关，与消息总数无关。
+        """
+        last_id = None
+        while True:
+            self.refresh()
+            with self._lock:
+                start = 0 if last_id is None else bisect.bisect_right(self._sorted_ids, last_id)
+                chunk = [self._index[message_id].copy()
+                         for message_id in self._sorted_ids[start:start + chunk_size]]
+            if not chunk:
+                return
+            yield from chunk
+            last_id = chunk[-1].id
+
+    def page(self, limit=DEFAULT_PAGE_SIZE, cursor=None, unread_only=False, since=None):
+        """
+        按id倒序（最新的在前）分页查询
+
+        Args:
+            limit: 每页条数
+            cursor: 上一页返回的游标，即上一页最后一条消息的id
+            unread_only: 是否只返回未读消息
+            since: ISO格式时间字符串，只返回该时间之后的消息
+
+        Returns:
+            tuple: (消息列表, 下一页游标或None)
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        self.refresh()
+        with self._lock:
+            ids = self._unread_ids if unread_only else self._sorted_ids
+            end = len(ids) if cursor is None else bisect.bisect_left(ids, cursor)
+
+            result = []
+            i = end - 1
+            while i >= 0 and len(result) < limit:
+                message = self._index[ids[i]]
+                i -= 1
+                # 各进程从各自租用的id段分配id，id顺序不等于时间顺序，不能遇到早于since的消息就停止
+                if since is None or message.timestamp >= since:
+                    result.append(message.copy())
+
+            next_cursor = result[-1].id if result and i >= 0 else None
+            return result, next_cursor
+
+    def count_unread(self):
+        """未读消息数量"""
+        self.refresh()
+        with self._lock:
+            return len(self._unread_ids)
+
+    def stats(self, days=None):
+        self.refresh()
+        with self._lock:
+            return self._counters.snapshot(days)
+
+    def add(self, message):
+        """追加一条新消息，自动分配id"""
+        message = Message.from_dict(message)
+        message.id = self._ids.allocate()
+        self._commit([{'op': OP_ADD, 'message': message}])
+        return message.copy()
+
+    def mark_read(self, message_id):
+        """追加一条已读标记，消息不存在时返回False"""
+        return self._commit([{'op': OP_READ, 'id': message_id}])[0]
+
+    def delete(self, message_id):
+        """追加一条删除标记，消息不存在时返回False"""
+        return self._commit([{'op': OP_DELETE, 'id': message_id}])[0]
+
+    def reserve_ids(self, count=1):
+        return self._ids.allocate(count)
+
+    def add_many(self, messages):
+        """
+        批量新增消息，为没有id的消息一次分配一段连续id，所有记录在同一次提交中写入
+
+        已经带有id的消息必须是通过reserve_ids预留的。
+        """
+        if not messages:
+            return []
+        messages = [Message.from_dict(message) for message in messages]
+        pending = [message for message in messages if message.id is None]
+        if pending:
+            first_id = self._ids.allocate(len(pending))
+            for i, message in enumerate(pending):
+                message.id = first_id + i
+        self._commit([{'op': OP_ADD, 'message': message} for message in messages])
+        return [message.copy() for message in messages]
+
+    def mark_many_read(self, message_ids):
+        """批量追加已读标记，只需要一次提交"""
+        return self._commit([{'op': OP_READ, 'id': message_id} for message_id in message_ids])
+
+    def delete_many(self, message_ids):
+        """批量追加删除标记，只需要一次提交"""
+        return self._commit([{'op': OP_DELETE, 'id': message_id} for message_id in message_ids])
+
+    # ---------- 导入导出 ----------
+
+    def needs_migration(self):
+        with self._lock, self._file_lock:
+            if os.path.exists(self._migrated_path):
+                return False
+            self._catch_up()
+            if self._record_count == 0:
+                return True
+            self.mark_migrated()
+            return False
+
+    def mark_migrated(self):
+        with self._file_lock:
+            atomic_write(self._migrated_path, b'1')
+
+    def import_messages(self, messages):
+        """
+        导入已有消息，保留已读状态
+
+        内容（见content_key）与已有消息相同的视为已经导入过（例如重复恢复同一份备份），直接跳过；
+        其余消息尽量保留原有id，id已被占用时分配新id，返回(导入条数, 跳过条数)。
+        """
+        with self._lock, self._file_lock:
+            self._catch_up()
+            # 不超过high_water的id可能已经被某个进程租用，只保留比它大的原有id
+            high_water = self._ids.high_water()
+            existing = {content_key(message) for message in self._index.values()}
+            records = []
+            kept = set()
+            skipped = 0
+            for message in messages:
+                message = Message.from_dict(message)
+                key = content_key(message)
+                if key in existing:
+                    skipped += 1
+                    continue
+                existing.add(key)
+                # 旧版文件可能因删除后重新编号而出现重复id，重复的分配新id
+                if not isinstance(message.id, int) or message.id < high_water or message.id in kept:
+                    message.id = None
+                else:
+                    kept.add(message.id)
+                records.append(message)
+            if kept:
+                self._ids.claim(max(kept))
+            for message in records:
+                if message.id is None:
+                    message.id = self._ids.allocate()
+            records = [{'op': OP_ADD, 'message': message} for message in records]
+
+        # 提交时不能持有self._lock，否则会与正在等待该锁的组提交线程互相等待
+        if records:
+            self._commit(records)
+        return len(records), skipped
+
+    # ---------- 压缩 ----------
+
+    def on_compacted(self, callback):
+        """注册压缩完成后的回调，参数为压缩时的消息快照"""
+        self._compact_callbacks.append(callback)
+
+    def _maybe_compact(self):
+        """无效记录超过阈值时启动后台压缩线程"""
+        dead_records = self._record_count - len(self._index)
+        if self._compacting or dead_records < self.compact_threshold:
+            return
+        self._compacting = True
+        threading.Thread(target=self.compact, name='message-log-compactor', daemon=True).start()
+
+    def compact(self):
+        """
+        把当前状态重写为一份紧凑日志
+
+        快照在锁内取得，写临时文件在锁外完成，期间新增的记录
+        会在最后重命名之前从旧日志尾部拷贝过来，所以写入不会被长时间阻塞。
+        其他进程在下一次写入或读取前发现日志文件被替换后会重新加载。
+        """
+        tmp_path = None
+        try:
+            with self._lock, self._file_lock:
+                self._compacting = True
+                self._catch_up()
+                snapshot = [message.copy() for message in self._index.values()]
+                snapshot_offset = self._offset
+                snapshot_identity = self._log_identity
+
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.log_path) + '.', suffix='.compact',
+                                            dir=os.path.dirname(self.log_path) or '.')
+            with os.fdopen(fd, 'wb') as f:
+                for message in snapshot:
+                    f.write(_encode_record({'op': OP_ADD, 'message': message}))
+                snapshot_size = f.tell()
+
+                with self._lock, self._file_lock:
+                    self._catch_up()
+                    if self._log_identity != snapshot_identity:
+                        # 其他进程已经完成了压缩
+                        return
+
+                    # 拷贝快照之后追加的记录
+                    with open(self.log_path, 'rb') as old_log:
+                        old_log.seek(snapshot_offset)
+                        tail = old_log.read(self._offset - snapshot_offset)
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    f.close()
+
+                    self._log.close()
+                    os.replace(tmp_path, self.log_path)
+                    tmp_path = None
+                    self._log = open(self.log_path, 'ab')
+                    self._log_identity = _file_identity(os.fstat(self._log.fileno()))
+                    self._offset = snapshot_size + len(tail)
+                    self._record_count = len(snapshot) + tail.count(b'\n')
+
+            for callback in self._compact_callbacks:
+                try:
+                    callback(snapshot)
+                except Exception as e:
+                    print(f"执行压缩回调时出错: {e}")
+        except Exception as e:
+            print(f"压缩消息日志时出错: {e}")
+            with self._lock:
+                if self._log.closed:
+                    self._log = open(self.log_path, 'ab')
+                    self._log_identity = _file_identity(os.fstat(self._log.fileno()))
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self._compacting = False
+
+    def close(self):
+        with self._lock:
+            self._log.close()
@@ -1,77 +1,221 @@
+import atexit
 import json
 import os
 import sys
 import datetime
+import threading
+import time
+
+from message_archive import MessageArchive
+from message_events import MessageEvents
+from message_model import Message
+from message_queue import DEFAULT_BATCH_SIZE, DEFAULT_QUEUE_CAPACITY, IngestQueue, QueueFull
+from message_search import SearchIndex
+from message_store import DEFAULT_GROUP_COMMIT_MS, DEFAULT_PAGE_SIZE, LogMessageStore
+
+# 获取当前脚本所在目录的绝对路径
+script_dir = os.path.dirname(os.path.abspath(__file__))
 
 # 获取当前脚本的绝对路径，并构建messages.json的绝对路径
-def get_absolute_path():
-    # 获取当前脚本所在目录的绝对路径
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    # 构建messages.json的绝对路径
-    return os.path.join(script_dir, 'messages.json')
+def get_absolute_path(filename='messages.json'):
+    # 构建数据文件的绝对路径（相对路径以当前脚本目录为基准）
+    return os.path.join(script_dir, filename)
 
-# 定义messages.json文件的绝对路径
+# 定义messages.json文件的绝对路径（旧版存储格式，用于导入和导出）
 MESSAGES_FILE = get_absolute_path()
 
+# Web模块配置文件，其中messages部分用于选择存储后端
+WEB_CONFIG_FILE = os.path.join(script_dir, '../../ConfigDir/Web.dir')
+
 # 调试：打印文件路径以便确认
 print(f"Messages file path: {MESSAGES_FILE}")
 
+def read_messages_config():
+    """读取Web.dir中的messages配置，读取失败时使用默认的日志存储"""
+    try:
+        with open(WEB_CONFIG_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f).get('messages', {})
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"读取消息存储配置失败，使用默认配置: {e}")
+        return {}
+
+def get_log_path(config):
+    """追加日志文件的绝对路径"""
+    return get_absolute_path(config.get('log_path', 'messages.log'))
+
+# 保留策略的默认值：不启用；启用后按间隔检查，每批归档的消息数
+DEFAULT_RETENTION_INTERVAL = 3600
+RETENTION_BATCH_SIZE = 1000
+
+def create_store(config):
+    """根据配置创建消息存储后端"""
+    backend = config.get('backend', 'log')
+    if backend == 'sqlite':
+        from message_sqlite import SQLiteMessageStore
+        return SQLiteMessageStore(get_absolute_path(config.get('sqlite_path', 'data/messages.db')))
+    if backend != 'log':
+        print(f"未知的消息存储后端 '{backend}'，使用日志存储")
+    return LogMessageStore(get_log_path(config),
+                           group_commit_ms=config.get('group_commit_ms', DEFAULT_GROUP_COMMIT_MS))
+
 class MessageManager:
-    def __init__(self):
-        # 确保messages.json文件存在
-        if not os.path.exists(MESSAGES_FILE):
-            with open(MESSAGES_FILE, 'w', encoding='utf-8') as f:
-                json.dump({'messages': []}, f, ensure_ascii=False, indent=2)
+    def __init__(self, config=None):
+        if config is None:
+            config = read_messages_config()
+        self._store = create_store(config)
+
+        # 首次启动时迁移已有消息，迁移完成后留下标记，之后不再迁移
+        if self._store.needs_migration():
+            self._migrate(config)
+
+        # 全文索引在第一次搜索时构建，之后随存储的变更事件增量维护
+        self._search_index = SearchIndex()
+        self._search_state = 'empty'  # empty、building或ready
+        self._search_lock = threading.Lock()
+        self._search_build_lock = threading.Lock()
+        self._deleted_during_build = set()
+        self._store.add_listener(self._on_store_change)
+
+        # 管理页面通过SSE接收变更；有订阅者时定期同步其他进程的写入
+        self.events = MessageEvents(poll=self._store.refresh)
+        self._store.add_listener(self.events.publish)
+
+        # 保留策略：已读的旧消息定期移入按月分区的压缩归档，在线存储只保留近期消息
+        # 归档段只在查询归档时才会被打开
+        self._retention = config.get('retention', {})
+        self._archive = None
+        self._archive_lock = threading.Lock()
+        self._closed = threading.Event()
+        if self._retention.get('enabled'):
+            threading.Thread(target=self._retention_loop, name='message-retention', daemon=True).start()
+
+        # 联系表单的消息经异步队列批量写入，进程退出前写完队列中剩余的消息
+        self._ingest = IngestQueue(self._store,
+                                   capacity=config.get('queue_capacity', DEFAULT_QUEUE_CAPACITY),
+                                   batch_size=config.get('queue_batch_size', DEFAULT_BATCH_SIZE))
+        atexit.register(self.close)
+    
+    def _migrate(self, config):
+        """
+        一次性迁移：优先从追加日志导入（从日志存储切换过来的情况），否则从messages.json导入
+
+        成功后（包括没有可导入的数据时）记录迁移标记；出错时不记录，下次启动时重试。
+        """
+        try:
+            log_path = get_log_path(config)
+            if not isinstance(self._store, LogMessageStore) and os.path.exists(log_path):
+                source = LogMessageStore(log_path)
+                try:
+                    count, _ = self._store.import_messages(source.all())
+                finally:
+                    source.close()
+                source_name = os.path.basename(log_path)
+            elif os.path.exists(MESSAGES_FILE):
+                count, _ = self._store.import_json(MESSAGES_FILE)
+                source_name = 'messages.json'
+            else:
+                count = 0
+            self._store.mark_migrated()
+            if count:
+                print(f"已从{source_name}导入 {count} 条消息")
+        except Exception as e:
+            print(f"迁移已有消息时出错: {e}")
     
     def get_all_messages(self):
-        """获取所有消息"""
+        """获取所有消息（Message列表，可直接用message_model.dumps编码）"""
         try:
-            with open(MESSAGES_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return data.get('messages', [])
+            return self._store.all()
         except Exception as e:
             print(f"读取消息时出错: {e}")
             return []
     
+    @staticmethod
+    def _new_message(name, email, subject, message):
+        """构造一条尚未分配id的新消息"""
+        return Message(name=name, email=email, subject=subject, message=message,
+                       timestamp=datetime.datetime.now().isoformat(), read=False)
+    
+    def iter_messages(self):
+        """按id顺序逐条产出所有消息，用于流式导出"""
+        return self._store.iter_messages()
+    
+    def import_messages(self, messages):
+        """
+        导入已有消息（尽量保留原有id，保留已读状态），与已有消息内容相同的被跳过，id冲突的分配新id
+
+        Returns:
+            tuple: (导入条数, 跳过条数)，出错时返回None
+        """
+        try:
+            return self._store.import_messages(messages)
+        except Exception as e:
+            print(f"导入消息时出错: {e}")
+            return None
+    
     def add_message(self, name, email, subject, message):
         """添加一条新消息"""
         try:
-            messages = self.get_all_messages()
-            
-            new_message = {
-                'id': len(messages) + 1,
-                'name': name,
-                'email': email,
-                'subject': subject,
-                'message': message,
-                'timestamp': datetime.datetime.now().isoformat(),
-                'read': False
-            }
-            
-            messages.append(new_message)
-            
-            with open(MESSAGES_FILE, 'w', encoding='utf-8') as f:
-                json.dump({'messages': messages}, f, ensure_ascii=False, indent=2)
+            self._store.add(self._new_message(name, email, subject, message))
             
             return True
         except Exception as e:
             print(f"添加消息时出错: {e}")
             return False
     
+    def enqueue_message(self, name, email, subject, message):
+        """
+        把新消息放入异步写入队列，不等待写入磁盘
+        
+        Returns:
+            预留给该消息的id；队列已满或出错时返回None，调用方应稍后重试
+        """
+        try:
+            return self._ingest.put(self._new_message(name, email, subject, message))
+        except QueueFull:
+            return None
+        except Exception as e:
+            print(f"消息入队时出错: {e}")
+            return None
+    
+    def enqueue_many(self, messages):
+        """
+        把一组新消息一起放入异步写入队列，不等待写入磁盘
+        
+        Args:
+            messages: 字典列表，每个字典包含name、email、subject、message
+        
+        Returns:
+            预留给这些消息的id列表；队列放不下全部消息或出错时返回None，调用方应稍后重试
+        """
+        try:
+            new_messages = [
+                self._new_message(m.get('name'), m.get('email'), m.get('subject'), m.get('message'))
+                for m in messages
+            ]
+            return self._ingest.put_many(new_messages)
+        except QueueFull:
+            return None
+        except Exception as e:
+            print(f"批量消息入队时出错: {e}")
+            return None
+    
+    def flush(self):
+        """等待写入队列中的消息全部写入存储"""
+        self._ingest.flush()
+    
+    def close(self):
+        """写完队列中剩余的消息并关闭存储"""
+        try:
+            self._closed.set()
+            self._ingest.close()
+            self._store.close()
+        except Exception as e:
+            print(f"关闭消息存储时出错: {e}")
+    
     def mark_as_read(self, message_id):
         """将指定消息标记为已读"""
         try:
-            messages = self.get_all_messages()
-            
-            for message in messages:
-                if message['id'] == message_id:
-                    message['read'] = True
-                    break
-            
-            with open(MESSAGES_FILE, 'w', encoding='utf-8') as f:
-                json.dump({'messages': messages}, f, ensure_ascii=False, indent=2)
-            
-            return True
+            return self._store.mark_read(message_id)
         except Exception as e:
             print(f"标记消息为已读时出错: {e}")
             return False
@@ -79,31 +223,273 @@ class MessageManager:
     def delete_message(self, message_id):
         """删除指定消息"""
         try:
-            messages = self.get_all_messages()
-            
-            # 过滤掉要删除的消息
-            filtered_messages = [msg for msg in messages if msg['id'] != message_id]
-            
-            # 重新编号
-            for i, msg in enumerate(filtered_messages):
-                msg['id'] = i + 1
-            
-            with open(MESSAGES_FILE, 'w', encoding='utf-8') as f:
-                json.dump({'messages': filtered_messages}, f, ensure_ascii=False, indent=2)
-            
-            return True
+            return self._store.delete(message_id)
         except Exception as e:
             print(f"删除消息时出错: {e}")
             return False
     
+    def add_many(self, messages):
+        """
+        批量添加消息，所有消息在一次存储提交中写入
+        
+        Args:
+            messages: 字典列表，每个字典包含name、email、subject、message
+        
+        Returns:
+            新消息的id列表，出错时返回None
+        """
+        try:
+            new_messages = [
+                self._new_message(m.get('name'), m.get('email'), m.get('subject'), m.get('message'))
+                for m in messages
+            ]
+            return [saved.id for saved in self._store.add_many(new_messages)]
+        except Exception as e:
+            print(f"批量添加消息时出错: {e}")
+            return None
+    
+    def mark_many_read(self, message_ids):
+        """批量标记为已读，返回实际存在并已标记的id列表，出错时返回None"""
+        try:
+            results = self._store.mark_many_read(message_ids)
+            return [message_id for message_id, ok in zip(message_ids, results) if ok]
+        except Exception as e:
+            print(f"批量标记消息为已读时出错: {e}")
+            return None
+    
+    def delete_many(self, message_ids):
+        """批量删除消息，返回实际删除的id列表，出错时返回None"""
+        try:
+            results = self._store.delete_many(message_ids)
+            return [message_id for message_id, ok in zip(message_ids, results) if ok]
+        except Exception as e:
+            print(f"批量删除消息时出错: {e}")
+            return None
+    
+    def get_messages_page(self, limit=DEFAULT_PAGE_SIZE, cursor=None, unread_only=False, since=None):
+        """分页获取消息（最新的在前），返回(消息列表, 下一页游标)"""
+        try:
+            return self._store.page(limit, cursor, unread_only, since)
+        except Exception as e:
+            print(f"分页读取消息时出错: {e}")
+            return [], None
+    
+    def _on_store_change(self, event, message):
+        """存储变更时更新全文索引（在存储的锁内调用，不能反过来访问存储）"""
+        with self._search_lock:
+            if self._search_state == 'empty':
+                return
+            if event == 'reset':
+                self._search_index.clear()
+                self._search_state = 'empty'
+            elif event == 'add':
+                self._search_index.add(message)
+            elif event == 'delete':
+                self._search_index.remove(message['id'])
+                if self._search_state == 'building':
+                    self._deleted_during_build.add(message['id'])
+
+    def _ensure_search_index(self):
+        """
+        索引还未构建时从存储中分块读取全部消息建立索引
+
+        构建期间不持有存储的锁，并发的新增由变更事件直接写入索引；
+        已被删除的消息记录在_deleted_during_build中，避免旧快照把它们重新加回来。
+        """
+        with self._search_build_lock:
+            with self._search_lock:
+                if self._search_state == 'ready':
+                    return
+                self._search_state = 'building'
+                self._deleted_during_build = set()
+
+            for message in self._store.iter_messages():
+                with self._search_lock:
+                    if self._search_state != 'building':
+                        # 构建期间存储被整体替换，下次搜索时重新构建
+                        return
+                    if message['id'] not in self._deleted_during_build:
+                        self._search_index.add(message)
+
+            with self._search_lock:
+                if self._search_state == 'building':
+                    self._search_state = 'ready'
+                self._deleted_during_build = set()
+
+    def search_messages(self, query, limit=DEFAULT_PAGE_SIZE, offset=0):
+        """
+        全文搜索消息，结果按相关度排序
+        
+        Returns:
+            tuple: (消息列表（每条带score字段）, 命中总数)
+        """
+        try:
+            self._store.refresh()
+            self._ensure_search_index()
+            hits, total = self._search_index.search(query, limit, offset)
+            results = []
+            for message_id, score in hits:
+                message = self._store.get(message_id)
+                if message is not None:
+                    result = message.to_dict()
+                    result['score'] = round(score, 4)
+                    results.append(result)
+            return results, total
+        except Exception as e:
+            print(f"搜索消息时出错: {e}")
+            return [], 0
+    
     def get_unread_count(self):
         """获取未读消息数量"""
         try:
-            messages = self.get_all_messages()
-            return sum(1 for msg in messages if not msg['read'])
+            return self._store.count_unread()
         except Exception as e:
             print(f"获取未读消息数量时出错: {e}")
             return 0
 
+    # ---------- 保留策略和归档 ----------
+
+    def _get_archive(self):
+        """第一次使用时才创建归档对象"""
+        with self._archive_lock:
+            if self._archive is None:
+                archive_dir = get_absolute_path(self._retention.get('archive_dir', 'data/archive'))
+                self._archive = MessageArchive(archive_dir)
+            return self._archive
+
+    def _retention_loop(self):
+        interval = max(1, self._retention.get('interval_seconds', DEFAULT_RETENTION_INTERVAL))
+        # 启动后稍等片刻再执行第一次，不拖慢启动
+        delay = min(interval, 10)
+        while not self._closed.wait(delay):
+            self.apply_retention(min_interval=interval)
+            delay = interval
+
+    def _select_for_archive(self):
+        """按保留策略选出要归档的已读消息（按id顺序）"""
+        max_age_days = self._retention.get('max_age_days')
+        max_messages = self._retention.get('max_messages')
+        cutoff = None
+        if max_age_days is not None:
+            cutoff = (datetime.datetime.now() - datetime.timedelta(days=max_age_days)).isoformat()
+
+        selected = []
+        remaining_read = []
+        total = 0
+        for message in self._store.iter_messages():
+            total += 1
+            if not message.read:
+                continue
+            if cutoff is not None and message.timestamp < cutoff:
+                selected.append(message)
+            elif max_messages is not None:
+                remaining_read.append(message)
+
+        # 数量超出上限时，再归档最早的已读消息（未读消息不会被归档）
+        if max_messages is not None:
+            excess = total - len(selected) - max_messages
+            if excess > 0:
+                selected.extend(remaining_read[:excess])
+                selected.sort(key=lambda message: message.id)
+        return selected
+
+    def apply_retention(self, min_interval=0):
+        """
+        按保留策略把已读的旧消息移入归档
+
+        多个进程共用同一个归档目录时，同一时刻只有一个进程执行；
+        min_interval秒内已经有进程执行过时直接跳过。
+
+        Returns:
+            int: 归档的消息数，出错时返回None
+        """
+        try:
+            archive = self._get_archive()
+            stamp_path = os.path.join(archive.archive_dir, 'retention.stamp')
+            with archive.lock:
+                try:
+                    if time.time() - os.path.getmtime(stamp_path) < min_interval:
+                        return 0
+                except FileNotFoundError:
+                    pass
+
+                archived = 0
+                selected = self._select_for_archive()
+                for i in range(0, len(selected), RETENTION_BATCH_SIZE):
+                    batch = selected[i:i + RETENTION_BATCH_SIZE]
+                    archive.append(batch)
+                    self._store.delete_many([message.id for message in batch])
+                    archived += len(batch)
+
+                with open(stamp_path, 'w', encoding='utf-8') as f:
+                    f.write(datetime.datetime.now().isoformat())
+            if archived:
+                print(f"已归档 {archived} 条旧消息")
+            return archived
+        except Exception as e:
+            print(f"归档旧消息时出错: {e}")
+            return None
+
+    def get_archive_segments(self):
+        """列出归档段（只读manifest，不打开段文件），出错时返回None"""
+        try:
+            return self._get_archive().segments()
+        except Exception as e:
+            print(f"读取归档列表时出错: {e}")
+            return None
+
+    def get_archived_messages(self, segment, limit=DEFAULT_PAGE_SIZE, offset=0):
+        """
+        分页读取一个归档段中的消息（按id倒序），只打开这一个段
+
+        Returns:
+            tuple: (消息列表, 段中的消息总数)
+        """
+        try:
+            messages = self._get_archive().read_segment(segment)
+            total = len(messages)
+            end = max(0, total - offset)
+            return messages[max(0, end - limit):end][::-1], total
+        except Exception as e:
+            print(f"读取归档消息时出错: {e}")
+            return [], 0
+
+    def get_stats(self, days=None):
+        """
+        获取消息统计（总数、未读数、每日消息数），由存储增量维护，不遍历消息
+
+        Args:
+            days: 每日消息数只返回最近几天，None表示全部
+
+        Returns:
+            dict: {'total', 'unread', 'daily'}，出错时返回None
+        """
+        try:
+            stats = self._store.stats(days)
+            if self._retention.get('enabled'):
+                # 归档数量来自manifest，不打开归档段
+                stats['archived'] = self._get_archive().count()
+            return stats
+        except Exception as e:
+            print(f"获取消息统计时出错: {e}")
+            return None
+
+    def export_json(self, path=MESSAGES_FILE):
+        """将当前所有消息导出为messages.json格式"""
+        try:
+            self._store.export_json(path)
+            return True
+        except Exception as e:
+            print(f"导出消息时出错: {e}")
+            return False
+
 # 创建全局实例供app.py使用
-message_manager = MessageManager()
\ No newline at end of file
+message_manager = MessageManager()
+
+if __name__ == '__main__':
+    # 手动导出为messages.json格式：python messages.py [输出文件]
+    output_path = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else MESSAGES_FILE
+    if message_manager.export_json(output_path):
+        print(f"已导出到 {output_path}")
+    else:
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+服务器端渲染页面的缓存
+
+首页内容只取决于网站配置和静态资源manifest，两者不变时渲染结果也不变。
+渲染好的HTML连同ETag一起缓存，键（配置ETag, manifest版本）变化时才重新渲染，
+因此修改website_config.json（如update_website_config_section）后下一次请求即返回新页面。
+"""
+
+import hashlib
+import threading
+
+
+class RenderedPage:
+    """一次渲染的结果"""
+
+    __slots__ = ('key', 'body', 'etag')
+
+    def __init__(self, key, html):
+        self.key = key
+        self.body = html.encode('utf-8')
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+
+
+class PageCache:
+    """按页面名缓存最近一次渲染结果，线程安全"""
+
+    def __init__(self):
+        self._pages = {}
+        self._lock = threading.Lock()
+        # 同一页面同时只渲染一次，其他请求等待后直接使用结果
+        self._render_locks = {}
+
+    def get(self, name, key):
+        """返回键相同的缓存页面，没有或已过期时返回None"""
+        page = self._pages.get(name)
+        if page is not None and page.key == key:
+            return page
+        return None
+
+    def put(self, name, key, html):
+        page = RenderedPage(key, html)
+        with self._lock:
+            self._pages[name] = page
+        return page
+
+    def render_lock(self, name):
+        with self._lock:
+            lock = self._render_locks.get(name)
+            if lock is None:
+                lock = self._render_locks[name] = threading.Lock()
+            return lock
+
+    def get_or_render(self, name, key, render):
+        """
+        返回缓存页面，过期时调用render()重新渲染
+
+        Args:
+            name: 页面名
+            key: 页面依赖的数据版本，需可比较
+            render: 无参数函数，返回HTML字符串
+        """
+        page = self.get(name, key)
+        if page is not None:
+            return page
+        with self.render_lock(name):
+            page = self.get(name, key)
+            if page is None:
+                page = self.put(name, key, render())
+            return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
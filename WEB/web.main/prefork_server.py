@@ -0,0 +1,362 @@
+"""
+预先fork的多进程网站服务器（仅POSIX）
+
+主进程只负责监听端口和管理工作进程，不导入应用；每个工作进程fork出来后
+各自导入app.py并用线程化的WSGI服务器处理请求。监听方式有两种：
+- 共享套接字：主进程创建监听套接字，工作进程继承后一起accept
+- SO_REUSEPORT：每个工作进程各自绑定同一端口，由内核分配连接
+
+信号:
+    SIGTERM / SIGINT  平滑关闭：通知所有工作进程处理完当前请求后退出
+    SIGHUP            滚动重启：逐个启动新工作进程，就绪后再关闭一个旧进程，服务不中断
+
+PID文件第一行是主进程PID，之后每行一个工作进程PID。PID文件在fork时就会更新，
+不代表工作进程已经能处理请求；需要等待服务就绪的启动脚本用--ready-fd传入管道的写端，
+主进程在所有初始工作进程就绪后写入b'1'，启动失败时不写入直接关闭。
+
+用法:
+    python prefork_server.py [--host HOST] [--port PORT] [--workers N] [--reuse-port] [--pid-file PATH]
+                             [--ready-fd FD]
+未指定的参数从ConfigDir/Web.dir的server部分读取。
+
+默认只监听127.0.0.1:5000（与直接运行app.py相同）。管理接口没有身份验证，
+只有server.public为true时才使用server中的host和port（例如0.0.0.0:8000）对外提供服务，
+对外开放前请先在前面配置带身份验证的反向代理或防火墙。
+"""
+
+import argparse
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+WEB_CONFIG_FILE = os.path.join(script_dir, '../../ConfigDir/Web.dir')
+
+# 默认只监听本机回环地址
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 5000
+
+# 工作进程启动后等待其就绪的最长时间（秒）
+READY_TIMEOUT = 30.0
+
+# 平滑关闭时等待工作进程退出的默认时间（秒），超时后强制结束
+DEFAULT_GRACEFUL_TIMEOUT = 10.0
+
+# 主循环检查信号和子进程状态的间隔（秒）
+POLL_INTERVAL = 0.5
+
+# 工作进程异常退出后，同一位置两次重新启动之间的最短间隔（秒），防止反复崩溃时疯狂fork
+RESPAWN_INTERVAL = 1.0
+
+
+def read_server_config():
+    """读取Web.dir中的server配置"""
+    try:
+        with open(WEB_CONFIG_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f).get('server', {})
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"读取服务器配置失败，使用默认配置: {e}")
+        return {}
+
+
+def default_worker_count(value=None):
+    """工作进程数：配置为正整数时直接使用，否则与CPU核数相同"""
+    if isinstance(value, int) and value > 0:
+        return value
+    return os.cpu_count() or 1
+
+
+def create_listen_socket(host, port, reuse_port=False):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(socket.SOMAXCONN)
+    return sock
+
+
+def _run_worker(host, port, listen_sock, reuse_port, ready_fd):
+    """工作进程入口，返回退出码"""
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, signal.SIG_DFL)
+    # Ctrl+C发给整个进程组，由主进程统一通知工作进程退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from werkzeug.serving import make_server
+    from app import app
+    from messages import message_manager
+
+    if reuse_port:
+        listen_sock = create_listen_socket(host, port, reuse_port=True)
+    server = make_server(host, port, app, threaded=True, fd=listen_sock.fileno())
+
+    # serve_forever在主线程中运行，shutdown必须在其他线程调用
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+
+    try:
+        os.write(ready_fd, b'1')
+    except BrokenPipeError:
+        # 主进程已不再等待就绪通知，照常提供服务
+        pass
+    os.close(ready_fd)
+    try:
+        server.serve_forever()
+    finally:
+        # 写完消息队列后再退出
+        message_manager.close()
+    return 0
+
+
+class PreforkServer:
+    """管理工作进程的主进程"""
+
+    def __init__(self, host, port, workers, reuse_port=False, pid_file=None,
+                 graceful_timeout=DEFAULT_GRACEFUL_TIMEOUT, ready_fd=None):
+        self.host = host
+        self.port = port
+        self.worker_count = workers
+        self.reuse_port = reuse_port
+        self.pid_file = pid_file
+        self.graceful_timeout = graceful_timeout
+        # 所有初始工作进程就绪后通知启动脚本的管道写端
+        self.ready_fd = ready_fd
+        self._sock = None
+        # 工作进程PID -> 启动时间
+        self._workers = {}
+        self._last_spawn = 0.0
+        self._stopping = False
+        self._reloading = False
+
+    # ---------- 工作进程 ----------
+
+    def _spawn(self):
+        """fork一个工作进程，返回(pid, 就绪通知管道的读端)"""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            if self.ready_fd is not None:
+                # 工作进程不持有启动通知管道，主进程退出后启动脚本才能读到EOF
+                os.close(self.ready_fd)
+            code = 1
+            try:
+                code = _run_worker(self.host, self.port, self._sock, self.reuse_port, write_fd)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                # 不能回到主进程的调用栈中继续执行
+                os._exit(code)
+        os.close(write_fd)
+        self._workers[pid] = time.monotonic()
+        self._last_spawn = time.monotonic()
+        self._write_pid_file()
+        return pid, read_fd
+
+    @staticmethod
+    def _wait_ready(read_fd, timeout=READY_TIMEOUT):
+        try:
+            ready, _, _ = select.select([read_fd], [], [], timeout)
+            return bool(ready) and os.read(read_fd, 1) == b'1'
+        finally:
+            os.close(read_fd)
+
+    def _reap(self):
+        """回收已退出的工作进程，返回它们的PID"""
+        exited = []
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if self._workers.pop(pid, None) is not None:
+                exited.append(pid)
+                if not self._stopping:
+                    print(f"工作进程 {pid} 已退出（状态 {status}）")
+        if exited:
+            self._write_pid_file()
+        return exited
+
+    def _stop_worker(self, pid, timeout):
+        """通知一个工作进程平滑退出并等待，超时后强制结束"""
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if done:
+                break
+            time.sleep(0.05)
+        else:
+            print(f"工作进程 {pid} 未在 {timeout} 秒内退出，强制结束")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self._workers.pop(pid, None)
+        self._write_pid_file()
+
+    def _rolling_restart(self):
+        """逐个替换工作进程：新进程就绪后才关闭一个旧进程"""
+        print("开始滚动重启工作进程")
+        for old_pid in list(self._workers):
+            if self._stopping:
+                return
+            new_pid, read_fd = self._spawn()
+            if not self._wait_ready(read_fd):
+                print(f"新工作进程 {new_pid} 启动失败，停止滚动重启")
+                self._stop_worker(new_pid, self.graceful_timeout)
+                return
+            self._stop_worker(old_pid, self.graceful_timeout)
+        print("滚动重启完成")
+
+    def _notify_ready(self):
+        """通知启动脚本所有初始工作进程已经就绪"""
+        if self.ready_fd is None:
+            return
+        try:
+            os.write(self.ready_fd, b'1')
+        except BrokenPipeError:
+            # 启动脚本已不再等待
+            pass
+        self._close_ready_fd()
+
+    def _close_ready_fd(self):
+        if self.ready_fd is not None:
+            os.close(self.ready_fd)
+            self.ready_fd = None
+
+    # ---------- PID文件 ----------
+
+    def _write_pid_file(self):
+        if not self.pid_file:
+            return
+        lines = [str(os.getpid())] + [str(pid) for pid in self._workers]
+        tmp_path = self.pid_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.pid_file)
+
+    def _remove_pid_file(self):
+        if self.pid_file and os.path.exists(self.pid_file):
+            os.remove(self.pid_file)
+
+    # ---------- 主循环 ----------
+
+    def _on_stop(self, signum, frame):
+        self._stopping = True
+
+    def _on_reload(self, signum, frame):
+        self._reloading = True
+
+    def run(self):
+        if not self.reuse_port:
+            self._sock = create_listen_socket(self.host, self.port)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+
+        mode = 'SO_REUSEPORT' if self.reuse_port else '共享监听套接字'
+        print(f"主进程 {os.getpid()} 监听 {self.host}:{self.port}，{self.worker_count} 个工作进程（{mode}）")
+        self._write_pid_file()
+        try:
+            for _ in range(self.worker_count):
+                pid, read_fd = self._spawn()
+                if not self._wait_ready(read_fd):
+                    print(f"工作进程 {pid} 启动失败")
+                    return 1
+            self._notify_ready()
+
+            while not self._stopping:
+                self._reap()
+                if self._reloading:
+                    self._reloading = False
+                    self._rolling_restart()
+                elif len(self._workers) < self.worker_count and \
+                        time.monotonic() - self._last_spawn >= RESPAWN_INTERVAL:
+                    pid, read_fd = self._spawn()
+                    if not self._wait_ready(read_fd):
+                        print(f"工作进程 {pid} 启动失败")
+                time.sleep(POLL_INTERVAL)
+            return 0
+        finally:
+            self._stopping = True
+            # 启动失败时不写入就绪通知，关闭后启动脚本读到EOF
+            self._close_ready_fd()
+            self.shutdown()
+
+    def shutdown(self):
+        """通知所有工作进程退出，等待它们处理完当前请求"""
+        for pid in list(self._workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for pid in list(self._workers):
+            print(f"工作进程 {pid} 未按时退出，强制结束")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self._reap()
+        if self._sock is not None:
+            self._sock.close()
+        self._remove_pid_file()
+
+
+def main(argv=None):
+    config = read_server_config()
+    # 对外监听必须在配置中明确打开
+    if config.get('public') is True:
+        default_host, default_port = config.get('host', DEFAULT_HOST), config.get('port', DEFAULT_PORT)
+    else:
+        default_host, default_port = DEFAULT_HOST, DEFAULT_PORT
+    parser = argparse.ArgumentParser(description='预先fork的多进程网站服务器')
+    parser.add_argument('--host', default=default_host)
+    parser.add_argument('--port', type=int, default=default_port)
+    parser.add_argument('--workers', type=int, default=default_worker_count(config.get('workers')),
+                        help='工作进程数，默认与CPU核数相同')
+    parser.add_argument('--reuse-port', action='store_true', default=bool(config.get('reuse_port', False)),
+                        help='每个工作进程各自绑定端口（SO_REUSEPORT）')
+    parser.add_argument('--pid-file', default=None, help='记录主进程和工作进程PID的文件')
+    parser.add_argument('--graceful-timeout', type=float,
+                        default=config.get('graceful_timeout', DEFAULT_GRACEFUL_TIMEOUT))
+    parser.add_argument('--ready-fd', type=int, default=None,
+                        help='所有工作进程就绪后写入b\'1\'的管道写端（由启动脚本通过pass_fds传入）')
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, 'fork'):
+        print("当前平台不支持fork，请直接运行app.py")
+        return 1
+    if args.reuse_port and not hasattr(socket, 'SO_REUSEPORT'):
+        print("当前平台不支持SO_REUSEPORT，改用共享监听套接字")
+        args.reuse_port = False
+
+    server = PreforkServer(args.host, args.port, max(1, args.workers), args.reuse_port,
+                           args.pid_file, args.graceful_timeout, args.ready_fd)
+    return server.run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
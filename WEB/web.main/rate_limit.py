@@ -0,0 +1,250 @@
+"""
+令牌桶限流
+
+每个键（客户端IP、邮箱等）一个令牌桶：桶容量为burst，每秒补充rate个令牌，
+每个请求消耗一个令牌（批量请求按条数消耗），令牌不足时拒绝并给出需要等待的秒数。
+
+- MemoryBuckets: 进程内的桶，按LRU淘汰最久未使用的键，单次检查只需几微秒
+- SQLiteBuckets: 多个工作进程共享的桶，每次检查是一条UPSERT语句；
+  被拒绝的键在本进程内记住到可以重试为止，持续刷接口的客户端不会每次都访问数据库
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sqlite_pool import ConnectionPool
+
+# 内存中最多保存的键数
+DEFAULT_MAX_KEYS = 10000
+
+# 共享桶表中清理过期行的频率（每多少次检查清理一次）
+PRUNE_EVERY = 1000
+
+
+class MemoryBuckets:
+    """进程内的令牌桶集合，线程安全"""
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # 键 -> [剩余令牌, 上次更新时间]
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now, cost=1):
+        """
+        从桶中取cost个令牌，不足时一个也不取（cost不能超过burst）
+
+        Returns:
+            float: 0表示允许，否则为需要等待的秒数
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # 新键（或已被淘汰的键）从满桶开始
+                bucket = self._buckets[key] = [float(burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class MemoryDenials:
+    """键 -> 可以重试的时间，按LRU淘汰"""
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._until = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remaining(self, key, now):
+        with self._lock:
+            until = self._until.get(key)
+            if until is None:
+                return 0.0
+            if until <= now:
+                del self._until[key]
+                return 0.0
+            return until - now
+
+    def deny(self, key, until):
+        with self._lock:
+            self._until[key] = until
+            self._until.move_to_end(key)
+            if len(self._until) > self.max_keys:
+                self._until.popitem(last=False)
+
+
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+) WITHOUT ROWID;
+'''
+
+# 补充令牌并在足够时扣除cost个；令牌不足时WHERE不成立，行不变，rowcount为0
+SQL_TAKE = '''
+INSERT INTO rate_buckets (key, tokens, updated) VALUES (:key, :burst - :cost, :now)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = min(:burst, tokens + max(0, :now - updated) * :rate) - :cost,
+    updated = :now
+WHERE min(:burst, tokens + max(0, :now - updated) * :rate) >= :cost
+'''
+SQL_PEEK = 'SELECT tokens, updated FROM rate_buckets WHERE key = ?'
+# 已经补满的桶和新建的一样，可以删除
+SQL_PRUNE = 'DELETE FROM rate_buckets WHERE updated < ?'
+
+
+class SQLiteBuckets:
+    """
+    保存在SQLite中的令牌桶，多个进程共享同一组限额
+
+    桶状态丢失只会让客户端多得到一次满桶，所以关闭了fsync（synchronous=OFF），
+    每次检查只是一次内存中的页修改和WAL追加。
+    """
+
+    def __init__(self, db_path, max_keys=DEFAULT_MAX_KEYS, max_idle=3600):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self._pool = ConnectionPool(self._connect)
+        # 本进程内记住被拒绝的键及其可以重试的时间
+        self._denied = MemoryDenials(max_keys)
+        self._calls = 0
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._pool.connection() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None, cached_statements=16,
+                               check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        return conn
+
+    def take(self, key, rate, burst, now, cost=1):
+        wait = self._denied.remaining(key, now)
+        if wait > 0:
+            return wait
+
+        # 桶的时间保存在数据库中，多个进程之间要用墙上时间
+        params = {'key': key, 'rate': rate, 'burst': float(burst), 'now': now, 'cost': cost}
+        try:
+            with self._pool.connection() as conn:
+                if conn.execute(SQL_TAKE, params).rowcount > 0:
+                    self._maybe_prune(conn, now)
+                    return 0.0
+                row = conn.execute(SQL_PEEK, (key,)).fetchone()
+        except sqlite3.Error as e:
+            # 限流存储不可用时放行，不影响正常请求
+            print(f"访问共享限流存储出错: {e}")
+            return 0.0
+        tokens = min(burst, row[0] + max(0.0, now - row[1]) * rate) if row else 0.0
+        wait = max(0.0, (cost - tokens) / rate)
+        self._denied.deny(key, now + wait)
+        return wait
+
+    def _maybe_prune(self, conn, now):
+        self._calls += 1
+        if self._calls % PRUNE_EVERY == 0:
+            conn.execute(SQL_PRUNE, (now - self.max_idle,))
+
+
+class RateLimiter:
+    """
+    按规则限流
+
+    rules为 规则名 -> {'rate': 每秒补充的令牌数, 'burst': 桶容量}，
+    同一个值在不同规则下是不同的桶（键为"规则名:值"）。
+    """
+
+    def __init__(self, rules, buckets=None):
+        self.rules = {
+            name: (float(rule['rate']), float(rule['burst']))
+            for name, rule in rules.items()
+            if rule.get('rate', 0) > 0 and rule.get('burst', 0) >= 1
+        }
+        self.buckets = buckets if buckets is not None else MemoryBuckets()
+
+    def check(self, **values):
+        """
+        对每个给出的规则值各取一个令牌，如 check(submit='1.2.3.4', email='a@b.c')
+
+        值为空或没有对应规则时跳过。任何一个桶为空即拒绝（已取的令牌不退回）。
+
+        Returns:
+            float: 0表示允许，否则为建议的重试等待秒数
+        """
+        return self.check_many(**{name: [value] for name, value in values.items()})
+
+    def check_many(self, **values):
+        """
+        批量请求的限流：每个规则给出一组值，每个值取一个令牌，重复的值合并为一次取多个
+
+        如 check_many(submit=['1.2.3.4'] * 3, email=['a@b.c'])。调用方需先用burst()
+        确认条数没有超过桶容量，否则这个桶永远不会有足够的令牌。
+
+        Returns:
+            float: 0表示允许，否则为建议的重试等待秒数
+        """
+        now = time.time()
+        wait = 0.0
+        for name, keys in values.items():
+            rule = self.rules.get(name)
+            if rule is None:
+                continue
+            costs = {}
+            for value in keys:
+                if value:
+                    costs[value] = costs.get(value, 0) + 1
+            for value, cost in costs.items():
+                wait = max(wait, self.buckets.take(f'{name}:{value}', rule[0], rule[1], now, cost))
+        return wait
+
+    def burst(self, name):
+        """规则的桶容量（单次请求最多能取的令牌数），没有该规则时返回None"""
+        rule = self.rules.get(name)
+        return None if rule is None else int(rule[1])
+
+    @staticmethod
+    def retry_after(wait):
+        """Retry-After响应头的值（整秒，至少1）"""
+        return str(max(1, math.ceil(wait)))
+
+
+def create_rate_limiter(config, base_dir):
+    """
+    根据配置创建限流器，未启用时返回None
+
+    config示例:
+        {"enabled": true, "shared_path": "data/ratelimit.db", "max_keys": 10000,
+         "rules": {"submit": {"rate": 0.2, "burst": 5}, ...}}
+    shared_path为空时只在进程内限流（多进程部署时每个工作进程各自计数）。
+    """
+    if not config.get('enabled'):
+        return None
+    max_keys = config.get('max_keys', DEFAULT_MAX_KEYS)
+    shared_path = config.get('shared_path')
+    if shared_path:
+        try:
+            buckets = SQLiteBuckets(os.path.join(base_dir, shared_path), max_keys=max_keys)
+        except sqlite3.Error as e:
+            print(f"打开共享限流存储出错，改为进程内限流: {e}")
+            buckets = MemoryBuckets(max_keys)
+    else:
+        buckets = MemoryBuckets(max_keys)
+    return RateLimiter(config.get('rules', {}), buckets)
@@ -0,0 +1,69 @@
+import contextlib
+import os
+import sqlite3
+import threading
+
+# 连接池中最多保留的空闲连接数，超过的连接归还时直接关闭
+DEFAULT_MAX_IDLE = 8
+
+
+class ConnectionPool:
+    """
+    SQLite连接池
+
+    werkzeug的线程化服务器为每个请求新建一个线程，按线程保存连接的话，
+    每个请求线程结束后都会留下一个没有关闭的连接和它打开的文件描述符。
+    连接池中的连接用完后归还，最多保留max_idle个空闲连接，多出的在归还时关闭；
+    同时使用的连接数只与并发请求数有关。
+
+    connect是创建并设置好一个新连接的函数（连接需要以isolation_level=None打开）。
+    """
+
+    def __init__(self, connect, max_idle=DEFAULT_MAX_IDLE):
+        self._connect = connect
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._pid = os.getpid()
+
+    def _acquire(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # fork出的子进程不能使用父进程的连接，直接丢弃（不能在子进程中关闭）
+                self._idle = []
+                self._pid = os.getpid()
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            # 出错时留下的事务不能带给下一个使用者
+            try:
+                conn.execute('ROLLBACK')
+            except sqlite3.Error:
+                conn.close()
+                return
+        with self._lock:
+            if not self._closed and len(self._idle) < self.max_idle and self._pid == os.getpid():
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """借出一个连接，with块结束时归还"""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def close(self):
+        """关闭所有空闲连接；正在使用的连接在归还时关闭"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
@@ -0,0 +1,83 @@
+"""
+按build_static.py生成的manifest提供静态资源
+
+- url(): 模板中使用，资源已构建时返回带内容哈希的地址，否则返回原始地址
+- select(): 根据Accept-Encoding选择预压缩版本（br优先，其次gzip）
+带哈希的文件内容永远不变，可以让浏览器长期缓存而不再确认。
+"""
+
+import mimetypes
+import os
+
+from json_cache import CachedJSONFile
+
+# 带哈希的资源的缓存策略：一年，且缓存期内不需要重新验证
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# 预压缩版本的优先顺序及对应的文件后缀
+ENCODING_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticAssets:
+    def __init__(self, static_dir, url_prefix='/staic'):
+        self.dist_dir = os.path.join(static_dir, 'dist')
+        self.url_prefix = url_prefix
+        self._manifest = CachedJSONFile(os.path.join(self.dist_dir, 'manifest.json'))
+        # manifest解析结果：(快照, 源路径 -> 条目, 带哈希的文件名 -> 条目)
+        self._parsed = (None, {}, {})
+
+    def _entries(self):
+        try:
+            snapshot = self._manifest.get()
+        except (OSError, ValueError):
+            # 还没有构建过静态资源
+            return {}, {}
+        parsed = self._parsed
+        if parsed[0] is not snapshot:
+            assets = snapshot.data.get('assets', {})
+            parsed = (snapshot, assets, {entry['file']: entry for entry in assets.values()})
+            self._parsed = parsed
+        return parsed[1], parsed[2]
+
+    def version(self):
+        """当前manifest的版本（内容哈希），没有构建时返回None；资源地址随之变化"""
+        try:
+            return self._manifest.get().etag
+        except (OSError, ValueError):
+            return None
+
+    def url(self, path):
+        """资源的访问地址，path为相对staic/的路径"""
+        entry = self._entries()[0].get(path)
+        if entry is None:
+            return f'{self.url_prefix}/{path}'
+        return f'{self.url_prefix}/dist/{entry["file"]}'
+
+    def select(self, filename, accept_encodings=None):
+        """
+        选择要发送的文件
+
+        Args:
+            filename: dist/之后的文件名，只接受manifest中列出的文件
+            accept_encodings: 请求的Accept-Encoding（werkzeug的Accept对象）
+
+        Returns:
+            tuple: (dist目录下的文件名, Content-Encoding或None, Content-Type)，文件未知时返回None
+        """
+        entry = self._entries()[1].get(filename)
+        if entry is None:
+            return None
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        if accept_encodings is not None:
+            available = entry.get('encodings', ())
+            for encoding, suffix in ENCODING_SUFFIXES:
+                if encoding in available and accept_encodings.quality(encoding) > 0:
+                    return filename + suffix, encoding, mimetype
+        return filename, None, mimetype
+
+    @staticmethod
+    def headers(encoding):
+        headers = {'Cache-Control': IMMUTABLE_CACHE_CONTROL, 'Vary': 'Accept-Encoding'}
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return headers
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+# 网站模块是平铺在web.main目录中的，测试直接按模块名导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(params=['log', 'sqlite'])
+def store(request, tmp_path):
+    """两种存储后端各运行一次"""
+    if request.param == 'sqlite':
+        from message_sqlite import SQLiteMessageStore
+        store = SQLiteMessageStore(str(tmp_path / 'messages.db'))
+    else:
+        from message_store import LogMessageStore
+        store = LogMessageStore(str(tmp_path / 'messages.log'), refresh_interval=0, group_commit_ms=0)
+    yield store
+    store.close()
+
+
+@pytest.fixture(params=['log', 'sqlite'])
+def manager(request, tmp_path, monkeypatch):
+    """使用临时目录的MessageManager，不从仓库中的messages.json迁移"""
+    import messages
+    monkeypatch.setattr(messages, 'MESSAGES_FILE', str(tmp_path / 'missing.json'))
+    manager = messages.MessageManager({
+        'backend': request.param,
+        'log_path': str(tmp_path / 'messages.log'),
+        'sqlite_path': str(tmp_path / 'messages.db'),
+    })
+    yield manager
+    manager.close()
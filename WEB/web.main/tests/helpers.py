@@ -0,0 +1,22 @@
+"""测试共用的辅助函数"""
+
+
+class Args(dict):
+    """模拟Flask/Quart的request.args，支持get(key, default, type)"""
+
+    def get(self, key, default=None, type=None):
+        if key not in self:
+            return default
+        if type is None:
+            return self[key]
+        try:
+            return type(self[key])
+        except ValueError:
+            return default
+
+
+def new_message(i, **fields):
+    message = {'name': f'name{i}', 'email': f'user{i}@example.com', 'subject': f'subject{i}',
+               'message': f'text{i}', 'timestamp': f'2024-01-{i % 28 + 1:02d}T00:00:00'}
+    message.update(fields)
+    return message
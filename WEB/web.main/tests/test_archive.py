@@ -0,0 +1,125 @@
+"""按月分区的归档段和保留策略"""
+
+import datetime
+
+import pytest
+
+import messages
+from helpers import new_message
+from message_archive import UNKNOWN_SEGMENT, MessageArchive, segment_name
+
+
+def archived(i, month='2024-01', **fields):
+    fields.setdefault('timestamp', f'{month}-{i % 28 + 1:02d}T00:00:00')
+    message = new_message(i, read=True, **fields)
+    message['id'] = i
+    return message
+
+
+def test_append_groups_by_month(tmp_path):
+    archive = MessageArchive(str(tmp_path))
+    written = archive.append([archived(3), archived(1), archived(2, '2024-02'),
+                              archived(4, timestamp='不是时间')])
+    assert written == 4
+    assert archive.segments() == [
+        {'name': '2024-01', 'count': 2, 'min_id': 1, 'max_id': 3},
+        {'name': '2024-02', 'count': 1, 'min_id': 2, 'max_id': 2},
+        {'name': UNKNOWN_SEGMENT, 'count': 1, 'min_id': 4, 'max_id': 4},
+    ]
+    assert archive.count() == 4
+    assert [m.id for m in archive.read_segment('2024-01')] == [1, 3]
+    assert archive.read_segment('2023-12') == []
+    assert segment_name(archived(5, '2025-11')) == '2025-11'
+
+
+def test_appends_extend_segment_and_dedupe(tmp_path):
+    archive = MessageArchive(str(tmp_path))
+    archive.append([archived(1), archived(2)])
+    first = archive.read_segment('2024-01')
+    assert archive.read_segment('2024-01') is first
+
+    # 中途崩溃后重新归档会追加重复记录，读取时按id去重
+    archive.append([archived(2), archived(5)])
+    assert [m.id for m in archive.read_segment('2024-01')] == [1, 2, 5]
+    # 其他实例（进程）读取同一目录
+    assert [m.id for m in MessageArchive(str(tmp_path)).read_segment('2024-01')] == [1, 2, 5]
+
+
+def test_incomplete_tail_is_discarded(tmp_path):
+    archive = MessageArchive(str(tmp_path))
+    archive.append([archived(1)])
+    # 模拟追加后、更新manifest前进程退出
+    with open(tmp_path / '2024-01.ndjson.gz', 'ab') as f:
+        f.write(b'\x1f\x8b garbage')
+    assert [m.id for m in archive.read_segment('2024-01')] == [1]
+
+    archive.append([archived(2)])
+    assert [m.id for m in archive.read_segment('2024-01')] == [1, 2]
+
+
+@pytest.fixture
+def retention_manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(messages, 'MESSAGES_FILE', str(tmp_path / 'missing.json'))
+
+    def create(**retention):
+        manager = messages.MessageManager({
+            'backend': 'sqlite',
+            'sqlite_path': str(tmp_path / 'messages.db'),
+            'retention': {'archive_dir': str(tmp_path / 'archive'), **retention},
+        })
+        created.append(manager)
+        return manager
+
+    created = []
+    yield create
+    for manager in created:
+        manager.close()
+
+
+def add_messages(manager, count, read_ids):
+    ids = [m.id for m in manager._store.add_many([new_message(i) for i in range(count)])]
+    manager.mark_many_read([ids[i] for i in read_ids])
+    return ids
+
+
+def test_retention_archives_old_read_messages(retention_manager):
+    manager = retention_manager(max_age_days=30)
+    ids = add_messages(manager, 4, read_ids=[0, 1])
+    new_id = manager._store.add(new_message(9, timestamp=datetime.datetime.now().isoformat())).id
+    manager.mark_as_read(new_id)
+
+    assert manager.apply_retention() == 2
+    # 未读消息和近期的已读消息留在在线存储中
+    assert sorted(m['id'] for m in manager.get_all_messages()) == sorted(ids[2:] + [new_id])
+    assert manager.get_archive_segments() == [{'name': '2024-01', 'count': 2, 'min_id': ids[0], 'max_id': ids[1]}]
+    assert manager.apply_retention() == 0
+
+
+def test_retention_max_messages_keeps_unread(retention_manager):
+    manager = retention_manager(max_messages=3)
+    ids = add_messages(manager, 6, read_ids=[0, 2, 4, 5])
+    assert manager.apply_retention() == 3
+    # 最早的已读消息先归档，未读消息即使超出上限也保留
+    assert sorted(m['id'] for m in manager.get_all_messages()) == [ids[1], ids[3], ids[5]]
+
+
+def test_archived_messages_paged_newest_first(retention_manager):
+    manager = retention_manager(max_age_days=30, enabled=True, interval_seconds=3600)
+    ids = add_messages(manager, 5, read_ids=range(5))
+    assert manager.apply_retention() == 5
+    assert manager.get_stats()['archived'] == 5
+
+    page, total = manager.get_archived_messages('2024-01', limit=2, offset=0)
+    assert total == 5
+    assert [m['id'] for m in page] == ids[:-3:-1]
+    page, _ = manager.get_archived_messages('2024-01', limit=2, offset=4)
+    assert [m['id'] for m in page] == ids[:1]
+
+
+def test_retention_skipped_within_min_interval(retention_manager):
+    manager = retention_manager(max_age_days=30)
+    add_messages(manager, 2, read_ids=[0])
+    assert manager.apply_retention(min_interval=3600) == 1
+    add_messages(manager, 2, read_ids=[0, 1])
+    assert manager.apply_retention(min_interval=3600) == 0
+    assert manager.apply_retention() == 2
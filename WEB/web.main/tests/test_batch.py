@@ -0,0 +1,111 @@
+"""批量接口：批量提交、批量标记已读和批量删除"""
+
+import threading
+import time
+
+import pytest
+
+import handlers
+from helpers import new_message
+from message_model import Message
+from message_queue import IngestQueue, QueueFull
+
+
+def test_batch_add_goes_through_queue(manager):
+    batch = [new_message(i) for i in range(3)]
+    reply = handlers.run(handlers.batch_messages({'action': 'add', 'messages': batch}), manager)
+    assert reply.status == 202
+    ids = reply.payload['ids']
+    assert len(set(ids)) == 3
+
+    manager.flush()
+    stored = {m.id: m.message for m in manager.get_all_messages()}
+    assert [stored[i] for i in ids] == ['text0', 'text1', 'text2']
+
+
+def test_batch_add_is_capped(manager):
+    batch = [new_message(i) for i in range(handlers.MAX_BATCH_ADD_SIZE + 1)]
+    reply = handlers.run(handlers.batch_messages({'action': 'add', 'messages': batch}), manager)
+    assert reply.status == 400
+    assert manager.get_all_messages() == []
+
+
+def test_batch_add_rejects_incomplete_messages(manager):
+    batch = [new_message(0), {'name': 'x', 'email': 'x@example.com'}]
+    reply = handlers.run(handlers.batch_messages({'action': 'add', 'messages': batch}), manager)
+    assert reply.status == 400
+    assert '第2条' in reply.payload['error']
+
+
+def test_batch_add_returns_503_when_queue_is_full(manager, monkeypatch):
+    monkeypatch.setattr(manager, 'enqueue_many', lambda messages: None)
+    reply = handlers.run(handlers.batch_messages({'action': 'add', 'messages': [new_message(0)]}), manager)
+    assert reply.status == 503
+    assert reply.headers['Retry-After'] == '1'
+
+
+class BlockingStore:
+    """写入一直等待到release()的存储，用来让队列保持占满"""
+
+    def __init__(self):
+        self.next_id = 1
+        self.written = []
+        self.released = threading.Event()
+
+    def reserve_ids(self, count=1):
+        first_id, self.next_id = self.next_id, self.next_id + count
+        return first_id
+
+    def add_many(self, messages):
+        self.released.wait(10)
+        self.written.extend(messages)
+        return messages
+
+
+def test_put_many_is_all_or_nothing():
+    store = BlockingStore()
+    ingest = IngestQueue(store, capacity=3, batch_size=1)
+    ingest.put(Message(message='first'))
+    # 写入线程取出第一条后阻塞在写入中
+    deadline = time.monotonic() + 5
+    while ingest.qsize() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert ingest.put_many([Message(message='a'), Message(message='b')]) == [2, 3]
+    with pytest.raises(QueueFull):
+        ingest.put_many([Message(message='c'), Message(message='d')])
+    assert ingest.qsize() == 2
+    assert ingest.put_many([Message(message='e')]) == [4]
+
+    store.released.set()
+    ingest.close()
+    assert [m.message for m in store.written] == ['first', 'a', 'b', 'e']
+
+
+def test_batch_read_and_delete(manager):
+    ids = manager.add_many([new_message(i) for i in range(4)])
+    missing = max(ids) + 100
+
+    reply = handlers.run(handlers.batch_messages({'action': 'read', 'ids': ids[:2] + [missing]}), manager)
+    assert reply.payload == {'success': True, 'ids': ids[:2], 'not_found': [missing]}
+    assert manager.get_unread_count() == 2
+
+    reply = handlers.run(handlers.batch_messages({'action': 'delete', 'ids': [ids[0], ids[3]]}), manager)
+    assert reply.payload['ids'] == [ids[0], ids[3]]
+    assert [m.id for m in manager.get_all_messages()] == ids[1:3]
+
+    # 已经删除的消息再次删除时列在not_found中
+    reply = handlers.run(handlers.batch_messages({'action': 'delete', 'ids': [ids[0]]}), manager)
+    assert reply.payload['not_found'] == [ids[0]]
+
+
+@pytest.mark.parametrize('data', [
+    {'action': 'read', 'ids': []},
+    {'action': 'read', 'ids': ['1']},
+    {'action': 'delete', 'ids': list(range(handlers.MAX_BATCH_SIZE + 1))},
+    {'action': 'archive', 'ids': [1]},
+    None,
+])
+def test_batch_rejects_bad_requests(manager, data):
+    reply = handlers.run(handlers.batch_messages(data), manager)
+    assert reply.status == 400
@@ -0,0 +1,116 @@
+"""配置接口和首页的缓存：内容不变时ETag不变，变化后重新加载或渲染"""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from json_cache import CachedJSONFile
+from page_cache import PageCache
+
+
+def write_json(path, data):
+    path.write_text(json.dumps(data), encoding='utf-8')
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / 'website_config.json'
+    write_json(path, {'title': '首页'})
+    return path
+
+
+def test_snapshot_body_and_etag(config_file):
+    snapshot = CachedJSONFile(str(config_file)).get()
+    assert snapshot.data == {'title': '首页'}
+    assert json.loads(snapshot.body) == snapshot.data
+    assert len(snapshot.etag) == 32
+
+
+def test_same_snapshot_within_check_interval(config_file):
+    cache = CachedJSONFile(str(config_file), check_interval=60)
+    first = cache.get()
+    write_json(config_file, {'title': '新标题'})
+    assert cache.get() is first
+    cache.invalidate()
+    assert cache.get().data == {'title': '新标题'}
+
+
+def test_etag_depends_only_on_content(config_file):
+    cache = CachedJSONFile(str(config_file), check_interval=0)
+    first = cache.get()
+
+    # 重写相同内容：重新解析，但ETag不变，客户端仍然得到304
+    write_json(config_file, {'title': '首页'})
+    os.utime(config_file, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    rewritten = cache.get()
+    assert rewritten is not first
+    assert rewritten.etag == first.etag
+
+    write_json(config_file, {'title': '新标题'})
+    os.utime(config_file, ns=(time.time_ns(), time.time_ns() + 2 * 10 ** 9))
+    assert cache.get().etag != first.etag
+
+
+def test_unchanged_file_not_reparsed(config_file):
+    cache = CachedJSONFile(str(config_file), check_interval=0)
+    first = cache.get()
+    assert cache.get() is first
+
+
+def test_keeps_last_good_snapshot(config_file):
+    cache = CachedJSONFile(str(config_file), check_interval=0)
+    first = cache.get()
+    config_file.write_text('{"title": ', encoding='utf-8')
+    assert cache.get() is first
+
+
+def test_first_load_error_raises(tmp_path):
+    with pytest.raises(OSError):
+        CachedJSONFile(str(tmp_path / 'missing.json')).get()
+
+
+def test_page_rendered_once_per_key():
+    cache = PageCache()
+    renders = []
+
+    def render():
+        renders.append(1)
+        return f'<h1>{len(renders)}</h1>'
+
+    page = cache.get_or_render('index', ('etag-a', 1), render)
+    assert cache.get_or_render('index', ('etag-a', 1), render) is page
+    assert len(renders) == 1
+
+    updated = cache.get_or_render('index', ('etag-b', 1), render)
+    assert updated.body == '<h1>2</h1>'.encode('utf-8')
+    assert updated.etag != page.etag
+    assert cache.get('index', ('etag-a', 1)) is None
+
+
+def test_concurrent_requests_render_once():
+    cache = PageCache()
+    started = threading.Event()
+    release = threading.Event()
+    renders = []
+
+    def render():
+        renders.append(1)
+        started.set()
+        release.wait(5)
+        return '<p>ok</p>'
+
+    pages = []
+    threads = [threading.Thread(target=lambda: pages.append(cache.get_or_render('index', 1, render)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(renders) == 1
+    assert len(pages) == 4 and all(page is pages[0] for page in pages)
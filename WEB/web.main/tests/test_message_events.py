@@ -0,0 +1,128 @@
+"""SSE推送：Last-Event-ID续传，无法续传时发送reset"""
+
+import asyncio
+import json
+import threading
+import time
+
+from message_events import MessageEvents
+
+
+def parse(frame):
+    """把SSE帧解析为{字段: 值}的列表"""
+    events = []
+    for block in frame.decode('utf-8').split('\n\n'):
+        if block and not block.startswith((':', 'retry:')):
+            events.append(dict(line.split(': ', 1) for line in block.split('\n')))
+    return events
+
+
+def message(i, read=False):
+    return {'id': i, 'name': f'用户{i}', 'read': read}
+
+
+def test_publish_encodes_payloads():
+    events = MessageEvents()
+    events.publish('add', message(1))
+    events.publish('read', message(1, read=True))
+    events.publish('delete', message(1, read=True))
+    frames, seq = events.wait(0, 0)
+    assert seq == 3
+    parsed = [event for frame in frames for event in parse(frame)]
+    assert [event['event'] for event in parsed] == ['add', 'read', 'delete']
+    assert [event['id'] for event in parsed] == [f'{events.instance}-{i}' for i in (1, 2, 3)]
+    assert json.loads(parsed[0]['data']) == message(1)
+    assert json.loads(parsed[1]['data']) == {'id': 1}
+    assert json.loads(parsed[2]['data']) == {'id': 1, 'read': True}
+
+
+def test_resume_from_last_event_id():
+    events = MessageEvents()
+    for i in range(1, 4):
+        events.publish('add', message(i))
+    stream = events.stream(f'{events.instance}-1', heartbeat=0.01)
+    try:
+        assert next(stream).startswith(b'retry:')
+        parsed = parse(next(stream))
+        assert [json.loads(event['data'])['id'] for event in parsed] == [2, 3]
+        # 已经是最新事件，之后只有心跳
+        assert next(stream) == b': ping\n\n'
+    finally:
+        stream.close()
+    assert events.subscribers == 0
+
+
+def test_new_subscriber_starts_at_current_event():
+    events = MessageEvents()
+    events.publish('add', message(1))
+    stream = events.stream(heartbeat=0.01)
+    try:
+        next(stream)
+        assert next(stream) == b': ping\n\n'
+        events.publish('add', message(2))
+        assert [json.loads(event['data'])['id'] for event in parse(next(stream))] == [2]
+    finally:
+        stream.close()
+
+
+def test_reset_when_history_overrun():
+    events = MessageEvents(history=2)
+    for i in range(1, 6):
+        events.publish('add', message(i))
+    frames, seq = events.wait(1, 0)
+    assert [event['event'] for event in parse(frames[0])] == ['reset']
+    assert seq == 5
+    # 缓冲区中仍有的部分照常补发
+    frames, _ = events.wait(3, 0)
+    assert len(frames) == 2
+
+
+def test_reset_for_other_instance_or_bad_id():
+    events = MessageEvents()
+    events.publish('add', message(1))
+    for last_event_id in ('other-1', f'{events.instance}-x'):
+        stream = events.stream(last_event_id, heartbeat=0.01)
+        try:
+            next(stream)
+            parsed = parse(next(stream))
+            assert [event['event'] for event in parsed] == ['reset']
+            # reset的id是当前位置，浏览器下次重连时可以续传
+            assert parsed[0]['id'] == f'{events.instance}-1'
+        finally:
+            stream.close()
+
+
+def test_async_stream_wakes_on_publish():
+    events = MessageEvents()
+
+    async def consume():
+        stream = events.astream(heartbeat=5)
+        try:
+            await stream.__anext__()
+            threading.Timer(0.05, events.publish, ('add', message(7))).start()
+            started = time.monotonic()
+            frame = await stream.__anext__()
+            return frame, time.monotonic() - started
+        finally:
+            await stream.aclose()
+
+    frame, elapsed = asyncio.run(consume())
+    assert [json.loads(event['data'])['id'] for event in parse(frame)] == [7]
+    assert elapsed < 2
+    assert events.subscribers == 0
+
+
+def test_poll_runs_only_while_subscribed():
+    calls = []
+    events = MessageEvents(poll=lambda: calls.append(1), poll_interval=0.01)
+    stream = events.stream(heartbeat=0.01)
+    next(stream)
+    deadline = time.monotonic() + 5
+    while not calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert calls
+    stream.close()
+    time.sleep(0.1)
+    count = len(calls)
+    time.sleep(0.1)
+    assert len(calls) == count
@@ -0,0 +1,80 @@
+"""关闭时写完异步写入队列中的消息"""
+
+import threading
+import time
+
+import pytest
+
+import messages
+from message_model import Message
+from message_queue import IngestQueue, QueueFull
+from message_sqlite import SQLiteMessageStore
+from message_store import LogMessageStore
+
+
+@pytest.fixture(params=['log', 'sqlite'])
+def config(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(messages, 'MESSAGES_FILE', str(tmp_path / 'missing.json'))
+    return {
+        'backend': request.param,
+        'log_path': str(tmp_path / 'messages.log'),
+        'sqlite_path': str(tmp_path / 'messages.db'),
+        'queue_batch_size': 1,
+    }
+
+
+def test_close_writes_queued_messages(config):
+    manager = messages.MessageManager(config)
+    ids = [manager.enqueue_message(f'name{i}', 'user@example.com', '', f'text{i}') for i in range(20)]
+    assert None not in ids
+    manager.close()
+
+    if config['backend'] == 'sqlite':
+        store = SQLiteMessageStore(config['sqlite_path'])
+    else:
+        store = LogMessageStore(config['log_path'])
+    stored = {m.id: m.message for m in store.all()}
+    store.close()
+    assert all(stored.get(message_id) == f'text{i}' for i, message_id in enumerate(ids))
+
+
+class SlowStore:
+    """每次写入都要等待一段时间的存储"""
+
+    def __init__(self):
+        self.written = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def reserve_ids(self, count=1):
+        with self._lock:
+            first_id = self._next_id
+            self._next_id += count
+            return first_id
+
+    def add_many(self, messages):
+        time.sleep(0.02)
+        self.written.extend(messages)
+        return messages
+
+
+def test_close_drains_pending_messages():
+    store = SlowStore()
+    ingest = IngestQueue(store, batch_size=1)
+    ids = [ingest.put(Message(name='n', email='e', message=str(i))) for i in range(10)]
+    # 关闭时大部分消息还在队列中
+    assert ingest.qsize() > 0
+    ingest.close()
+
+    assert [m.id for m in store.written] == ids
+    with pytest.raises(QueueFull):
+        ingest.put(Message(name='n', email='e', message='late'))
+
+
+def test_put_raises_when_full():
+    store = SlowStore()
+    ingest = IngestQueue(store, capacity=2, batch_size=1)
+    with pytest.raises(QueueFull):
+        for i in range(50):
+            ingest.put(Message(name='n', email='e', message=str(i)))
+    ingest.close()
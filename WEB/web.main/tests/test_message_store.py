@@ -0,0 +1,82 @@
+"""追加日志存储在多个进程之间的回放和压缩"""
+
+import multiprocessing
+import os
+
+from message_store import LogMessageStore
+
+fork = multiprocessing.get_context('fork')
+
+
+def new_message(i):
+    return {'name': f'name{i}', 'email': f'user{i}@example.com', 'subject': '', 'message': f'text{i}'}
+
+
+def open_store(log_path):
+    # refresh_interval=0：每次读取都检查其他进程的写入
+    return LogMessageStore(log_path, refresh_interval=0, group_commit_ms=0)
+
+
+def run_in_child(target, *args):
+    process = fork.Process(target=target, args=args)
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+
+
+def _add_messages(log_path, start, count):
+    store = open_store(log_path)
+    for i in range(start, start + count):
+        store.add(new_message(i))
+    store.close()
+
+
+def _delete_and_compact(log_path, ids):
+    store = open_store(log_path)
+    store.delete_many(ids)
+    store.compact()
+    store.close()
+
+
+def test_replays_records_written_by_another_process(tmp_path):
+    log_path = str(tmp_path / 'messages.log')
+    store = open_store(log_path)
+    store.add(new_message(0))
+
+    run_in_child(_add_messages, log_path, 1, 5)
+
+    messages = store.all()
+    assert [m.message for m in messages] == [f'text{i}' for i in range(6)]
+    assert len({m.id for m in messages}) == 6
+    assert store.count_unread() == 6
+
+    # 重新打开时从日志回放出同样的状态
+    store.close()
+    assert [m.to_dict() for m in open_store(log_path).all()] == [m.to_dict() for m in messages]
+
+
+def test_reloads_log_compacted_by_another_process(tmp_path):
+    log_path = str(tmp_path / 'messages.log')
+    store = open_store(log_path)
+    ids = [store.add(new_message(i)).id for i in range(10)]
+    store.mark_read(ids[9])
+    size_before = os.path.getsize(log_path)
+
+    events = []
+    store.add_listener(lambda event, message: events.append(event))
+    run_in_child(_delete_and_compact, log_path, ids[:5])
+
+    assert os.path.getsize(log_path) < size_before
+    assert [m.id for m in store.all()] == ids[5:]
+    assert store.count_unread() == 4
+    # 整体重新加载只通知一次reset，不逐条重放add
+    assert events == ['reset']
+
+    # 压缩后两个进程继续写入同一份日志，id不重复
+    store.add(new_message(10))
+    run_in_child(_add_messages, log_path, 11, 3)
+    reopened = open_store(log_path)
+    ids_after = [m.id for m in reopened.all()]
+    assert len(ids_after) == 9
+    assert len(set(ids_after)) == 9
+    assert [m.id for m in store.all()] == ids_after
@@ -0,0 +1,56 @@
+"""MessageManager的一次性迁移"""
+
+import json
+
+import pytest
+
+import messages
+
+LEGACY_MESSAGES = [
+    {'id': 1, 'name': 'a', 'email': 'a@example.com', 'subject': '', 'message': 'first',
+     'timestamp': '2024-01-01T00:00:00', 'read': True},
+    {'id': 2, 'name': 'b', 'email': 'b@example.com', 'subject': '', 'message': 'second',
+     'timestamp': '2024-01-02T00:00:00', 'read': False},
+]
+
+
+@pytest.fixture(params=['log', 'sqlite'])
+def config(request, tmp_path, monkeypatch):
+    legacy = tmp_path / 'messages.json'
+    legacy.write_text(json.dumps({'messages': LEGACY_MESSAGES}), encoding='utf-8')
+    monkeypatch.setattr(messages, 'MESSAGES_FILE', str(legacy))
+    return {
+        'backend': request.param,
+        'log_path': str(tmp_path / 'messages.log'),
+        'sqlite_path': str(tmp_path / 'messages.db'),
+    }
+
+
+def test_migration_runs_once(config):
+    manager = messages.MessageManager(config)
+    assert [m.id for m in manager.get_all_messages()] == [1, 2]
+
+    # 删除全部消息后重新启动，不会再次从messages.json导入
+    assert manager.delete_many([1, 2]) == [1, 2]
+    manager.close()
+
+    manager = messages.MessageManager(config)
+    assert manager.get_all_messages() == []
+    manager.close()
+
+
+def test_sqlite_imports_existing_log_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(messages, 'MESSAGES_FILE', str(tmp_path / 'missing.json'))
+    log_config = {'backend': 'log', 'log_path': str(tmp_path / 'messages.log')}
+    manager = messages.MessageManager(log_config)
+    manager.add_many([{'name': 'a', 'email': 'a@example.com', 'subject': '', 'message': 'from log'}])
+    manager.close()
+
+    sqlite_config = dict(log_config, backend='sqlite', sqlite_path=str(tmp_path / 'messages.db'))
+    manager = messages.MessageManager(sqlite_config)
+    assert [m.message for m in manager.get_all_messages()] == ['from log']
+    manager.close()
+
+    manager = messages.MessageManager(sqlite_config)
+    assert len(manager.get_all_messages()) == 1
+    manager.close()
@@ -0,0 +1,67 @@
+"""NDJSON导出导入和导入时的去重"""
+
+import io
+
+import pytest
+
+from helpers import new_message
+from message_ndjson import export_messages, import_messages, iter_ndjson, read_ndjson
+
+
+def export_text(manager):
+    output = io.StringIO()
+    export_messages(manager, output)
+    return output.getvalue()
+
+
+def test_round_trip(manager, tmp_path):
+    ids = manager.add_many([new_message(i, subject='引号"和\\n换行', message=f'正文{i}\n第二行') for i in range(5)])
+    manager.mark_many_read(ids[:2])
+    exported = export_text(manager)
+    assert exported.count('\n') == 5
+
+    # 在空存储中导入后再导出，内容和id都相同
+    import messages
+    target = messages.MessageManager({'backend': 'log', 'log_path': str(tmp_path / 'target.log')})
+    assert import_messages(target, io.StringIO(exported), chunk_size=2) == (5, 0)
+    assert export_text(target) == exported
+
+    # 再次导入同一份备份不会产生重复的消息
+    assert import_messages(target, io.StringIO(exported)) == (0, 5)
+    target.close()
+
+
+def test_iter_ndjson_chunks_lines():
+    chunks = list(iter_ndjson([{'id': i} for i in range(5)], lines_per_chunk=2))
+    assert chunks == ['{"id":0}\n{"id":1}\n', '{"id":2}\n{"id":3}\n', '{"id":4}\n']
+
+
+def test_read_ndjson_reports_bad_line():
+    with pytest.raises(ValueError, match='第2行'):
+        list(read_ndjson(['{"id": 1}\n', 'not json\n']))
+    with pytest.raises(ValueError, match='第1行不是JSON对象'):
+        list(read_ndjson(['[1, 2]\n']))
+
+
+def test_import_keeps_unrelated_messages_with_colliding_ids(store):
+    local = store.add_many([new_message(i) for i in range(3)])
+    # 另一个安装中的消息，id与本地消息相同但内容不同
+    foreign = [dict(new_message(i, name='other'), id=message.id) for i, message in enumerate(local)]
+
+    assert store.import_messages(foreign) == (3, 0)
+    messages = store.all()
+    assert len(messages) == 6
+    assert len({m.id for m in messages}) == 6
+    assert sorted(m.name for m in messages).count('other') == 3
+    # 本地消息保持原样
+    assert [store.get(m.id).name for m in local] == ['name0', 'name1', 'name2']
+
+    # 重复导入时按内容识别出已经导入过（即使第一次导入时被分配了新id）
+    assert store.import_messages(foreign) == (0, 3)
+
+
+def test_import_keeps_new_ids_and_skips_duplicates_in_batch(store):
+    batch = [dict(new_message(1), id=500), dict(new_message(2), id=500), dict(new_message(1), id=501)]
+    assert store.import_messages(batch) == (2, 1)
+    ids = sorted(m.id for m in store.all())
+    assert ids[0] == 500 and ids[1] != 500
@@ -0,0 +1,59 @@
+"""GET /api/messages的游标分页和过滤"""
+
+import handlers
+from helpers import Args, new_message
+
+
+def read_all_pages(store, limit, **filters):
+    pages = []
+    cursor = None
+    while True:
+        messages, cursor = store.page(limit, cursor, **filters)
+        assert len(messages) <= limit
+        pages.append([m.id for m in messages])
+        if cursor is None:
+            return pages
+
+
+def test_pages_newest_first(store):
+    ids = [m.id for m in store.add_many([new_message(i) for i in range(25)])]
+    pages = read_all_pages(store, 10)
+    assert [i for page in pages for i in page] == ids[::-1]
+    assert pages[0] == ids[:-11:-1]
+
+
+def test_cursor_is_stable_across_new_messages(store):
+    ids = [m.id for m in store.add_many([new_message(i) for i in range(10)])]
+    first, cursor = store.page(5)
+    store.add(new_message(99))
+    second, _ = store.page(5, cursor)
+    assert [m.id for m in first] + [m.id for m in second] == ids[::-1]
+
+
+def test_unread_only(store):
+    ids = [m.id for m in store.add_many([new_message(i) for i in range(12)])]
+    store.mark_many_read(ids[::2])
+    pages = read_all_pages(store, 4, unread_only=True)
+    assert [i for page in pages for i in page] == ids[1::2][::-1]
+    assert store.count_unread() == 6
+
+
+def test_since(store):
+    store.add_many([new_message(i, timestamp=f'2024-01-{i + 1:02d}T12:00:00') for i in range(10)])
+    pages = read_all_pages(store, 3, since='2024-01-06')
+    found = [store.get(i).timestamp for page in pages for i in page]
+    assert found == [f'2024-01-{day:02d}T12:00:00' for day in range(10, 5, -1)]
+
+
+def test_request_without_parameters_returns_first_page(manager):
+    manager.add_many([new_message(i) for i in range(handlers.DEFAULT_PAGE_SIZE + 5)])
+
+    reply = handlers.run(handlers.get_messages(Args()), manager)
+    assert reply.status == 200
+    assert len(reply.payload['messages']) == handlers.DEFAULT_PAGE_SIZE
+    assert reply.payload['next_cursor'] is not None
+    assert reply.payload['unread_count'] == handlers.DEFAULT_PAGE_SIZE + 5
+
+    # 全部消息只在显式要求时返回
+    reply = handlers.run(handlers.get_messages(Args({'all': 'true'})), manager)
+    assert len(reply.payload['messages']) == handlers.DEFAULT_PAGE_SIZE + 5
@@ -0,0 +1,122 @@
+"""预先fork的服务器在工作进程退出后重新启动新的工作进程"""
+
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+import prefork_server
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason='prefork_server仅支持POSIX')
+
+
+def fake_worker(host, port, listen_sock, reuse_port, ready_fd):
+    """代替_run_worker：不导入app，报告就绪后等待SIGTERM"""
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, signal.SIG_DFL)
+    os.write(ready_fd, b'1')
+    os.close(ready_fd)
+    while True:
+        time.sleep(1)
+
+
+def read_workers(pid_file):
+    try:
+        with open(pid_file) as f:
+            return [int(line) for line in f.read().split()[1:]]
+    except (FileNotFoundError, ValueError):
+        return []
+
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = predicate()
+        if result:
+            return result
+        time.sleep(0.05)
+    raise AssertionError('等待超时')
+
+
+def test_respawns_exited_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(prefork_server, '_run_worker', fake_worker)
+    monkeypatch.setattr(prefork_server, 'POLL_INTERVAL', 0.05)
+    monkeypatch.setattr(prefork_server, 'RESPAWN_INTERVAL', 0.1)
+    pid_file = str(tmp_path / 'server.pid')
+
+    master = os.fork()
+    if master == 0:
+        code = 1
+        try:
+            server = prefork_server.PreforkServer('127.0.0.1', 0, 2, pid_file=pid_file, graceful_timeout=2)
+            code = server.run()
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+
+    try:
+        workers = wait_for(lambda: len(read_workers(pid_file)) == 2 and read_workers(pid_file))
+        os.kill(workers[0], signal.SIGKILL)
+
+        def replaced():
+            current = read_workers(pid_file)
+            return len(current) == 2 and workers[0] not in current and current
+
+        respawned = wait_for(replaced)
+        assert workers[1] in respawned
+    finally:
+        os.kill(master, signal.SIGTERM)
+        _, status = os.waitpid(master, 0)
+
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    # 主进程退出前结束了所有工作进程并删除PID文件
+    assert not os.path.exists(pid_file)
+    for pid in respawned:
+        with pytest.raises(ProcessLookupError):
+            os.kill(pid, 0)
+
+
+def failing_worker(host, port, listen_sock, reuse_port, ready_fd):
+    """启动失败的工作进程：不报告就绪直接退出"""
+    os.close(ready_fd)
+    return 1
+
+
+def run_master(worker, ready_fd, monkeypatch):
+    monkeypatch.setattr(prefork_server, '_run_worker', worker)
+    monkeypatch.setattr(prefork_server, 'POLL_INTERVAL', 0.05)
+    master = os.fork()
+    if master == 0:
+        code = 1
+        try:
+            server = prefork_server.PreforkServer('127.0.0.1', 0, 2, graceful_timeout=2, ready_fd=ready_fd)
+            code = server.run()
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+    os.close(ready_fd)
+    return master
+
+
+def test_ready_fd_written_after_all_workers_ready(monkeypatch):
+    read_fd, write_fd = os.pipe()
+    master = run_master(fake_worker, write_fd, monkeypatch)
+    try:
+        with os.fdopen(read_fd, 'rb') as ready:
+            assert ready.read(1) == b'1'
+            # 写入后主进程关闭了写端，工作进程也没有继承它
+            assert ready.read() == b''
+    finally:
+        os.kill(master, signal.SIGTERM)
+        os.waitpid(master, 0)
+
+
+def test_ready_fd_closed_without_signal_when_worker_fails(monkeypatch):
+    read_fd, write_fd = os.pipe()
+    master = run_master(failing_worker, write_fd, monkeypatch)
+    with os.fdopen(read_fd, 'rb') as ready:
+        assert ready.read() == b''
+    _, status = os.waitpid(master, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 1
@@ -0,0 +1,131 @@
+"""令牌桶限流：进程内的桶、SQLite共享桶，以及批量提交与逐条提交花费相同"""
+
+import pytest
+
+import handlers
+from helpers import new_message
+from rate_limit import MemoryBuckets, RateLimiter, SQLiteBuckets
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def buckets(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteBuckets(str(tmp_path / 'ratelimit.db'))
+    return MemoryBuckets()
+
+
+def test_burst_then_refill(buckets):
+    # 每秒补充0.5个，容量2
+    assert buckets.take('ip:a', 0.5, 2, 100.0) == 0
+    assert buckets.take('ip:a', 0.5, 2, 100.0) == 0
+    assert buckets.take('ip:a', 0.5, 2, 100.0) == pytest.approx(2.0)
+    # 其他键互不影响
+    assert buckets.take('ip:b', 0.5, 2, 100.0) == 0
+    assert buckets.take('ip:a', 0.5, 2, 102.0) == 0
+    # 补充不超过容量
+    assert buckets.take('ip:b', 0.5, 2, 1000.0) == 0
+    assert buckets.take('ip:b', 0.5, 2, 1000.0) == 0
+    assert buckets.take('ip:b', 0.5, 2, 1000.0) > 0
+
+
+def test_cost_is_all_or_nothing(buckets):
+    assert buckets.take('ip:a', 1, 5, 100.0, cost=3) == 0
+    # 只剩2个，取3个被拒绝且不扣除
+    assert buckets.take('ip:a', 1, 5, 100.0, cost=3) == pytest.approx(1.0)
+    assert buckets.take('ip:a', 1, 5, 101.0, cost=3) == 0
+    assert buckets.take('ip:a', 1, 5, 101.0) > 0
+
+
+def test_memory_buckets_evict_least_recently_used():
+    buckets = MemoryBuckets(max_keys=2)
+    buckets.take('a', 1, 1, 100.0)
+    buckets.take('b', 1, 1, 100.0)
+    buckets.take('a', 1, 1, 100.0)
+    buckets.take('c', 1, 1, 100.0)
+    assert len(buckets) == 2
+    # a最近用过，仍然是空桶；b最久未使用，被淘汰后从满桶重新开始
+    assert buckets.take('a', 1, 1, 100.0) > 0
+    assert buckets.take('b', 1, 1, 100.0) == 0
+
+
+def test_sqlite_buckets_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'ratelimit.db')
+    first, second = SQLiteBuckets(path), SQLiteBuckets(path)
+    assert first.take('ip:a', 1, 2, 100.0) == 0
+    assert second.take('ip:a', 1, 2, 100.0) == 0
+    assert first.take('ip:a', 1, 2, 100.0) == pytest.approx(1.0)
+    # 被拒绝的键在本进程记住到可以重试为止，不再访问数据库
+    with first._pool.connection() as conn:
+        conn.execute('DELETE FROM rate_buckets')
+    assert first.take('ip:a', 1, 2, 100.5) == pytest.approx(0.5)
+    assert second.take('ip:a', 1, 2, 100.5) == 0
+
+
+def test_limiter_skips_unknown_rules_and_empty_values():
+    limiter = RateLimiter({'submit': {'rate': 1, 'burst': 1}, 'off': {'rate': 0, 'burst': 5}})
+    assert set(limiter.rules) == {'submit'}
+    assert limiter.check(submit='a', email='x@example.com', off='a') == 0
+    assert limiter.check(submit=None) == 0
+    assert limiter.check(submit='a') > 0
+    assert limiter.burst('submit') == 1 and limiter.burst('email') is None
+    assert RateLimiter.retry_after(0.2) == '1' and RateLimiter.retry_after(2.5) == '3'
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = RateLimiter({
+        'submit': {'rate': 0.001, 'burst': 5},
+        'email': {'rate': 0.001, 'burst': 3},
+        'api': {'rate': 0.001, 'burst': 100},
+    })
+    monkeypatch.setattr(handlers, 'rate_limiter', limiter)
+    return limiter
+
+
+def batch_add(count, email=None):
+    return {'action': 'add', 'messages': [new_message(i, email=email or f'user{i}@example.com')
+                                          for i in range(count)]}
+
+
+def check(path, data, addr='1.2.3.4'):
+    return handlers.check_rate_limit('POST', path, addr, data)
+
+
+def test_batch_add_pays_one_submit_token_per_message(limiter):
+    assert handlers.is_submit('POST', '/api/messages/batch')
+    assert check('/api/messages/batch', batch_add(4)) is None
+    assert check('/api/messages', new_message(10)) is None
+    # 4 + 1条后提交令牌用完，与逐条提交5次相同
+    reply = check('/api/messages', new_message(11))
+    assert reply.status == 429 and 'Retry-After' in reply.headers
+    assert check('/api/messages/batch', batch_add(1)).status == 429
+    # 其他IP不受影响
+    assert check('/api/messages', new_message(12), addr='5.6.7.8') is None
+
+
+def test_batch_add_larger_than_burst_rejected(limiter):
+    reply = check('/api/messages/batch', batch_add(6))
+    assert reply.status == 400
+    # 没有消耗令牌
+    assert check('/api/messages/batch', batch_add(5)) is None
+
+
+def test_batch_add_pays_one_email_token_per_distinct_email(limiter):
+    # 同一邮箱：一个邮箱令牌
+    assert check('/api/messages/batch', batch_add(2, email='Same@Example.com'), addr='a') is None
+    assert check('/api/messages', new_message(1, email='same@example.com'), addr='b') is None
+    assert check('/api/messages', new_message(2, email='same@example.com'), addr='c') is None
+    # 邮箱令牌（容量3）已用完，换IP也不行
+    assert check('/api/messages/batch', batch_add(1, email='same@example.com'), addr='d').status == 429
+
+
+def test_batch_read_and_delete_pay_api_tokens(limiter):
+    for _ in range(10):
+        assert check('/api/messages/batch', {'action': 'read', 'ids': [1]}) is None
+    # 提交令牌没有被消耗
+    assert check('/api/messages/batch', batch_add(5)) is None
+
+
+def test_rate_limit_disabled(monkeypatch):
+    monkeypatch.setattr(handlers, 'rate_limiter', None)
+    assert check('/api/messages/batch', batch_add(20)) is None
@@ -0,0 +1,142 @@
+"""全文搜索：分词、BM25排序和跨进程写入时的增量维护"""
+
+import multiprocessing
+
+from helpers import new_message
+from message_search import SearchIndex, tokenize, tokenize_query
+from message_sqlite import SQLiteMessageStore
+
+fork = multiprocessing.get_context('fork')
+
+
+def test_tokenize_words_and_cjk():
+    assert tokenize('Hello, World 42') == ['hello', 'world', '42']
+    # 中文按单字和相邻两字切分
+    assert tokenize('你好世界') == ['你', '好', '世', '界', '你好', '好世', '世界']
+    assert tokenize('email: 张三@example.com') == ['email', '张', '三', '张三', 'example', 'com']
+    assert tokenize(None) == []
+
+
+def test_tokenize_query_uses_bigrams():
+    assert tokenize_query('你好世界') == ['你好', '好世', '世界']
+    assert tokenize_query('好') == ['好']
+    assert tokenize_query('Test test 测试') == ['test', '测试']
+
+
+def index_of(*messages):
+    index = SearchIndex()
+    for i, fields in enumerate(messages, 1):
+        index.add(dict({'id': i, 'name': '', 'email': '', 'subject': '', 'message': ''}, **fields))
+    return index
+
+
+def test_requires_every_query_token():
+    index = index_of({'message': '网站打不开了'}, {'message': '网站很好看'}, {'message': '打开速度慢'})
+    hits, total = index.search('网站打不开')
+    assert total == 1
+    assert [message_id for message_id, _ in hits] == [1]
+    # 不连续的两个字不构成短语
+    assert index.search('站开')[1] == 0
+
+
+def test_bm25_prefers_rare_terms_and_weighted_fields():
+    index = index_of(
+        {'message': 'order order order status'},
+        {'message': 'order status'},
+        {'subject': 'refund', 'message': 'order'},
+        {'message': 'refund please, order'},
+    )
+    ranked = [message_id for message_id, _ in index.search('order')[0]]
+    # 词频高的排在前面
+    assert ranked[0] == 1
+    ranked = [message_id for message_id, _ in index.search('refund order')[0]]
+    # 主题中的命中权重高于正文
+    assert ranked == [3, 4]
+
+
+def test_paging_and_removal():
+    index = index_of(*({'message': f'same words {i}'} for i in range(5)))
+    hits, total = index.search('same words', limit=2, offset=2)
+    assert total == 5
+    # 得分相同时新的消息在前
+    assert [message_id for message_id, _ in hits] == [3, 2]
+    index.remove(5)
+    index.remove(5)
+    assert index.search('same')[1] == 4
+    assert len(index) == 4
+
+
+def _write_from_other_process(db_path):
+    store = SQLiteMessageStore(db_path)
+    added = store.add_many([new_message(100, message='来自另一个进程'), new_message(101, message='稍后删除')])
+    store.mark_read(added[0].id)
+    store.delete(added[1].id)
+    store.close()
+
+
+def test_sqlite_replays_other_process_writes_as_events(tmp_path):
+    db_path = str(tmp_path / 'messages.db')
+    store = SQLiteMessageStore(db_path, refresh_interval=0)
+    store.add(new_message(1))
+    events = []
+    store.add_listener(lambda event, message: events.append((event, message['id'])))
+
+    process = fork.Process(target=_write_from_other_process, args=(db_path,))
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+
+    store.refresh()
+    ids = sorted(m.id for m in store.all())
+    other_id = ids[-1]
+    deleted_id = other_id + 1
+    # 逐条通知，不发出reset；之后已被删除的消息不发出add
+    assert events == [('add', other_id), ('read', other_id), ('delete', deleted_id)]
+
+    # 本进程的写入只通知一次
+    events.clear()
+    store.add(new_message(2))
+    store.refresh()
+    assert [event for event, _ in events] == ['add']
+    store.close()
+
+
+def test_sqlite_resets_when_change_log_was_trimmed(tmp_path):
+    db_path = str(tmp_path / 'messages.db')
+    store = SQLiteMessageStore(db_path, refresh_interval=0)
+    events = []
+    store.add_listener(lambda event, message: events.append(event))
+    # 模拟落后太多：已知序号之后的记录已被裁剪
+    other = SQLiteMessageStore(db_path)
+    other.add_many([new_message(i) for i in range(3)])
+    with other._pool.connection() as conn:
+        conn.execute('DELETE FROM message_changes WHERE seq = (SELECT MIN(seq) FROM message_changes)')
+    other.close()
+
+    store.refresh()
+    assert events == ['reset']
+    store.close()
+
+
+def test_search_index_follows_other_process_writes(tmp_path, monkeypatch):
+    import messages
+    monkeypatch.setattr(messages, 'MESSAGES_FILE', str(tmp_path / 'missing.json'))
+    db_path = str(tmp_path / 'messages.db')
+    manager = messages.MessageManager({'backend': 'sqlite', 'sqlite_path': db_path,
+                                       'log_path': str(tmp_path / 'messages.log')})
+    manager.add_many([new_message(1, message='本进程的消息')])
+    assert manager.search_messages('消息')[1] == 1
+    cleared = []
+    monkeypatch.setattr(manager._search_index, 'clear', lambda: cleared.append(True))
+
+    process = fork.Process(target=_write_from_other_process, args=(db_path,))
+    process.start()
+    process.join(30)
+
+    manager._store._last_refresh = 0
+    _, total = manager.search_messages('进程')
+    # 索引没有被清空重建，而是增量加入了另一个进程的消息
+    assert cleared == []
+    assert total == 2
+    assert manager.search_messages('稍后删除')[1] == 0
+    manager.close()
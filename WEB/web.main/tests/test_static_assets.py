@@ -0,0 +1,113 @@
+"""静态资源构建、manifest以及按Accept-Encoding选择预压缩文件"""
+
+import gzip
+import json
+import os
+
+import pytest
+
+import build_static
+from static_assets import IMMUTABLE_CACHE_CONTROL, StaticAssets
+
+CSS = 'body {\n  color: red; /* 注释 */\n  font-family: "A  B";\n}\n' + '.item { margin: 0 auto; }\n' * 20
+JS = '// 注释\nvar s = "a // b";\nvar r = /\\/\\*x/g;\n\n/* 多行\n注释 */\nvar n = 4 / 2;\n'
+
+
+class Accept:
+    """werkzeug Accept对象的替身"""
+
+    def __init__(self, *encodings):
+        self.encodings = encodings
+
+    def quality(self, encoding):
+        return 1 if encoding in self.encodings else 0
+
+
+@pytest.fixture
+def static_dir(tmp_path, monkeypatch):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'js').mkdir()
+    (tmp_path / 'css' / 'main.css').write_text(CSS, encoding='utf-8')
+    (tmp_path / 'js' / 'main.js').write_text(JS, encoding='utf-8')
+    dist = tmp_path / 'dist'
+    monkeypatch.setattr(build_static, 'STATIC_DIR', str(tmp_path))
+    monkeypatch.setattr(build_static, 'DIST_DIR', str(dist))
+    monkeypatch.setattr(build_static, 'MANIFEST_FILE', str(dist / 'manifest.json'))
+    monkeypatch.setattr(build_static, 'brotli', None)
+    return tmp_path
+
+
+ASSETS = ('css/main.css', 'js/main.js')
+
+
+def test_minify_css_keeps_strings():
+    assert build_static.minify_css(CSS).startswith('body{color:red;font-family:"A  B"}.item{margin:0 auto}')
+
+
+def test_minify_js_keeps_strings_and_regex():
+    assert build_static.minify_js(JS) == 'var s = "a // b";\nvar r = /\\/\\*x/g;\nvar n = 4 / 2;\n'
+
+
+def test_build_writes_hashed_files_and_manifest(static_dir):
+    manifest = build_static.build(ASSETS)
+
+    with open(static_dir / 'dist' / 'manifest.json', encoding='utf-8') as f:
+        assert json.load(f) == manifest
+    css = manifest['assets']['css/main.css']
+    content = (static_dir / 'dist' / css['file']).read_bytes()
+    assert css['file'] == build_static.hashed_name('css/main.css', content)
+    assert css['size'] == len(content) < css['source_size']
+    # 足够大的文件生成gzip版本，没有brotli时不生成.br
+    assert css['encodings'] == ['gzip']
+    assert gzip.decompress((static_dir / 'dist' / (css['file'] + '.gz')).read_bytes()) == content
+    assert not os.path.exists(static_dir / 'dist' / (css['file'] + '.br'))
+    # 小文件不压缩
+    assert manifest['assets']['js/main.js']['encodings'] == []
+
+
+def test_rebuild_is_stable_and_clean_removes_old_versions(static_dir):
+    first = build_static.build(ASSETS)
+    assert build_static.build(ASSETS) == first
+
+    (static_dir / 'css' / 'main.css').write_text(CSS + 'p { color: blue; }\n', encoding='utf-8')
+    second = build_static.build(ASSETS, clean=True)
+    old, new = first['assets']['css/main.css']['file'], second['assets']['css/main.css']['file']
+    assert old != new
+    assert not os.path.exists(static_dir / 'dist' / old)
+    assert not os.path.exists(static_dir / 'dist' / (old + '.gz'))
+    assert os.path.exists(static_dir / 'dist' / new)
+
+
+def test_urls_follow_manifest(static_dir):
+    assets = StaticAssets(str(static_dir))
+    # 没有构建时使用原始地址
+    assert assets.url('css/main.css') == '/staic/css/main.css'
+    assert assets.version() is None
+
+    manifest = build_static.build(ASSETS)
+    assets._manifest.invalidate()
+    assert assets.url('css/main.css') == f"/staic/dist/{manifest['assets']['css/main.css']['file']}"
+    assert assets.url('img/logo.png') == '/staic/img/logo.png'
+    assert assets.version() is not None
+
+
+def test_select_precompressed(static_dir):
+    manifest = build_static.build(ASSETS)
+    # 模拟构建时安装了brotli
+    manifest['assets']['css/main.css']['encodings'] = ['br', 'gzip']
+    (static_dir / 'dist' / 'manifest.json').write_text(json.dumps(manifest), encoding='utf-8')
+    assets = StaticAssets(str(static_dir))
+    css = manifest['assets']['css/main.css']['file']
+
+    assert assets.select(css, Accept('gzip', 'br')) == (css + '.br', 'br', 'text/css')
+    assert assets.select(css, Accept('gzip')) == (css + '.gz', 'gzip', 'text/css')
+    assert assets.select(css, Accept()) == (css, None, 'text/css')
+    assert assets.select(css) == (css, None, 'text/css')
+    # 只提供manifest中列出的文件
+    assert assets.select('manifest.json', Accept('gzip')) is None
+
+
+def test_headers():
+    assert StaticAssets.headers('gzip') == {'Cache-Control': IMMUTABLE_CACHE_CONTROL,
+                                            'Vary': 'Accept-Encoding', 'Content-Encoding': 'gzip'}
+    assert 'Content-Encoding' not in StaticAssets.headers(None)
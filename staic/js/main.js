@@ -19,8 +19,13 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 // 加载JSON配置文件
+// 通过/api/config获取：服务器返回ETag，浏览器再次访问时只需确认是否变化（304）
+// 服务器已按配置渲染好页面时（body带data-prerendered）不再请求
 function loadConfig() {
-  fetch('/staic/KEY/json/website_config.json')
+  if (document.body.dataset.prerendered) {
+    return;
+  }
+  fetch('/api/config')
     .then(response => {
       if (!response.ok) {
         throw new Error('网络响应异常');